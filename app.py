@@ -2,46 +2,79 @@
 
 from flask import Flask, render_template, Response, jsonify, request
 import atexit
+import os
+import sqlite3
+import numpy as np
+import multiprocessing
+import time
 
 # Core Logic
 from core.mode_manager import get_current_mode, set_mode, get_arduino_status, set_arduino_status
-from core.traffic_state import get_all_counts, get_current_green
+from core.emergency_handler import activate_emergency, deactivate_emergency, get_emergency_status
 
 # Pipeline Modules
 from camera.video_feed import start_video_feeds, stop_video_feeds
 from core.detection_service import DetectionService
-from core.signal_controller import TrafficController, get_remaining_time
-from camera.mjpeg_stream import generate_stream
-from hardware.arduino_serial import send_signal_to_arduino
+from core.signal_controller import TrafficController
+from core.status_feed import stream_status, stop_status_publisher
+from core.state_snapshot import status_json
+from core.count_history import get_history
+from core.traffic_store import start_store, stop_store, day_range, query_counts, query_phases
+from config import DB_PATH, PERSISTENCE_ENABLED, RECORD_ON_START
+from camera.recording import start_recording, stop_recording, get_recording_status
+from camera.mjpeg_stream import generate_stream, stop_broadcasters, MOSAIC, RENDITIONS, DEFAULT_RENDITION
+from hardware.arduino_serial import send_signal_to_arduino, stop_serial_writer
+from utils.metrics import render_prometheus
 
 app = Flask(__name__)
 
 # -------------------------------
 # START PIPELINE
 # -------------------------------
-print("⚡ Starting Pipelined System...")
+def start_pipeline():
+    global detection_service, traffic_controller
+    print("⚡ Starting Pipelined System...")
 
-# 1. Start Video Threads (Producer)
-is_sim = (get_current_mode() == "simulation")
-start_video_feeds(is_simulation=is_sim)
+    # 0. Durable record of counts / phases (background writer)
+    if PERSISTENCE_ENABLED:
+        start_store()
 
-# 2. Start Detection Service (Consumer 1)
-detection_service = DetectionService()
-detection_service.start()
+    # 1. Start Video Threads (Producer)
+    is_sim = (get_current_mode() == "simulation")
+    start_video_feeds(is_simulation=is_sim)
 
-# 3. Start Traffic Controller (Consumer 2)
-traffic_controller = TrafficController()
-traffic_controller.start()
+    # 2. Start Detection Service (Consumer 1)
+    detection_service = DetectionService()
+    detection_service.start()
+
+    # 3. Start Traffic Controller (Consumer 2)
+    traffic_controller = TrafficController()
+    traffic_controller.start()
+
+    # 4. Optional capture of frames + counts for replay
+    if RECORD_ON_START:
+        start_recording()
+
+    atexit.register(cleanup)
 
 
 # CLEANUP
 def cleanup():
     print("Shutting down pipeline...")
+    stop_recording()
     stop_video_feeds()
+    stop_broadcasters()
+    stop_status_publisher()
     detection_service.stop()
     traffic_controller.stop()
+    stop_serial_writer()
+    stop_store()
 
-atexit.register(cleanup)
+
+# Detection worker processes (DETECTION_MODE = "process") re-import the
+# main module (this one, or asgi.py); only the real server may start the pipeline.
+if multiprocessing.parent_process() is None:
+    start_pipeline()
 
 VALID_DIRECTIONS = {"north", "south", "east", "west"}
 
@@ -54,18 +87,113 @@ def dashboard():
 
 @app.route("/api/status")
 def get_status():
+    """
+    Served from the cached snapshot body; ETag / If-None-Match -> 304.
+    """
+    etag, body = status_json()
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype="application/json", headers=headers)
+
+@app.route("/api/status/stream")
+def status_stream():
+    """Server-Sent Events: one event per status change."""
+    return Response(stream_status(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/api/history")
+def history():
+    """
+    GET ?direction=north&resolution=raw|1s|1m|15m&seconds=600
+    (or &start=<epoch>&end=<epoch>); no direction -> all four.
+    """
+    resolution = request.args.get("resolution", "1s")
+    try:
+        end = float(request.args.get("end", time.time()))
+        start = float(request.args.get("start", end - float(request.args.get("seconds", 600))))
+        directions = [request.args["direction"]] if "direction" in request.args else sorted(VALID_DIRECTIONS)
+        return jsonify({d: get_history(d, resolution, start, end) for d in directions})
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+@app.route("/api/archive")
+def archive():
+    """
+    Persisted data for one day:
+    GET ?direction=north&date=YYYY-MM-DD&bucket=60 (seconds; default 1)
+    """
+    direction = request.args.get("direction", "north")
+    if direction not in VALID_DIRECTIONS:
+        return jsonify({"status": "error"}), 400
+    try:
+        start, end = day_range(request.args.get("date"))
+        bucket = int(request.args.get("bucket", 1))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if not PERSISTENCE_ENABLED or not os.path.exists(DB_PATH):
+        return jsonify({"status": "error", "message": "No archive (persistence is off or nothing stored yet)"}), 404
+    try:
+        counts = query_counts(direction, start, end, bucket)
+        phases = query_phases(start, end, direction)
+    except sqlite3.OperationalError as e:
+        # e.g. the store is still being created, or locked
+        return jsonify({"status": "error", "message": f"Archive unavailable: {e}"}), 503
     return jsonify({
-        "mode": get_current_mode(),
-        "arduino": get_arduino_status(),
-        "current_direction": get_current_green(),
-        "remaining_time": get_remaining_time(),
-        "counts": get_all_counts()
+        "direction": direction,
+        "counts": {k: np.round(v, 3).tolist() for k, v in counts.items()},
+        "phases": phases
     })
 
+@app.route("/api/emergency", methods=["GET", "POST"])
+def emergency():
+    """
+    POST {"direction": "north"} -> preempt to green for north
+    POST {"direction": null}    -> clear the emergency
+    """
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({"status": "error"}), 400
+        direction = data.get("direction")
+        if direction:
+            # Not a string (e.g. a list): unhashable, and never a direction
+            if not isinstance(direction, str) or direction not in VALID_DIRECTIONS:
+                return jsonify({"status": "error"}), 400
+            activate_emergency(direction)
+        else:
+            deactivate_emergency()
+    return jsonify(get_emergency_status())
+
+@app.route("/api/recording", methods=["GET", "POST"])
+def recording():
+    """
+    POST {"action": "start"} -> record frames + counts to RECORDINGS_DIR
+    POST {"action": "stop"}
+    """
+    if request.method == "POST":
+        action = (request.get_json(silent=True) or {}).get("action")
+        if action == "start":
+            start_recording()
+        elif action == "stop":
+            stop_recording()
+        else:
+            return jsonify({"status": "error"}), 400
+    return jsonify(get_recording_status())
+
+@app.route("/metrics")
+def metrics():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/stream/<direction>")
 def stream(direction):
-    if direction not in VALID_DIRECTIONS: return "Error", 404
-    return Response(generate_stream(direction), mimetype="multipart/x-mixed-replace; boundary=frame")
+    """
+    /stream/<direction>?rendition=full|thumb, or /stream/mosaic (all four, 2x2)
+    """
+    rendition = request.args.get("rendition", DEFAULT_RENDITION)
+    if direction not in VALID_DIRECTIONS and direction != MOSAIC: return "Error", 404
+    if rendition not in RENDITIONS: return "Error", 404
+    return Response(generate_stream(direction, rendition), mimetype="multipart/x-mixed-replace; boundary=frame")
 
 # ... (Existing mode/manual routes remain the same) ...
 @app.route("/set_mode", methods=["POST"])
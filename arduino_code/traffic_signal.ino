@@ -166,6 +166,14 @@
  Smart Traffic Management System
  Arduino Traffic Signal Controller
  Stable Version (No Serial Spam)
+
+ Binary protocol (preferred), one packet = whole intersection:
+   Host -> Arduino : A5 | 01 | SEQ | STATE_LO | STATE_HI | CRC8
+   Arduino -> Host : 5A | 06 (ACK) / 15 (NAK) | SEQ | CRC8
+ STATE bit (d * 3 + l) = lamp l (R, Y, G) of direction d (N, S, E, W),
+ which is exactly pin (2 + bit). CRC8 poly 0x07 over bytes 1..4.
+
+ Legacy text commands (NORTH_GREEN etc.) are still accepted.
 */
 
 // -------------------------------
@@ -187,28 +195,33 @@
 #define W_YELLOW 12
 #define W_GREEN 13
 
-String command = "";
+#define FIRST_PIN N_RED
+#define LAMP_COUNT 12
 
 // -------------------------------
-void setup()
-{
-    Serial.begin(9600);
+// PROTOCOL
+// -------------------------------
+#define FRAME_START 0xA5
+#define ACK_START 0x5A
+#define MSG_SET_STATE 0x01
+#define MSG_ACK 0x06
+#define MSG_NAK 0x15
+#define PACKET_SIZE 6
 
-    pinMode(N_RED, OUTPUT);
-    pinMode(N_YELLOW, OUTPUT);
-    pinMode(N_GREEN, OUTPUT);
+byte packet[PACKET_SIZE];
+byte packetLen = 0;
 
-    pinMode(S_RED, OUTPUT);
-    pinMode(S_YELLOW, OUTPUT);
-    pinMode(S_GREEN, OUTPUT);
+String command = "";
 
-    pinMode(E_RED, OUTPUT);
-    pinMode(E_YELLOW, OUTPUT);
-    pinMode(E_GREEN, OUTPUT);
+// -------------------------------
+void setup()
+{
+    Serial.begin(115200);
 
-    pinMode(W_RED, OUTPUT);
-    pinMode(W_YELLOW, OUTPUT);
-    pinMode(W_GREEN, OUTPUT);
+    for (byte pin = FIRST_PIN; pin < FIRST_PIN + LAMP_COUNT; pin++)
+    {
+        pinMode(pin, OUTPUT);
+    }
 
     allRed(); // Safety default
 }
@@ -216,70 +229,156 @@ void setup()
 // -------------------------------
 void loop()
 {
-    if (Serial.available() > 0)
+    while (Serial.available() > 0)
     {
-        command = Serial.readStringUntil('\n');
-        command.trim();
+        byte b = Serial.read();
 
-        if (command.length() > 0)
+        if (packetLen > 0)
+        {
+            packet[packetLen++] = b;
+            if (packetLen == PACKET_SIZE)
+            {
+                handlePacket();
+                packetLen = 0;
+            }
+        }
+        else if (b == FRAME_START && command.length() == 0)
+        {
+            packet[packetLen++] = b;
+        }
+        else if (b == '\n')
         {
-            handleCommand(command);
+            command.trim();
+            if (command.length() > 0)
+            {
+                handleCommand(command);
+            }
+            command = "";
+        }
+        else
+        {
+            command += (char)b;
         }
     }
 }
 
 // -------------------------------
-void handleCommand(String cmd)
+// BINARY PROTOCOL
+// -------------------------------
+byte crc8(const byte *data, byte len)
+{
+    byte crc = 0;
+    for (byte i = 0; i < len; i++)
+    {
+        crc ^= data[i];
+        for (byte bit = 0; bit < 8; bit++)
+        {
+            crc = (crc & 0x80) ? (crc << 1) ^ 0x07 : (crc << 1);
+        }
+    }
+    return crc;
+}
+
+void sendAck(byte seq, bool ok)
 {
+    byte reply[4];
+    reply[0] = ACK_START;
+    reply[1] = ok ? MSG_ACK : MSG_NAK;
+    reply[2] = seq;
+    reply[3] = crc8(reply + 1, 2);
+    Serial.write(reply, 4);
+}
 
-    allRed(); // Safety reset
-
-    if (cmd == "NORTH_GREEN")
-        digitalWrite(N_GREEN, HIGH);
-    else if (cmd == "NORTH_YELLOW")
-        digitalWrite(N_YELLOW, HIGH);
-    else if (cmd == "NORTH_RED")
-        digitalWrite(N_RED, HIGH);
-
-    else if (cmd == "SOUTH_GREEN")
-        digitalWrite(S_GREEN, HIGH);
-    else if (cmd == "SOUTH_YELLOW")
-        digitalWrite(S_YELLOW, HIGH);
-    else if (cmd == "SOUTH_RED")
-        digitalWrite(S_RED, HIGH);
-
-    else if (cmd == "EAST_GREEN")
-        digitalWrite(E_GREEN, HIGH);
-    else if (cmd == "EAST_YELLOW")
-        digitalWrite(E_YELLOW, HIGH);
-    else if (cmd == "EAST_RED")
-        digitalWrite(E_RED, HIGH);
-
-    else if (cmd == "WEST_GREEN")
-        digitalWrite(W_GREEN, HIGH);
-    else if (cmd == "WEST_YELLOW")
-        digitalWrite(W_YELLOW, HIGH);
-    else if (cmd == "WEST_RED")
-        digitalWrite(W_RED, HIGH);
+// Every head must show exactly one lamp
+bool validState(unsigned int state)
+{
+    for (byte d = 0; d < 4; d++)
+    {
+        byte lamps = (state >> (d * 3)) & 0x07;
+        if (lamps != 1 && lamps != 2 && lamps != 4)
+            return false;
+    }
+    return true;
 }
 
-// -------------------------------
-void allRed()
+void handlePacket()
 {
-    digitalWrite(N_RED, HIGH);
-    digitalWrite(S_RED, HIGH);
-    digitalWrite(E_RED, HIGH);
-    digitalWrite(W_RED, HIGH);
+    // Corrupt frame: stay silent, the host retries
+    if (packet[1] != MSG_SET_STATE || crc8(packet + 1, 4) != packet[5])
+        return;
 
-    digitalWrite(N_YELLOW, LOW);
-    digitalWrite(N_GREEN, LOW);
+    byte seq = packet[2];
+    unsigned int state = packet[3] | ((unsigned int)packet[4] << 8);
 
-    digitalWrite(S_YELLOW, LOW);
-    digitalWrite(S_GREEN, LOW);
+    if (!validState(state))
+    {
+        sendAck(seq, false);
+        return;
+    }
+
+    applyState(state);
+    sendAck(seq, true);
+}
+
+// Sets all 12 lamps at once
+void applyState(unsigned int state)
+{
+#if defined(__AVR_ATmega328P__)
+    // Uno/Nano: pins 2-7 = PORTD bits 2-7, pins 8-13 = PORTB bits 0-5.
+    // Two register writes with interrupts off -> no intermediate states.
+    byte d = (PORTD & 0x03) | ((state & 0x3F) << 2);
+    byte b = (PORTB & 0xC0) | ((state >> 6) & 0x3F);
+    noInterrupts();
+    PORTD = d;
+    PORTB = b;
+    interrupts();
+#else
+    for (byte i = 0; i < LAMP_COUNT; i++)
+    {
+        digitalWrite(FIRST_PIN + i, (state >> i) & 1 ? HIGH : LOW);
+    }
+#endif
+}
 
-    digitalWrite(E_YELLOW, LOW);
-    digitalWrite(E_GREEN, LOW);
+// -------------------------------
+// LEGACY TEXT COMMANDS
+// -------------------------------
+void handleCommand(String cmd)
+{
+    unsigned int state = 0;
+    byte dir;
+
+    if (cmd.startsWith("NORTH_"))
+        dir = 0;
+    else if (cmd.startsWith("SOUTH_"))
+        dir = 1;
+    else if (cmd.startsWith("EAST_"))
+        dir = 2;
+    else if (cmd.startsWith("WEST_"))
+        dir = 3;
+    else
+        return;
+
+    byte lamp;
+    if (cmd.endsWith("_RED"))
+        lamp = 0;
+    else if (cmd.endsWith("_YELLOW"))
+        lamp = 1;
+    else if (cmd.endsWith("_GREEN"))
+        lamp = 2;
+    else
+        return;
+
+    // Named head gets the lamp, every other head goes red
+    for (byte d = 0; d < 4; d++)
+    {
+        state |= (unsigned int)1 << (d * 3 + (d == dir ? lamp : 0));
+    }
+    applyState(state);
+}
 
-    digitalWrite(W_YELLOW, LOW);
-    digitalWrite(W_GREEN, LOW);
+// -------------------------------
+void allRed()
+{
+    applyState(0x249); // red bit of every head: 1 | 1<<3 | 1<<6 | 1<<9
 }
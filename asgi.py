@@ -0,0 +1,294 @@
+# asgi.py
+
+"""
+Async serving mode: same pipeline as app.py, but viewers are coroutines.
+
+    python asgi.py                    (needs: pip install "uvicorn[standard]")
+    uvicorn asgi:app --port 5000      (single worker - the pipeline is in-process)
+
+/stream/<direction> (and /stream/mosaic), /api/status and
+/api/status/stream are served natively: every client waits on an
+asyncio.Event that the broadcaster thread fires once per new packet,
+so hundreds of viewers cost no threads.
+Everything else (dashboard, POST routes, /metrics) goes to the Flask app
+through a small WSGI bridge on the default executor.
+"""
+
+import asyncio
+import io
+import sys
+from threading import Lock
+from urllib.parse import parse_qs
+
+import app as flask_app   # starts the pipeline
+from camera.mjpeg_stream import get_broadcaster, MOSAIC, RENDITIONS, DEFAULT_RENDITION
+from core.status_feed import get_status_publisher, KEEPALIVE_INTERVAL
+from core.state_snapshot import status_json
+from utils import metrics
+
+HOST = "0.0.0.0"
+PORT = 5000
+
+VALID_DIRECTIONS = flask_app.VALID_DIRECTIONS
+WAKE_TIMEOUT = 1.0   # re-check for disconnects / shutdown at least this often
+
+_notifiers = {}
+_notifier_lock = Lock()
+
+
+# -------------------------------
+# THREAD -> ASYNCIO BRIDGE
+# -------------------------------
+class AsyncNotifier:
+    """
+    Turns a thread-side publish (MJPEGBroadcaster, StatusPublisher) into
+    an asyncio.Event on one loop. One notifier per source is shared by
+    all of its clients: a publish costs one call_soon_threadsafe.
+    """
+    def __init__(self, source, loop):
+        self.source = source
+        self._loop = loop
+        self.event = asyncio.Event()
+        source.add_listener(self.notify)
+
+    def notify(self):
+        """Called from the publisher thread."""
+        try:
+            self._loop.call_soon_threadsafe(self._fire)
+        except RuntimeError:
+            # Loop already closed (shutdown)
+            self.source.remove_listener(self.notify)
+
+    def _fire(self):
+        event, self.event = self.event, asyncio.Event()
+        event.set()
+
+
+def _get_notifier(key, source):
+    """
+    Shared notifier for `source`, rebuilt if the source was restarted.
+    """
+    loop = asyncio.get_running_loop()
+    with _notifier_lock:
+        notifier = _notifiers.get(key)
+        if notifier is None or notifier.source is not source or notifier._loop is not loop:
+            if notifier is not None:
+                notifier.source.remove_listener(notifier.notify)
+            notifier = AsyncNotifier(source, loop)
+            _notifiers[key] = notifier
+        return notifier
+
+
+async def _wait(event, timeout=WAKE_TIMEOUT):
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _watch_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+# -------------------------------
+# NATIVE ROUTES
+# -------------------------------
+async def _send_bytes(send, status, content_type, body, extra_headers=()):
+    headers = [(b"content-type", content_type), (b"content-length", str(len(body)).encode())]
+    headers.extend(extra_headers)
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def stream(receive, send, direction, rendition):
+    """
+    Async twin of generate_stream(): same shared packets, no thread.
+    """
+    broadcaster = get_broadcaster(direction, rendition)
+    notifier = _get_notifier(("stream", broadcaster.name_label), broadcaster)
+    dropped = metrics.MJPEG_CLIENT_FRAMES_DROPPED.labels(broadcaster.name_label)
+
+    broadcaster.subscribe()
+    disconnect = asyncio.ensure_future(_watch_disconnect(receive))
+    try:
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"multipart/x-mixed-replace; boundary=frame"),
+            (b"cache-control", b"no-cache"),
+        ]})
+
+        seq = 0
+        while broadcaster.running and not disconnect.done():
+            # Grab the event before checking, so a publish in between isn't missed
+            event = notifier.event
+            new_seq, packet = broadcaster.wait_for_packet(seq, timeout=0)
+
+            if packet is None or new_seq == seq:
+                await _wait(event)
+                continue
+
+            if seq and new_seq - seq > 1:
+                dropped.inc(new_seq - seq - 1)
+
+            seq = new_seq
+            # Waits for the socket to drain: a slow client just skips frames
+            await send({"type": "http.response.body", "body": packet, "more_body": True})
+    except OSError:
+        pass
+    finally:
+        disconnect.cancel()
+        broadcaster.unsubscribe()
+
+
+async def status(scope, send):
+    etag, body = status_json()
+    headers = [(b"etag", f'"{etag}"'.encode()), (b"cache-control", b"no-cache")]
+
+    for name, value in scope["headers"]:
+        if name == b"if-none-match" and f'"{etag}"'.encode() in value:
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+    await _send_bytes(send, 200, b"application/json", body, headers)
+
+
+async def status_stream(receive, send):
+    """
+    Async twin of stream_status(): Server-Sent Events.
+    """
+    publisher = get_status_publisher()
+    notifier = _get_notifier("status", publisher)
+
+    publisher.subscribe()
+    disconnect = asyncio.ensure_future(_watch_disconnect(receive))
+    try:
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ]})
+
+        seq = 0
+        while publisher.running and not disconnect.done():
+            event = notifier.event
+            new_seq, data = publisher.wait_for_event(seq, timeout=0)
+
+            if data is None or new_seq == seq:
+                await _wait(event, KEEPALIVE_INTERVAL)
+                if notifier.event is event:
+                    await send({"type": "http.response.body", "body": b": keepalive\n\n", "more_body": True})
+                continue
+
+            seq = new_seq
+            await send({"type": "http.response.body", "body": data, "more_body": True})
+    except OSError:
+        pass
+    finally:
+        disconnect.cancel()
+        publisher.unsubscribe()
+
+
+# -------------------------------
+# WSGI BRIDGE (everything else)
+# -------------------------------
+def _call_wsgi(environ):
+    result = {}
+
+    def start_response(status, headers, exc_info=None):
+        result["status"] = int(status.split(" ", 1)[0])
+        result["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+    body_iter = flask_app.app(environ, start_response)
+    try:
+        body = b"".join(body_iter)
+    finally:
+        if hasattr(body_iter, "close"):
+            body_iter.close()
+    return result["status"], result["headers"], body
+
+
+async def wsgi(scope, receive, send):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    body = b"".join(chunks)
+
+    server = scope.get("server") or (HOST, PORT)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        key = name.decode("latin-1").upper().replace("-", "_")
+        if key == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value.decode("latin-1")
+        elif key != "CONTENT_LENGTH":
+            environ["HTTP_" + key] = value.decode("latin-1")
+
+    status_code, headers, body = await asyncio.get_running_loop().run_in_executor(None, _call_wsgi, environ)
+    await send({"type": "http.response.start", "status": status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+# -------------------------------
+# ASGI ENTRY POINT
+# -------------------------------
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"]
+    if scope["method"] == "GET":
+        if path.startswith("/stream/"):
+            direction = path[len("/stream/"):]
+            query = parse_qs(scope["query_string"].decode("latin-1"))
+            rendition = query.get("rendition", [DEFAULT_RENDITION])[0]
+            if (direction not in VALID_DIRECTIONS and direction != MOSAIC) or rendition not in RENDITIONS:
+                await _send_bytes(send, 404, b"text/plain", b"Error")
+                return
+            await stream(receive, send, direction, rendition)
+            return
+        if path == "/api/status":
+            await status(scope, send)
+            return
+        if path == "/api/status/stream":
+            await status_stream(receive, send)
+            return
+
+    await wsgi(scope, receive, send)
+
+
+if __name__ == "__main__":
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("Async mode needs uvicorn: pip install \"uvicorn[standard]\"")
+    uvicorn.run(app, host=HOST, port=PORT, log_level="warning")
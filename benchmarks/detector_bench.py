@@ -0,0 +1,211 @@
+# benchmarks/detector_bench.py
+
+"""
+Detector backend benchmark: latency per detection tick.
+
+One tick is what DetectionService does when every lane is due: four
+stream-resolution frames (one synthetic scene per direction) go to the
+detector. Compared:
+  mog2          - MOG2Detector.detect_batch (background subtraction per lane)
+  onnx/batched  - ONNXDetector.detect_batch (one blob, one forward pass)
+  onnx/per-lane - ONNXDetector.detect per lane (four forward passes)
+
+The backends run interleaved, one tick each in turn, so load on the
+machine is shared evenly instead of landing on whichever ran last.
+
+Without --model the tiny generated model (benchmarks/tiny_onnx.py) is
+used, so the numbers measure the batching and post-processing overhead,
+not a real network. Its forward pass costs the same per pixel whether
+the lanes are batched or not, so expect onnx/batched and onnx/per-lane
+to be level; batching pays off with real networks, where per-call
+overhead is larger.
+
+Before timing, the ONNX backend is checked end to end (see check()):
+output types and shapes, boxes found, an empty frame giving no boxes,
+and detect_batch agreeing with per-lane detect. --check stops there.
+
+Usage (from the repo root):
+    python -m benchmarks.detector_bench --output detectors.json
+    python -m benchmarks.detector_bench --model models/vehicles.onnx --ticks 50
+    python -m benchmarks.detector_bench --check
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from config import FRAME_WIDTH, FRAME_HEIGHT, DNN_INPUT_SIZE
+from core.detectors import MOG2Detector, ONNXDetector
+from benchmarks.pipeline_bench import peak_rss_mb, summarize
+from benchmarks.synthetic_video import synthetic_frames
+from benchmarks.tiny_onnx import write_model, BOX_SIZE
+
+DIRECTIONS = ["north", "south", "east", "west"]
+DEFAULT_TICKS = 150
+WARMUP_TICKS = 10
+CHECK_TICKS = 10
+
+
+def make_ticks(count):
+    """[{direction: frame}] - a different scene (seed) per direction."""
+    lanes = {
+        d: list(synthetic_frames(FRAME_WIDTH, FRAME_HEIGHT, count, seed=i))
+        for i, d in enumerate(DIRECTIONS)
+    }
+    return [{d: lanes[d][i] for d in DIRECTIONS} for i in range(count)]
+
+
+def time_ticks(backends, ticks):
+    """
+    Runs every backend fn(tick) over every tick, interleaved (the order
+    rotates per tick); {name: summary plus mean boxes per lane}.
+    """
+    names = list(backends)
+    for tick in ticks[:WARMUP_TICKS]:
+        for name in names:
+            backends[name](tick)
+
+    samples = {name: [] for name in names}
+    boxes = dict.fromkeys(names, 0)
+    for i, tick in enumerate(ticks):
+        for name in names[i % len(names):] + names[:i % len(names)]:
+            t0 = time.perf_counter()
+            results = backends[name](tick)
+            samples[name].append(time.perf_counter() - t0)
+            boxes[name] += sum(len(b) for b in results.values())
+
+    summary = {}
+    for name in names:
+        # busy time only: the other backends' turns are not counted
+        result = summarize(samples[name], sum(samples[name]))
+        result["boxes_per_lane"] = round(boxes[name] / (len(ticks) * len(DIRECTIONS)), 2)
+        summary[name] = result
+    return summary
+
+
+def _sorted_rows(boxes):
+    return boxes[np.lexsort(boxes.T[::-1])] if len(boxes) else boxes
+
+
+def check(detector, ticks, box_size=None):
+    """
+    End-to-end check of an ONNX detector on the synthetic ticks; a list
+    of problems (empty when it passes). box_size: the model's fixed box
+    side in input pixels (the tiny model), checked after scaling.
+    """
+    problems = []
+    found = 0
+    for i, tick in enumerate(ticks):
+        batched = detector.detect_batch(tick)
+        if set(batched) != set(tick):
+            problems.append(f"tick {i}: detect_batch returned lanes {sorted(batched)}")
+            continue
+        for d, frame in tick.items():
+            boxes = batched[d]
+            if not isinstance(boxes, np.ndarray) or boxes.dtype != np.float32 or boxes.shape[1:] != (4,):
+                problems.append(f"tick {i} {d}: expected float32 (N, 4) boxes, got {getattr(boxes, 'shape', type(boxes))}")
+                continue
+            found += len(boxes)
+            single = detector.detect(frame, d)
+            if single.shape != boxes.shape or not np.allclose(_sorted_rows(single), _sorted_rows(boxes), atol=1e-3):
+                problems.append(f"tick {i} {d}: batched {len(boxes)} boxes != per-lane {len(single)}")
+            if box_size is not None and len(boxes):
+                h, w = frame.shape[:2]
+                iw, ih = detector.input_size
+                expected = (box_size * w / iw, box_size * h / ih)
+                if not np.allclose(boxes[:, 2:], expected, atol=1e-3):
+                    problems.append(f"tick {i} {d}: box sizes {boxes[0, 2:]} != {expected}")
+    if not found:
+        problems.append("no boxes found in any tick")
+
+    empty = np.zeros_like(ticks[0][DIRECTIONS[0]])
+    if len(detector.detect(empty, DIRECTIONS[0])):
+        problems.append("boxes found in an empty (black) frame")
+    return problems
+
+
+def run(model_path, tick_count):
+    ticks = make_ticks(tick_count)
+    onnx = ONNXDetector(model_path)
+    mog2 = MOG2Detector()
+
+    print("[BENCH] mog2, onnx/batched, onnx/per-lane (interleaved)")
+    results = time_ticks({
+        "mog2": mog2.detect_batch,
+        "onnx/batched": onnx.detect_batch,
+        "onnx/per-lane": lambda tick: {d: onnx.detect(frame, d) for d, frame in tick.items()},
+    }, ticks)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ticks": tick_count,
+            "lanes": len(DIRECTIONS),
+            "model": model_path,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+
+
+def print_report(report):
+    print()
+    # "fps" is ticks/s here: each tick is one frame per lane
+    print(f"{'backend':<16}{'ticks/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'boxes':>8}")
+    for name, r in report["results"].items():
+        print(f"{name:<16}{r['fps']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['boxes_per_lane']:>8}")
+    print(f"peak RSS: {report['peak_rss_mb']} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detector backend benchmark (latency per tick)")
+    parser.add_argument("--model", help="ONNX model (default: generate the tiny test model)")
+    parser.add_argument("--ticks", type=int, default=DEFAULT_TICKS)
+    parser.add_argument("--output", help="Write JSON results here")
+    parser.add_argument("--check", action="store_true", help="Only run the end-to-end check")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        model, box_size = args.model, None
+        if not model:
+            model = write_model(os.path.join(model_dir, "tiny_vehicles.onnx"), DNN_INPUT_SIZE)
+            box_size = BOX_SIZE
+
+        print(f"[BENCH] Checking the ONNX backend ({CHECK_TICKS} ticks)")
+        problems = check(ONNXDetector(model), make_ticks(CHECK_TICKS), box_size)
+        if problems:
+            print("[BENCH] CHECK FAILED:")
+            for line in problems:
+                print("  " + line)
+            return 1
+        print("[BENCH] Check passed")
+        if args.check:
+            return 0
+
+        report = run(model, args.ticks)
+        if not args.model:
+            report["meta"]["model"] = "tiny_vehicles (generated)"
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[BENCH] Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
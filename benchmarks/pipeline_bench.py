@@ -0,0 +1,265 @@
+# benchmarks/pipeline_bench.py
+
+"""
+Offline pipeline benchmark.
+
+Generates synthetic clips, then drives the real pipeline stages with no
+sleep throttling:
+  capture   - VideoStreamWorker (decode + resize) per source resolution
+  replay    - ReplayStreamWorker over a recording (memmap, no decode)
+  detection - count_vehicles on stream-resolution frames (DETECTOR_BACKEND;
+              benchmarks/detector_bench.py compares the backends per tick)
+  encode    - MJPEG encode_packet on stream-resolution frames
+
+Reports frames/sec, p50/p99 latency per stage and peak RSS, writes JSON,
+and can compare against a previous run (non-zero exit on regression).
+
+Usage (from the repo root):
+    python -m benchmarks.pipeline_bench --output bench.json
+    python -m benchmarks.pipeline_bench --compare bench.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from config import FRAME_WIDTH, FRAME_HEIGHT
+from camera import video_feed
+from camera.video_feed import VideoStreamWorker
+from camera.recording import ReplayStreamWorker
+from camera.mjpeg_stream import encode_packet
+from core.vehicle_counter import count_vehicles
+from utils import metrics
+from benchmarks.synthetic_video import RESOLUTIONS, synthetic_frames, write_clip, write_recording
+
+DEFAULT_RESOLUTIONS = ["360p", "720p", "1080p", "4k"]
+DEFAULT_FRAMES = 150
+DEFAULT_TOLERANCE = 0.10
+
+
+# -------------------------------
+# HELPERS
+# -------------------------------
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    if sys.platform == "darwin":
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
+
+
+def summarize(samples, wall_time):
+    """Stage summary from per-frame latencies (seconds)."""
+    arr = np.asarray(samples, dtype=np.float64)
+    return {
+        "frames": int(arr.size),
+        "fps": round(arr.size / wall_time, 2) if wall_time > 0 else 0.0,
+        "p50_ms": round(float(np.percentile(arr, 50)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(arr, 99)) * 1000, 3),
+    }
+
+
+def time_stage(fn, frames):
+    samples = []
+    wall_start = time.perf_counter()
+    for frame in frames:
+        t0 = time.perf_counter()
+        fn(frame)
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - wall_start)
+
+
+# -------------------------------
+# STAGES
+# -------------------------------
+def bench_capture(clip_path, label):
+    """
+    Runs one VideoStreamWorker over the whole clip, unthrottled.
+    Latencies come from the worker's own decode/resize histograms
+    (bucket-interpolated), throughput from published frames / wall time.
+    """
+    direction = f"bench-{label}"
+    video_feed._stop_event.clear()
+
+    worker = VideoStreamWorker(direction, clip_path, demand_driven=False, realtime=False, loop=False)
+    start = time.perf_counter()
+    worker.start()
+    worker.join()
+    wall_time = time.perf_counter() - start
+
+    frames = metrics.VIDEO_FRAMES.labels(direction).get()
+    decode = metrics.VIDEO_DECODE_SECONDS.labels(direction)
+    resize = metrics.VIDEO_RESIZE_SECONDS.labels(direction)
+
+    def ms(child, q):
+        value = child.quantile(q)
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "frames": frames,
+        "fps": round(frames / wall_time, 2) if wall_time > 0 else 0.0,
+        "decode_p50_ms": ms(decode, 0.50),
+        "decode_p99_ms": ms(decode, 0.99),
+        "resize_p50_ms": ms(resize, 0.50),
+        "resize_p99_ms": ms(resize, 0.99),
+    }
+
+
+def bench_replay(recording_path):
+    """
+    Runs one ReplayStreamWorker over the recording, unthrottled:
+    throughput of publishing stored frames (no decode, no resize).
+    """
+    direction = "north"
+    video_feed._stop_event.clear()
+    frames_total = metrics.VIDEO_FRAMES.labels(direction)
+    before = frames_total.get()
+
+    worker = ReplayStreamWorker(direction, recording_path, realtime=False, loop=False)
+    start = time.perf_counter()
+    worker.start()
+    worker.join()
+    wall_time = time.perf_counter() - start
+
+    frames = frames_total.get() - before
+    return {
+        "frames": frames,
+        "fps": round(frames / wall_time, 2) if wall_time > 0 else 0.0,
+    }
+
+
+def bench_detection(frames):
+    return time_stage(lambda f: count_vehicles(f, "bench"), frames)
+
+
+def bench_encode(frames):
+    return time_stage(encode_packet, frames)
+
+
+def run(resolutions, frame_count, clip_dir):
+    results = {}
+
+    for label in resolutions:
+        width, height = RESOLUTIONS[label]
+        clip = os.path.join(clip_dir, f"synthetic_{label}.avi")
+        if not os.path.exists(clip):
+            print(f"[BENCH] Generating {label} clip ({width}x{height}, {frame_count} frames)")
+            write_clip(clip, width, height, frame_count)
+        print(f"[BENCH] capture/{label}")
+        results[f"capture/{label}"] = bench_capture(clip, label)
+
+    recording = os.path.join(clip_dir, "synthetic_recording")
+    if not os.path.exists(recording):
+        print(f"[BENCH] Generating replay recording ({frame_count} frames)")
+        write_recording(recording, frame_count, directions=["north"])
+    print("[BENCH] replay")
+    results["replay"] = bench_replay(recording)
+
+    # Detection and encode always see stream-resolution frames
+    frames = list(synthetic_frames(FRAME_WIDTH, FRAME_HEIGHT, frame_count))
+    print("[BENCH] detection")
+    results["detection"] = bench_detection(frames)
+    print("[BENCH] encode")
+    results["encode"] = bench_encode(frames)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "frames": frame_count,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+
+
+# -------------------------------
+# COMPARISON
+# -------------------------------
+def compare(baseline, current, tolerance):
+    """
+    Returns a list of regression messages: throughput below, or p99
+    latency above, the baseline by more than `tolerance` (fraction).
+    """
+    regressions = []
+    for stage, new in current["results"].items():
+        old = baseline.get("results", {}).get(stage)
+        if not old:
+            continue
+        for key, new_value in new.items():
+            old_value = old.get(key)
+            if not old_value or new_value is None:
+                continue
+            if key == "fps" and new_value < old_value * (1 - tolerance):
+                regressions.append(f"{stage} {key}: {old_value} -> {new_value}")
+            elif key.endswith("p99_ms") and new_value > old_value * (1 + tolerance):
+                regressions.append(f"{stage} {key}: {old_value} -> {new_value}")
+    return regressions
+
+
+def print_report(report):
+    print()
+    # Capture rows show decode latency; resize is in the JSON
+    print(f"{'stage':<16}{'fps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for stage, r in report["results"].items():
+        p50 = r.get("p50_ms", r.get("decode_p50_ms"))
+        p99 = r.get("p99_ms", r.get("decode_p99_ms"))
+        print(f"{stage:<16}{r['fps']:>10}{str(p50):>10}{str(p99):>10}")
+    print(f"peak RSS: {report['peak_rss_mb']} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline traffic pipeline benchmark")
+    parser.add_argument("--resolutions", nargs="+", default=DEFAULT_RESOLUTIONS, choices=list(RESOLUTIONS))
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES)
+    parser.add_argument("--clip-dir", help="Directory to cache generated clips (default: temp dir)")
+    parser.add_argument("--output", help="Write JSON results here")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    if args.clip_dir:
+        os.makedirs(args.clip_dir, exist_ok=True)
+        report = run(args.resolutions, args.frames, args.clip_dir)
+    else:
+        with tempfile.TemporaryDirectory() as clip_dir:
+            report = run(args.resolutions, args.frames, clip_dir)
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[BENCH] Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance)
+        if regressions:
+            print("[BENCH] REGRESSIONS:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("[BENCH] No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# benchmarks/stream_load.py
+
+"""
+MJPEG load test against a running server.
+
+Opens N concurrent /stream/<direction> clients (spread over the four
+directions), counts the frames each one receives, and samples detection
+from /metrics before and during the load.
+
+Detection rates follow the signal timeline (core/detection_scheduler.py),
+so raw detection FPS moves with the phase whether or not anyone watches.
+The check uses attainment instead: achieved FPS / scheduled rate, summed
+over the directions and sampled once a second (median). Exits non-zero
+if clients failed or attainment under load is below 1 - --tolerance,
+i.e. detection fell behind its schedule. (Idle, attainment is a little
+above 1: the rate gates have half a tick of slack, so the drop from the
+baseline is reported but not checked.)
+
+Usage (server already running, e.g. `python asgi.py`):
+    python -m benchmarks.stream_load --clients 200 --duration 20
+    python -m benchmarks.stream_load --url http://127.0.0.1:5000 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import sys
+import time
+from urllib.parse import urlsplit
+
+DIRECTIONS = ["north", "south", "east", "west"]
+BOUNDARY = b"--frame"
+_FPS_LINE = re.compile(r'^traffic_detection_fps\{direction="(\w+)"\} ([0-9.eE+-]+)$', re.M)
+_RATE_LINE = re.compile(r'^traffic_detection_rate_hz\{direction="(\w+)"\} ([0-9.eE+-]+)$', re.M)
+
+
+# -------------------------------
+# HTTP HELPERS (raw asyncio, no client library)
+# -------------------------------
+async def _open(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    return reader, writer, status, head
+
+
+async def _get(host, port, path):
+    reader, writer, status, _ = await _open(host, port, path)
+    try:
+        body = await reader.read()
+    finally:
+        writer.close()
+    return status, body
+
+
+async def detection_fps(host, port):
+    """(achieved, scheduled): traffic_detection_fps / _rate_hz summed over directions."""
+    _, body = await _get(host, port, "/metrics")
+    text = body.decode()
+    achieved = sum(float(v) for _, v in _FPS_LINE.findall(text))
+    scheduled = sum(float(v) for _, v in _RATE_LINE.findall(text))
+    return achieved, scheduled
+
+
+async def sample_detection(host, port, seconds):
+    samples = []
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        samples.append(await detection_fps(host, port))
+        await asyncio.sleep(1.0)
+    return samples
+
+
+def attainment(samples):
+    """Median achieved / scheduled detection rate over (achieved, scheduled) samples."""
+    ratios = [a / s for a, s in samples if s > 0]
+    return statistics.median(ratios) if ratios else 0.0
+
+
+# -------------------------------
+# STREAM CLIENT
+# -------------------------------
+class StreamClient:
+    def __init__(self, direction):
+        self.direction = direction
+        self.frames = 0
+        self.bytes = 0
+        self.error = None
+        self._counting = False
+
+    def start_counting(self):
+        self.frames = 0
+        self.bytes = 0
+        self._counting = True
+
+    async def run(self, host, port, stop):
+        try:
+            reader, writer, status, _ = await _open(host, port, f"/stream/{self.direction}")
+        except (OSError, asyncio.IncompleteReadError) as e:
+            self.error = repr(e)
+            return
+        if status != 200:
+            self.error = f"HTTP {status}"
+            writer.close()
+            return
+
+        tail = b""
+        try:
+            while not stop.is_set():
+                chunk = await reader.read(65536)
+                if not chunk:
+                    self.error = "closed by server"
+                    break
+                # The boundary may straddle two reads
+                data = tail + chunk
+                if self._counting:
+                    self.frames += data.count(BOUNDARY)
+                    self.bytes += len(chunk)
+                tail = data[-(len(BOUNDARY) - 1):]
+        except OSError as e:
+            self.error = repr(e)
+        finally:
+            writer.close()
+
+
+# -------------------------------
+# MAIN
+# -------------------------------
+async def run_load(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+
+    print(f"[LOAD] Baseline detection FPS ({args.warmup:.0f}s)...")
+    baseline = await sample_detection(host, port, args.warmup)
+
+    stop = asyncio.Event()
+    clients = [StreamClient(DIRECTIONS[i % len(DIRECTIONS)]) for i in range(args.clients)]
+    tasks = [asyncio.ensure_future(c.run(host, port, stop)) for c in clients]
+
+    print(f"[LOAD] {args.clients} clients connected, warming up...")
+    await asyncio.sleep(args.warmup)
+
+    for c in clients:
+        c.start_counting()
+    start = time.monotonic()
+    loaded = await sample_detection(host, port, args.duration)
+    elapsed = time.monotonic() - start
+
+    stop.set()
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    fps = [c.frames / elapsed for c in clients if c.error is None]
+    failed = [c for c in clients if c.error is not None]
+    base_fps = statistics.mean(a for a, _ in baseline) if baseline else 0.0
+    load_fps = statistics.mean(a for a, _ in loaded) if loaded else 0.0
+    base_att = attainment(baseline)
+    load_att = attainment(loaded)
+
+    return {
+        "url": args.url,
+        "clients": args.clients,
+        "failed_clients": len(failed),
+        "errors": sorted({c.error for c in failed}),
+        "duration_s": round(elapsed, 1),
+        "client_fps_median": round(statistics.median(fps), 2) if fps else 0.0,
+        "client_fps_min": round(min(fps), 2) if fps else 0.0,
+        "total_mbit_s": round(sum(c.bytes for c in clients) * 8 / elapsed / 1e6, 1),
+        "detection_fps_baseline": round(base_fps, 2),
+        "detection_fps_under_load": round(load_fps, 2),
+        "detection_attainment_baseline": round(base_att, 3),
+        "detection_attainment_under_load": round(load_att, 3),
+        "detection_drop_from_baseline": round(1.0 - load_att / base_att, 3) if base_att > 0 else None,
+        "tolerance": args.tolerance,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MJPEG concurrent-viewer load test")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds before measuring")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed shortfall of detection under load against its schedule (fraction)")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_load(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    ok = report["failed_clients"] == 0
+    if report["detection_attainment_under_load"] < 1.0 - args.tolerance:
+        print(f"[LOAD] Detection fell behind its schedule under load "
+              f"(attainment {report['detection_attainment_under_load']}, tolerance {args.tolerance})")
+        ok = False
+    if report["failed_clients"]:
+        print(f"[LOAD] {report['failed_clients']} clients failed")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
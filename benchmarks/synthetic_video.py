@@ -0,0 +1,118 @@
+# benchmarks/synthetic_video.py
+
+"""
+Procedurally generated traffic clips (moving rectangles on a static
+road-like background), so the pipeline can be measured without the
+real videos/*.mp4 files.
+"""
+
+import cv2
+import numpy as np
+
+# Standard benchmark resolutions (width, height)
+RESOLUTIONS = {
+    "360p": (640, 360),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+
+def make_background(width, height, seed=0):
+    """
+    Static textured background: vertical gradient + fixed noise + lane lines.
+    """
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(60, 110, height, dtype=np.float32)[:, None]
+    gray = np.repeat(gradient, width, axis=1)
+    gray += rng.normal(0, 4, size=(height, width)).astype(np.float32)
+    bg = np.clip(gray, 0, 255).astype(np.uint8)
+
+    # Lane markings
+    for i in range(1, 4):
+        x = width * i // 4
+        bg[:, max(0, x - width // 400 - 1):x + width // 400 + 1] = 200
+
+    return cv2.cvtColor(bg, cv2.COLOR_GRAY2BGR)
+
+
+def make_vehicles(count, width, height, seed=0):
+    """
+    Random vehicle rectangles as an (N, 7) int array:
+    x0, y, w, h, speed (px/frame), and a BGR colour packed as 3 columns.
+    Sizes are relative to the frame so every resolution sees the same scene.
+    """
+    rng = np.random.default_rng(seed + 1)
+    w = (rng.uniform(0.06, 0.12, count) * width).astype(np.int64)
+    h = (rng.uniform(0.08, 0.16, count) * height).astype(np.int64)
+    x0 = rng.integers(0, width, count)
+    y = rng.integers(0, np.maximum(1, height - h))
+    speed = np.maximum(1, (rng.uniform(0.004, 0.015, count) * width)).astype(np.int64)
+    color = rng.integers(140, 255, size=(count, 3))
+    return np.column_stack([x0, y, w, h, speed, color])
+
+
+def render_frame(index, background, vehicles, out=None):
+    """
+    Draws frame `index`: vehicles move left->right and wrap around.
+    Writes into `out` if given (no allocation).
+    """
+    height, width = background.shape[:2]
+    if out is None:
+        out = background.copy()
+    else:
+        np.copyto(out, background)
+
+    for x0, y, w, h, speed, b, g, r in vehicles:
+        x = (x0 + index * speed) % (width + w) - w
+        x1, x2 = max(0, x), min(width, x + w)
+        if x2 > x1:
+            out[y:y + h, x1:x2] = (b, g, r)
+    return out
+
+
+def synthetic_frames(width, height, count, vehicles=6, seed=0):
+    """Yields `count` BGR frames of the synthetic scene."""
+    background = make_background(width, height, seed)
+    cars = make_vehicles(vehicles, width, height, seed)
+    for i in range(count):
+        yield render_frame(i, background, cars)
+
+
+def write_clip(path, width, height, count, fps=30.0, vehicles=6, seed=0):
+    """
+    Writes a synthetic clip readable by cv2.VideoCapture.
+    MJPG/AVI is used because every OpenCV build can encode and decode it.
+    Returns the path.
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot open video writer for {path}")
+    try:
+        for frame in synthetic_frames(width, height, count, vehicles, seed):
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def write_recording(path, count, directions=("north", "south", "east", "west"), fps=10.0,
+                    vehicles=6, seed=0, start=0.0):
+    """
+    Writes a synthetic replay recording (camera/recording.py) at stream
+    resolution: `count` frames per direction, one scene seed each, with
+    evenly spaced timestamps from `start`. Deterministic for a given
+    seed, so it doubles as a test / benchmark fixture. Returns the path.
+    """
+    from config import FRAME_WIDTH, FRAME_HEIGHT
+    from camera.recording import RecordingWriter
+
+    writer = RecordingWriter(path, directions, fps)
+    try:
+        for k, d in enumerate(directions):
+            frames = synthetic_frames(FRAME_WIDTH, FRAME_HEIGHT, count, vehicles, seed + k)
+            for i, frame in enumerate(frames):
+                writer.write_frame(d, frame, start + i / fps)
+    finally:
+        writer.close()
+    return path
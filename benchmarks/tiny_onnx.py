@@ -0,0 +1,178 @@
+# benchmarks/tiny_onnx.py
+
+"""
+Generates a tiny ONNX vehicle "detector" so the DNN backend
+(core/detectors.py) can be exercised and benchmarked offline, without
+downloading a real model or installing the onnx package.
+
+The graph is hand-built (minimal protobuf writer below) and follows the
+YOLOv8 output layout the backend expects - (N, 4 + classes, anchors),
+rows cx, cy, w, h in input pixels then class scores:
+
+    images (N, 3, H, W)
+      -> AveragePool CELL x CELL            (one anchor per grid cell)
+      -> Conv 1x1 -> Sigmoid                score: cell brighter than the road
+      -> Conv 1x1 (zero weights) + grid     boxes: CELL-strided, BOX_SIZE square
+      -> Concat -> Reshape                  (N, 5, anchors)
+
+It finds bright blobs on a darker road (the synthetic benchmark scene),
+which is all the plumbing needs; it is not a real vehicle model.
+
+Usage (from the repo root):
+    python -m benchmarks.tiny_onnx models/tiny_vehicles.onnx
+"""
+
+import os
+import struct
+import sys
+
+import numpy as np
+
+INPUT_SIZE = (320, 192)   # (W, H), multiples of CELL
+CELL = 16
+BOX_SIZE = 32.0
+SCORE_GAIN = 20.0         # sigmoid(GAIN * (mean brightness - THRESHOLD))
+SCORE_THRESHOLD = 0.5
+OPSET = 13
+
+_FLOAT = 1
+_INT64 = 7
+
+
+# -------------------------------
+# PROTOBUF WRITER
+# -------------------------------
+def _varint(value):
+    out = bytearray()
+    value &= (1 << 64) - 1
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _int(field, value):
+    return _key(field, 0) + _varint(value)
+
+
+def _bytes(field, data):
+    if isinstance(data, str):
+        data = data.encode()
+    return _key(field, 2) + _varint(len(data)) + data
+
+
+def _float(field, value):
+    return _key(field, 5) + struct.pack("<f", value)
+
+
+# -------------------------------
+# ONNX MESSAGES
+# -------------------------------
+def _tensor(name, array):
+    array = np.ascontiguousarray(array)
+    data_type = _INT64 if array.dtype == np.int64 else _FLOAT
+    array = array.astype("<i8" if data_type == _INT64 else "<f4")
+    msg = b"".join(_int(1, d) for d in array.shape)
+    return msg + _int(2, data_type) + _bytes(8, name) + _bytes(9, array.tobytes())
+
+
+def _attr_ints(name, values):
+    return _bytes(1, name) + b"".join(_int(8, v) for v in values) + _int(20, 7)
+
+
+def _attr_int(name, value):
+    return _bytes(1, name) + _int(3, value) + _int(20, 2)
+
+
+def _node(op_type, inputs, outputs, name, attributes=()):
+    msg = b"".join(_bytes(1, i) for i in inputs) + b"".join(_bytes(2, o) for o in outputs)
+    msg += _bytes(3, name) + _bytes(4, op_type)
+    return msg + b"".join(_bytes(5, a) for a in attributes)
+
+
+def _value_info(name, dims):
+    """dims: ints, or strings for symbolic (dynamic) dimensions."""
+    shape = b"".join(
+        _bytes(1, _bytes(2, d) if isinstance(d, str) else _int(1, d)) for d in dims
+    )
+    tensor_type = _int(1, _FLOAT) + _bytes(2, shape)
+    return _bytes(1, name) + _bytes(2, _bytes(1, tensor_type))
+
+
+# -------------------------------
+# MODEL
+# -------------------------------
+def build_model(input_size=INPUT_SIZE):
+    """Serialized ModelProto bytes."""
+    width, height = input_size
+    gw, gh = width // CELL, height // CELL
+    anchors = gw * gh
+
+    # Score: mean of the three channels, against the threshold
+    score_w = np.full((1, 3, 1, 1), SCORE_GAIN / 3, dtype=np.float32)
+    score_b = np.array([-SCORE_GAIN * SCORE_THRESHOLD], dtype=np.float32)
+    zero_w = np.zeros((4, 3, 1, 1), dtype=np.float32)
+    zero_b = np.zeros(4, dtype=np.float32)
+
+    # Fixed box per cell: centre of the cell, BOX_SIZE square
+    cx, cy = np.meshgrid((np.arange(gw) + 0.5) * CELL, (np.arange(gh) + 0.5) * CELL)
+    grid = np.stack([cx, cy, np.full_like(cx, BOX_SIZE), np.full_like(cy, BOX_SIZE)])
+    grid = grid.reshape(1, 4, gh, gw).astype(np.float32)
+
+    nodes = [
+        _node("AveragePool", ["images"], ["pooled"], "pool",
+              [_attr_ints("kernel_shape", [CELL, CELL]), _attr_ints("strides", [CELL, CELL])]),
+        _node("Conv", ["pooled", "score_w", "score_b"], ["logits"], "score_conv"),
+        _node("Sigmoid", ["logits"], ["score"], "score"),
+        _node("Conv", ["pooled", "zero_w", "zero_b"], ["zeros"], "box_conv"),
+        _node("Add", ["zeros", "grid"], ["boxes"], "boxes"),
+        _node("Concat", ["boxes", "score"], ["joined"], "concat", [_attr_int("axis", 1)]),
+        _node("Reshape", ["joined", "out_shape"], ["output0"], "reshape"),
+    ]
+    initializers = [
+        _tensor("score_w", score_w),
+        _tensor("score_b", score_b),
+        _tensor("zero_w", zero_w),
+        _tensor("zero_b", zero_b),
+        _tensor("grid", grid),
+        _tensor("out_shape", np.array([0, 5, anchors], dtype=np.int64)),
+    ]
+
+    graph = b"".join(_bytes(1, n) for n in nodes)
+    graph += _bytes(2, "tiny_vehicles")
+    graph += b"".join(_bytes(5, t) for t in initializers)
+    graph += _bytes(11, _value_info("images", ["batch", 3, height, width]))
+    graph += _bytes(12, _value_info("output0", ["batch", 5, anchors]))
+
+    opset = _bytes(1, "") + _int(2, OPSET)
+    return _int(1, 7) + _bytes(2, "traffic-guard") + _bytes(7, graph) + _bytes(8, opset)
+
+
+def write_model(path, input_size=INPUT_SIZE):
+    """Writes the model to `path` (creating directories). Returns the path."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(build_model(input_size))
+    return path
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else "models/tiny_vehicles.onnx"
+    write_model(path)
+    print(f"[BENCH] Tiny ONNX detector written to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,276 @@
 # camera/mjpeg_stream.py
 
+import os
 import cv2
 import time
-from camera.video_feed import get_latest_frame
+import threading
+import numpy as np
+from threading import Lock
+from config import FRAME_WIDTH, FRAME_HEIGHT
+from camera.video_feed import wait_for_frame, wait_for_any_frame, release_frames, set_frame_demand
+from utils import metrics
+from utils.buffer_pool import BufferPool
+from utils.listeners import ListenerMixin
 
-def generate_stream(direction):
+# -------------------------------
+# CONFIG
+# -------------------------------
+JPEG_QUALITY = 60         # Quality 60 is optimal for MJPEG speed
+STREAM_INTERVAL = 0.033   # ~30 FPS cap per direction
+IDLE_INTERVAL = 0.1       # Poll rate while nobody is watching
+# Broadcaster threads run at a lower OS priority (Linux per-thread nice):
+# on a busy CPU the streams lose frames before detection falls behind
+STREAM_THREAD_NICE = 10
+
+# Per-direction renditions, picked with ?rendition=<name>
+# (None = stream resolution, no resize)
+RENDITIONS = {
+    "full": None,
+    "thumb": (426, 240),
+}
+DEFAULT_RENDITION = "full"
+
+# /stream/mosaic: all four directions tiled 2x2 into one frame
+MOSAIC = "mosaic"
+MOSAIC_LAYOUT = {"north": (0, 0), "south": (0, 1), "east": (1, 0), "west": (1, 1)}  # (row, col)
+MOSAIC_TILE = (FRAME_WIDTH // 2, FRAME_HEIGHT // 2)
+
+# One broadcaster per (direction, rendition), shared by every viewer
+_broadcasters = {}
+_broadcaster_lock = Lock()
+
+
+def encode_packet(frame):
     """
-    Ultra-lightweight Streamer.
-    No resizing, no detection, no decoding here.
-    Just Encode -> Send.
+    JPEG-encodes a frame and wraps it as a multipart chunk.
+    Returns None if encoding fails.
     """
-    while True:
-        # 1. GET PRE-PROCESSED FRAME
-        frame = get_latest_frame(direction)
+    try:
+        ret, buffer = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
+    except Exception:
+        return None
+    if not ret:
+        return None
+    return (
+        b"--frame\r\n"
+        b"Content-Type: image/jpeg\r\n\r\n" +
+        buffer.tobytes() + b"\r\n"
+    )
+
+
+class MJPEGBroadcaster(ListenerMixin, threading.Thread):
+    """
+    Encode-once streamer for a single direction and rendition:
+    1. Picks up each NEW frame from the video buffer
+    2. Resizes it for the rendition (if needed) and JPEG-encodes it once
+    3. Publishes the same bytes to every subscriber
+
+    Subscribers always read the newest packet, so a slow client
+    simply skips frames instead of stalling the encoder.
+    """
+    def __init__(self, direction, rendition=DEFAULT_RENDITION):
+        super().__init__()
+        self.direction = direction
+        self.rendition = rendition
+        self.daemon = True
+        self.running = True
+
+        # Metric label / frame-demand consumer name
+        self.name_label = direction if rendition == DEFAULT_RENDITION else f"{direction}:{rendition}"
+        self._demand_directions = [direction]
+        self._size = RENDITIONS[rendition]
+        self._pool = BufferPool()
+        self._last_seq = 0
 
-        if frame is None:
-            # If no frame yet (startup), send a black placeholder
-            # or wait briefly
-            time.sleep(0.1)
-            continue
+        self._cond = threading.Condition()
+        self._packet = None
+        self._seq = 0
+        self._subscribers = 0
 
-        # 2. ENCODE
-        # Quality 60 is optimal for MJPEG speed
+    def run(self):
+        print(f"[STREAM] Broadcaster started for {self.name_label}")
         try:
-            ret, buffer = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 60])
-            if ret:
-                frame_bytes = buffer.tobytes()
-                yield (
-                    b"--frame\r\n"
-                    b"Content-Type: image/jpeg\r\n\r\n" +
-                    frame_bytes + b"\r\n"
-                )
-        except:
-            pass
-
-        # 3. SYNC
-        # Limit stream to ~30 FPS to save bandwidth
-        time.sleep(0.033)
\ No newline at end of file
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), STREAM_THREAD_NICE)
+        except (AttributeError, OSError):
+            pass   # not Linux: same priority as detection
+        encode_hist = metrics.MJPEG_ENCODE_SECONDS.labels(self.name_label)
+        fps_rate = metrics.MJPEG_FPS.labels(self.name_label)
+
+        while self.running:
+            # Nobody watching -> don't burn CPU on encoding
+            if self._subscribers == 0:
+                time.sleep(IDLE_INTERVAL)
+                continue
+
+            # Sleep until the producer publishes a new frame
+            frame, leased = self._next_frame(IDLE_INTERVAL)
+            start = time.time()
+
+            # Only encode when there is a new frame
+            if frame is not None:
+                t0 = time.perf_counter()
+                packet = encode_packet(frame)
+                encode_hist.observe(time.perf_counter() - t0)
+                release_frames(leased)
+                if packet is not None:
+                    fps_rate.mark()
+                    with self._cond:
+                        self._packet = packet
+                        self._seq += 1
+                        self._cond.notify_all()
+                    self._notify_listeners()
+
+            elapsed = time.time() - start
+            if elapsed < STREAM_INTERVAL:
+                time.sleep(STREAM_INTERVAL - elapsed)
+
+    def _next_frame(self, timeout):
+        """
+        Waits for a new source frame. Returns (frame ready to encode, or
+        None if nothing new arrived within timeout; leased source slots
+        to release once it is encoded).
+        """
+        slot = wait_for_frame(self.direction, self._last_seq, timeout=timeout, lease=True)
+        if slot.frame is None or slot.seq == self._last_seq:
+            slot.release()
+            return None, ()
+        self._last_seq = slot.seq
+
+        if self._size is None:
+            # Encoded straight from the source buffer: stays leased until then
+            return slot.frame, (slot,)
+        width, height = self._size
+        out = self._pool.get("rendition", (height, width) + slot.frame.shape[2:], slot.frame.dtype)
+        cv2.resize(slot.frame, self._size, dst=out, interpolation=cv2.INTER_AREA)
+        slot.release()
+        return out, ()
+
+    def _set_demand(self, fps):
+        consumer = "stream:" + self.name_label
+        for d in self._demand_directions:
+            set_frame_demand(d, consumer, fps)
+
+    def subscribe(self):
+        with self._cond:
+            self._subscribers += 1
+            metrics.MJPEG_SUBSCRIBERS.labels(self.name_label).set(self._subscribers)
+            if self._subscribers == 1:
+                self._set_demand(1.0 / STREAM_INTERVAL)
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers = max(0, self._subscribers - 1)
+            metrics.MJPEG_SUBSCRIBERS.labels(self.name_label).set(self._subscribers)
+            if self._subscribers == 0:
+                self._set_demand(0)
+
+    def subscriber_count(self):
+        with self._cond:
+            return self._subscribers
+
+    def wait_for_packet(self, last_seq, timeout=1.0):
+        """
+        Blocks until a packet newer than last_seq is available.
+        Returns (seq, packet); packet may be None on startup/timeout.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != last_seq or not self.running, timeout)
+            return self._seq, self._packet
+
+    def stop(self):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        self._notify_listeners()
+
+
+class MosaicBroadcaster(MJPEGBroadcaster):
+    """
+    One 2x2 stream of all four directions: each new frame is resized
+    straight into its slice of a preallocated canvas (only the tiles
+    that changed), and the canvas is encoded once per update.
+    """
+    def __init__(self):
+        super().__init__(MOSAIC)
+        self._demand_directions = list(MOSAIC_LAYOUT)
+        self._last_seqs = {d: 0 for d in MOSAIC_LAYOUT}
+
+        tile_w, tile_h = MOSAIC_TILE
+        self._canvas = np.zeros((tile_h * 2, tile_w * 2, 3), dtype=np.uint8)
+        self._tiles = {
+            d: self._canvas[r * tile_h:(r + 1) * tile_h, c * tile_w:(c + 1) * tile_w]
+            for d, (r, c) in MOSAIC_LAYOUT.items()
+        }
+
+    def _next_frame(self, timeout):
+        slots = wait_for_any_frame(self._last_seqs, timeout=timeout, lease=True)
+
+        updated = False
+        for d, tile in self._tiles.items():
+            slot = slots.get(d)
+            if slot is None or slot.frame is None or slot.seq == self._last_seqs[d]:
+                continue
+            self._last_seqs[d] = slot.seq
+            # Writes into the canvas view, no intermediate copy
+            cv2.resize(slot.frame, MOSAIC_TILE, dst=tile, interpolation=cv2.INTER_AREA)
+            updated = True
+        release_frames(slots.values())
+
+        return (self._canvas if updated else None), ()
+
+
+def get_broadcaster(direction, rendition=DEFAULT_RENDITION):
+    """
+    Returns the shared broadcaster for a direction (or MOSAIC) and
+    rendition, starting it on first use.
+    """
+    if direction == MOSAIC:
+        rendition = DEFAULT_RENDITION
+    key = (direction, rendition)
+
+    with _broadcaster_lock:
+        broadcaster = _broadcasters.get(key)
+        if broadcaster is None or not broadcaster.is_alive():
+            if direction == MOSAIC:
+                broadcaster = MosaicBroadcaster()
+            else:
+                broadcaster = MJPEGBroadcaster(direction, rendition)
+            broadcaster.start()
+            _broadcasters[key] = broadcaster
+        return broadcaster
+
+
+def stop_broadcasters():
+    with _broadcaster_lock:
+        for broadcaster in _broadcasters.values():
+            broadcaster.stop()
+        _broadcasters.clear()
+
+
+def generate_stream(direction, rendition=DEFAULT_RENDITION):
+    """
+    Ultra-lightweight Streamer.
+    No resizing, no detection, no decoding, no encoding here.
+    Just Wait -> Send the shared bytes.
+    """
+    broadcaster = get_broadcaster(direction, rendition)
+    broadcaster.subscribe()
+    dropped = metrics.MJPEG_CLIENT_FRAMES_DROPPED.labels(broadcaster.name_label)
+
+    try:
+        seq = 0
+        while broadcaster.running:
+            new_seq, packet = broadcaster.wait_for_packet(seq)
+
+            # No frame yet (startup) or nothing new within the timeout
+            if packet is None or new_seq == seq:
+                continue
+
+            # Packets published while this client was still sending
+            if seq and new_seq - seq > 1:
+                dropped.inc(new_seq - seq - 1)
+
+            seq = new_seq
+            yield packet
+    finally:
+        broadcaster.unsubscribe()
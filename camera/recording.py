@@ -0,0 +1,371 @@
+# camera/recording.py
+
+"""
+Record-and-replay of the resized (stream-resolution) frames.
+
+A recording is a directory:
+
+    meta.json                   format version, frame shape, fps, chunk size
+    <direction>/000000.frames   raw uint8 frames, back to back (H x W x 3 each)
+    <direction>/000000.times    float64 capture timestamp per frame
+    <direction>/counts          (t float64, count int32) per detection result
+
+Frames are stored exactly as the video workers publish them, so replay
+needs no decoding: Recording maps every chunk with numpy.memmap and
+frame(d, i) is a view into the page cache, published as-is. Chunks keep
+single files bounded (RECORD_CHUNK_FRAMES frames, ~0.7 MB each at 360p)
+and a crash loses at most the frame being written.
+
+CaptureRecorder records the live pipeline (frames at RECORD_FPS plus the
+counts DetectionService produced for them); ReplayStreamWorker is a
+drop-in source for start_video_feeds(); Recording.frame_at() serves the
+headless simulation and benchmark fixtures.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from threading import Lock
+
+import numpy as np
+
+from config import FRAME_WIDTH, FRAME_HEIGHT, RECORDINGS_DIR, RECORD_FPS, RECORD_CHUNK_FRAMES
+from camera import video_feed
+from camera.video_feed import publish_frame, set_frame_demand, wait_for_any_frame, release_frames
+from utils import clock, metrics
+
+FORMAT_VERSION = 1
+DIRECTIONS = ["north", "south", "east", "west"]
+COUNT_DTYPE = np.dtype([("t", "<f8"), ("count", "<i4")])
+TIME_DTYPE = np.dtype("<f8")
+
+_recorder = None
+_recorder_lock = Lock()
+
+
+def _chunk_path(path, direction, index, suffix):
+    return os.path.join(path, direction, "%06d.%s" % (index, suffix))
+
+
+# -------------------------------
+# WRITER
+# -------------------------------
+class RecordingWriter:
+    """
+    Appends frames and counts to a recording directory (not thread-safe;
+    CaptureRecorder owns one from its own thread).
+    """
+    def __init__(self, path, directions=DIRECTIONS, fps=RECORD_FPS, chunk_frames=RECORD_CHUNK_FRAMES,
+                 shape=(FRAME_HEIGHT, FRAME_WIDTH, 3)):
+        self.path = path
+        self.shape = tuple(shape)
+        self.chunk_frames = chunk_frames
+        self.frames = {d: 0 for d in directions}
+        self._files = {}     # direction -> (frames file, times file)
+        self._counts = {}
+
+        for d in directions:
+            os.makedirs(os.path.join(path, d), exist_ok=True)
+            self._counts[d] = open(os.path.join(path, d, "counts"), "ab", buffering=0)
+
+        meta = {
+            "version": FORMAT_VERSION,
+            "height": self.shape[0],
+            "width": self.shape[1],
+            "channels": self.shape[2],
+            "fps": fps,
+            "chunk_frames": chunk_frames,
+            "directions": list(directions),
+            "created": clock.time(),
+        }
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def write_frame(self, direction, frame, t):
+        if frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} != recording shape {self.shape}")
+
+        n = self.frames[direction]
+        if n % self.chunk_frames == 0:
+            self._close_chunk(direction)
+            index = n // self.chunk_frames
+            self._files[direction] = (
+                open(_chunk_path(self.path, direction, index, "frames"), "wb", buffering=0),
+                open(_chunk_path(self.path, direction, index, "times"), "wb", buffering=0),
+            )
+
+        frames_file, times_file = self._files[direction]
+        # Frame first: a torn write leaves a frame without a timestamp,
+        # which the reader ignores
+        frames_file.write(memoryview(np.ascontiguousarray(frame)).cast("B"))
+        times_file.write(np.array(t, dtype=TIME_DTYPE).tobytes())
+        self.frames[direction] = n + 1
+
+    def write_count(self, direction, count, t):
+        f = self._counts.get(direction)
+        if f is not None:
+            f.write(np.array((t, count), dtype=COUNT_DTYPE).tobytes())
+
+    def _close_chunk(self, direction):
+        files = self._files.pop(direction, None)
+        if files is not None:
+            for f in files:
+                f.close()
+
+    def close(self):
+        for d in list(self._files):
+            self._close_chunk(d)
+        for f in self._counts.values():
+            f.close()
+        self._counts = {}
+
+
+# -------------------------------
+# READER
+# -------------------------------
+class Recording:
+    """
+    Read-only view of a recording. Chunks are memory-mapped on first use
+    per direction; frame() returns views, never copies.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported recording version: {self.meta.get('version')}")
+
+        self.shape = (self.meta["height"], self.meta["width"], self.meta["channels"])
+        self.directions = self.meta["directions"]
+        self._frame_bytes = int(np.prod(self.shape))
+        self._tracks = {}    # direction -> (chunk memmaps, chunk start indices, timestamps)
+
+    def _track(self, direction):
+        track = self._tracks.get(direction)
+        if track is not None:
+            return track
+        if direction not in self.directions:
+            raise ValueError(f"Direction not in recording: {direction}")
+
+        chunks, starts, times = [], [], []
+        total = 0
+        index = 0
+        while os.path.exists(_chunk_path(self.path, direction, index, "frames")):
+            frames_path = _chunk_path(self.path, direction, index, "frames")
+            t = np.fromfile(_chunk_path(self.path, direction, index, "times"), dtype=TIME_DTYPE)
+            n = min(os.path.getsize(frames_path) // self._frame_bytes, t.size)
+            if n > 0:
+                chunks.append(np.memmap(frames_path, dtype=np.uint8, mode="r", shape=(n,) + self.shape))
+                starts.append(total)
+                times.append(t[:n])
+                total += n
+            index += 1
+
+        timestamps = np.concatenate(times) if times else np.zeros(0, dtype=TIME_DTYPE)
+        track = (chunks, np.asarray(starts, dtype=np.int64), timestamps)
+        self._tracks[direction] = track
+        return track
+
+    def frame_count(self, direction):
+        return self._track(direction)[2].size
+
+    def timestamps(self, direction):
+        """Capture timestamps (unix time) of every frame, in order."""
+        return self._track(direction)[2]
+
+    def frame(self, direction, i):
+        """Frame i as a read-only view into the mapped chunk."""
+        chunks, starts, _ = self._track(direction)
+        c = int(np.searchsorted(starts, i, side="right")) - 1
+        return chunks[c][i - starts[c]]
+
+    def frame_at(self, direction, t):
+        """
+        The frame showing at `t` seconds into the recording, looping at
+        the end (the same contract as simulation.ClipReader.frame_at).
+        """
+        timestamps = self._track(direction)[2]
+        if timestamps.size == 0:
+            raise ValueError(f"No frames for {direction} in {self.path}")
+        t = timestamps[0] + t % self.duration(direction)
+        i = int(np.searchsorted(timestamps, t, side="right")) - 1
+        return self.frame(direction, max(i, 0))
+
+    def duration(self, direction):
+        """Seconds covered, including the last frame's own interval."""
+        timestamps = self._track(direction)[2]
+        if timestamps.size == 0:
+            return 0.0
+        return float(timestamps[-1] - timestamps[0]) + 1.0 / self.meta["fps"]
+
+    def counts(self, direction):
+        """Recorded detection results: structured array of (t, count)."""
+        path = os.path.join(self.path, direction, "counts")
+        if not os.path.exists(path):
+            return np.zeros(0, dtype=COUNT_DTYPE)
+        return np.fromfile(path, dtype=COUNT_DTYPE)
+
+
+# -------------------------------
+# REPLAY SOURCE
+# -------------------------------
+class ReplayStreamWorker(threading.Thread):
+    """
+    Drop-in for VideoStreamWorker that publishes a recording's frames.
+    No decode and no resize: each frame is a memmap view.
+
+    Frames keep their recorded spacing; realtime=False publishes them
+    back to back and loop=False stops at the end (benchmarks / tests).
+    """
+    def __init__(self, direction, recording_path, realtime=True, loop=True):
+        super().__init__()
+        self.direction = direction
+        self.source = recording_path
+        self.realtime = realtime
+        self.loop = loop
+        self.daemon = True
+
+    def run(self):
+        print(f"[VIDEO] Starting replay for {self.direction} from {self.source}")
+        recording = Recording(self.source)
+        timestamps = recording.timestamps(self.direction)
+        if timestamps.size == 0:
+            print(f"[VIDEO] No frames for {self.direction} in {self.source}")
+            return
+
+        offsets = timestamps - timestamps[0]
+        span = recording.duration(self.direction)
+        frames_total = metrics.VIDEO_FRAMES.labels(self.direction)
+        fps_rate = metrics.VIDEO_FPS.labels(self.direction)
+
+        base = clock.monotonic()
+        i = 0
+        while not video_feed._stop_event.is_set():
+            if i == offsets.size:
+                if not self.loop:
+                    break
+                i = 0
+                base += span
+
+            if self.realtime:
+                delay = base + offsets[i] - clock.monotonic()
+                if delay > 0:
+                    clock.sleep(delay)
+
+            publish_frame(self.direction, recording.frame(self.direction, i))
+            frames_total.inc()
+            fps_rate.mark()
+            i += 1
+
+
+# -------------------------------
+# RECORDER
+# -------------------------------
+class CaptureRecorder(threading.Thread):
+    """
+    Records the published frames of every direction at `fps` plus every
+    count passed to record_count(). File writes happen on this thread
+    only; the detection hot path just appends to a deque.
+    """
+    def __init__(self, path, fps=RECORD_FPS, directions=DIRECTIONS):
+        super().__init__()
+        self.daemon = True
+        self.running = True
+        self.path = path
+        self.fps = fps
+        self.directions = list(directions)
+        self.writer = RecordingWriter(path, self.directions, fps)
+        self._counts = deque(maxlen=100000)
+
+    def record_count(self, direction, count, t):
+        self._counts.append((direction, count, t))
+
+    def run(self):
+        print(f"[REC] Recording to {self.path} at {self.fps} FPS")
+        interval = 1.0 / self.fps
+        last_seqs = {d: 0 for d in self.directions}
+        next_due = {d: 0.0 for d in self.directions}
+        last_seen = {d: 0.0 for d in self.directions}
+
+        for d in self.directions:
+            set_frame_demand(d, "recorder", self.fps)
+        try:
+            while self.running:
+                slots = wait_for_any_frame(last_seqs, timeout=1.0, lease=True)
+                now = clock.monotonic()
+
+                try:
+                    for d in self.directions:
+                        slot = slots.get(d)
+                        if slot is None or slot.frame is None or slot.seq <= last_seqs[d]:
+                            continue
+                        last_seqs[d] = slot.seq
+                        spacing = now - last_seen[d]
+                        last_seen[d] = now
+                        if now < next_due[d]:
+                            continue
+                        # Half a source frame of slack, as in the video workers
+                        next_due[d] = now + interval - min(spacing, interval) / 2
+                        self.writer.write_frame(d, slot.frame, slot.timestamp)
+                finally:
+                    # Even if a write fails: held leases would grow every ring
+                    release_frames(slots.values())
+
+                self._drain()
+        finally:
+            for d in self.directions:
+                set_frame_demand(d, "recorder", 0)
+            self._drain()
+            self.writer.close()
+            print(f"[REC] Stopped: {self.writer.frames}")
+
+    def _drain(self):
+        while self._counts:
+            self.writer.write_count(*self._counts.popleft())
+
+    def stop(self):
+        self.running = False
+
+
+# -------------------------------
+# MODULE API
+# -------------------------------
+def start_recording(path=None, fps=RECORD_FPS):
+    """
+    Starts recording (once). Default path: RECORDINGS_DIR/<date-time>.
+    Returns the recorder.
+    """
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None or not _recorder.is_alive():
+            if path is None:
+                path = os.path.join(RECORDINGS_DIR, time.strftime("%Y%m%d-%H%M%S"))
+            _recorder = CaptureRecorder(path, fps)
+            _recorder.start()
+        return _recorder
+
+
+def stop_recording():
+    """Stops the recorder and closes its files."""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is not None:
+            _recorder.stop()
+            _recorder.join(timeout=5.0)
+            _recorder = None
+
+
+def record_count(direction, count, t=None):
+    """Records one detection result (no-op while not recording)."""
+    recorder = _recorder
+    if recorder is not None:
+        recorder.record_count(direction, count, clock.time() if t is None else t)
+
+
+def get_recording_status():
+    recorder = _recorder
+    if recorder is None:
+        return {"active": False}
+    return {"active": True, "path": recorder.path, "fps": recorder.fps, "frames": dict(recorder.writer.frames)}
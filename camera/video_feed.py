@@ -5,6 +5,10 @@ import time
 import threading
 from threading import Lock
 
+from config import DEMAND_DRIVEN_DECODE, FRAME_WIDTH, FRAME_HEIGHT, REPLAY_PATH
+from utils.buffer_pool import FrameRing
+from utils import clock, metrics
+
 # -------------------------------
 # CONFIG
 # -------------------------------
@@ -16,31 +20,128 @@ VIDEO_FILES = {
 }
 
 # The single "source of truth" for frames
-# Format: { "north": resized_frame_array, ... }
-_latest_frames = {}
+# Format: { "north": FrameSlot(frame, seq, timestamp), ... }
+_frame_slots = {}
 _frame_lock = Lock()
+# Notified every time any direction publishes a new frame
+_frame_cond = threading.Condition(_frame_lock)
+
+# Consumer demand (frames/sec) per direction
+# Format: { "north": { "detection": 10.0, "stream": 30.0 }, ... }
+_demand = {}
+_demand_lock = Lock()
+
+# Retrieve rate when no consumer has registered (keeps the buffer warm)
+IDLE_DEMAND_FPS = 1.0
 
 # Control flags
 _active_threads = {}
 _stop_event = threading.Event()
 
 
+class FrameSlot:
+    """
+    Latest frame for one direction, plus:
+    - seq: monotonic per-direction sequence number (starts at 1)
+    - timestamp: wall-clock capture time of the frame
+    - ring, index: the FrameRing buffer holding the frame (None for
+      frames that are never rewritten, e.g. replayed memmap views)
+    """
+    __slots__ = ("frame", "seq", "timestamp", "ring", "index")
+
+    def __init__(self, frame=None, seq=0, timestamp=0.0, ring=None, index=None):
+        self.frame = frame
+        self.seq = seq
+        self.timestamp = timestamp
+        self.ring = ring
+        self.index = index
+
+    def acquire(self):
+        if self.ring is not None:
+            self.ring.acquire(self.index)
+
+    def release(self):
+        if self.ring is not None:
+            self.ring.release(self.index)
+
+
+_EMPTY_SLOT = FrameSlot()
+
+
+def publish_frame(direction, frame, timestamp=None, ring=None):
+    """
+    Swaps in a new frame for a direction and wakes up any waiters.
+    `ring`: the FrameRing the frame came from (its last next()); the
+    buffer stays leased while it is the published frame.
+    Returns the new sequence number.
+    """
+    if timestamp is None:
+        timestamp = clock.time()
+    with _frame_cond:
+        prev = _frame_slots.get(direction, _EMPTY_SLOT)
+        slot = FrameSlot(frame, prev.seq + 1, timestamp, ring, ring.index if ring is not None else None)
+        slot.acquire()
+        prev.release()
+        _frame_slots[direction] = slot
+        _frame_cond.notify_all()
+        return slot.seq
+
+
+def set_frame_demand(direction, consumer, fps):
+    """
+    Registers how many frames/sec a consumer needs from a direction.
+    fps <= 0 removes the consumer.
+    """
+    with _demand_lock:
+        consumers = _demand.setdefault(direction, {})
+        if fps and fps > 0:
+            consumers[consumer] = float(fps)
+        else:
+            consumers.pop(consumer, None)
+
+
+def get_frame_demand(direction):
+    """
+    Frames/sec the direction's worker must deliver.
+    One decoded frame serves every consumer, so this is the MAX of the
+    registered rates, not the sum.
+    """
+    with _demand_lock:
+        consumers = _demand.get(direction)
+        if not consumers:
+            return IDLE_DEMAND_FPS
+        return max(consumers.values())
+
+
 class VideoStreamWorker(threading.Thread):
     """
     Worker thread that:
     1. Reads 4K Video
     2. Resizes to 360p IMMEDIATELY
     3. Updates the global buffer
+
+    demand_driven=True: every source frame is grab()bed (keeps playback
+    in sync), but retrieve() + resize only run when a consumer is due a
+    frame according to get_frame_demand().
+
+    The decoded source frame and the resized outputs live in
+    preallocated buffers (FrameRing), so the loop doesn't allocate.
+
+    realtime=False drops the FPS sync sleep and loop=False stops at the
+    end of a file instead of rewinding (used by the benchmarks).
     """
-    def __init__(self, direction, source_path, is_live=False):
+    def __init__(self, direction, source_path, is_live=False, demand_driven=DEMAND_DRIVEN_DECODE,
+                 realtime=True, loop=True):
         super().__init__()
         self.direction = direction
         self.source = source_path
         self.is_live = is_live
+        self.demand_driven = demand_driven
+        self.realtime = realtime
+        self.loop = loop
         self.daemon = True
 
     def run(self):
-        global _latest_frames
         print(f"[VIDEO] Starting worker for {self.direction}")
         
         cap = cv2.VideoCapture(self.source)
@@ -51,53 +152,103 @@ class VideoStreamWorker(threading.Thread):
         fps = cap.get(cv2.CAP_PROP_FPS)
         if fps <= 0 or fps > 120: fps = 30.0
         interval = 1.0 / fps
+        next_due = 0.0
+
+        # Preallocated buffers: decoder output + ring of published frames
+        decoded = None
+        ring = FrameRing()
+        out_shape = (FRAME_HEIGHT, FRAME_WIDTH, 3)
+
+        # Metrics (children resolved once, outside the loop)
+        decode_hist = metrics.VIDEO_DECODE_SECONDS.labels(self.direction)
+        resize_hist = metrics.VIDEO_RESIZE_SECONDS.labels(self.direction)
+        frames_total = metrics.VIDEO_FRAMES.labels(self.direction)
+        frames_skipped = metrics.VIDEO_FRAMES_SKIPPED.labels(self.direction)
+        fps_rate = metrics.VIDEO_FPS.labels(self.direction)
 
         while not _stop_event.is_set():
-            start = time.time()
+            start = clock.time()
 
             # 1. READ (Decoding)
-            success, frame = cap.read()
+            t0 = time.perf_counter()
+            if self.demand_driven:
+                # Advance the stream cheaply; only decode if someone is due
+                success = cap.grab()
+                frame = None
+                if success and start >= next_due:
+                    success, frame = cap.retrieve(decoded)
+                    # Half a source frame of slack keeps e.g. 10 Hz on a
+                    # 30 FPS file at exactly every 3rd frame
+                    next_due = start + 1.0 / get_frame_demand(self.direction) - interval / 2
+                elif success:
+                    frames_skipped.inc()
+            else:
+                success, frame = cap.read(decoded)
+            captured_at = clock.time()
+            decode_hist.observe(time.perf_counter() - t0)
 
             # Handle Loop / Reconnect
             if not success:
+                if not self.is_live and not self.loop:
+                    break
                 if not self.is_live:
                     cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
                     continue
                 else:
-                    time.sleep(1)
+                    clock.sleep(1)
                     cap = cv2.VideoCapture(self.source) # Reconnect live
                     continue
 
             # 2. RESIZE (CPU Optimization)
             # We resize ONCE here, so Detection & Stream don't have to.
             # Using INTER_NEAREST for speed.
-            try:
-                frame = cv2.resize(frame, (640, 360), interpolation=cv2.INTER_NEAREST)
-            except:
-                continue
+            # (frame is None when the grab wasn't due for a retrieve)
+            if frame is not None:
+                decoded = frame
+                t0 = time.perf_counter()
+                try:
+                    frame = cv2.resize(frame, (FRAME_WIDTH, FRAME_HEIGHT), dst=ring.next(out_shape),
+                                       interpolation=cv2.INTER_NEAREST)
+                except:
+                    continue
+                resize_hist.observe(time.perf_counter() - t0)
 
-            # 3. UPDATE SHARED BUFFER
-            with _frame_lock:
-                _latest_frames[self.direction] = frame
+                # 3. UPDATE SHARED BUFFER
+                publish_frame(self.direction, frame, captured_at, ring)
+                frames_total.inc()
+                fps_rate.mark()
 
             # 4. SYNC (Don't consume 100% CPU)
-            elapsed = time.time() - start
+            if not self.realtime:
+                continue
+            elapsed = clock.time() - start
             delay = interval - elapsed
             if delay > 0:
-                time.sleep(delay)
+                clock.sleep(delay)
 
         cap.release()
 
 
-def start_video_feeds(is_simulation=True):
+def start_video_feeds(is_simulation=True, replay_path=REPLAY_PATH):
     """
     Initializes all 4 video threads.
+    In simulation mode, replay_path (a recording directory) replaces the
+    video files with ReplayStreamWorkers.
     """
     global _active_threads, _stop_event
     _stop_event.clear()
 
     directions = ["north", "south", "east", "west"]
 
+    if is_simulation and replay_path:
+        from camera.recording import Recording, ReplayStreamWorker
+        for d in Recording(replay_path).directions:
+            if d not in _active_threads:
+                worker = ReplayStreamWorker(d, replay_path)
+                worker.start()
+                _active_threads[d] = worker
+        return
+
     for d in directions:
         # Determine source
         src = 0 if (d == "north" and not is_simulation) else VIDEO_FILES.get(d)
@@ -115,10 +266,67 @@ def start_video_feeds(is_simulation=True):
 def get_latest_frame(direction):
     """
     Instant retrieval from memory. No processing cost.
+    Not leased: the buffer can be rewritten a few frames later, so copy
+    it if it is kept (or use the wait functions with lease=True).
+    """
+    with _frame_lock:
+        return _frame_slots.get(direction, _EMPTY_SLOT).frame
+
+
+def get_frame_slot(direction):
+    """
+    Returns the latest FrameSlot (frame, seq, timestamp) for a direction.
+    seq == 0 means no frame has been produced yet. Not leased (see
+    get_latest_frame()).
     """
     with _frame_lock:
-        return _latest_frames.get(direction)
+        return _frame_slots.get(direction, _EMPTY_SLOT)
+
+
+def wait_for_frame(direction, last_seq, timeout=1.0, lease=False):
+    """
+    Blocks until the direction has a frame newer than last_seq.
+    Returns the latest FrameSlot; on timeout its seq may still equal last_seq.
+    lease=True: the frame can't be rewritten until slot.release().
+    """
+    with _frame_cond:
+        _frame_cond.wait_for(
+            lambda: _frame_slots.get(direction, _EMPTY_SLOT).seq > last_seq or _stop_event.is_set(),
+            timeout
+        )
+        slot = _frame_slots.get(direction, _EMPTY_SLOT)
+        if lease:
+            slot.acquire()
+        return slot
+
+
+def wait_for_any_frame(last_seqs, timeout=1.0, lease=False):
+    """
+    Blocks until ANY direction has a frame newer than last_seqs[direction].
+    Returns { direction: FrameSlot } for every direction that has a frame.
+    lease=True: none of them can be rewritten until release_frames().
+    """
+    def has_new():
+        return any(
+            slot.seq > last_seqs.get(d, 0) for d, slot in _frame_slots.items()
+        )
+
+    with _frame_cond:
+        _frame_cond.wait_for(lambda: has_new() or _stop_event.is_set(), timeout)
+        slots = dict(_frame_slots)
+        if lease:
+            for slot in slots.values():
+                slot.acquire()
+        return slots
+
+
+def release_frames(slots):
+    """Ends the leases taken by wait_for_any_frame(lease=True)."""
+    for slot in slots:
+        slot.release()
 
 
 def stop_video_feeds():
-    _stop_event.set()
\ No newline at end of file
+    _stop_event.set()
+    with _frame_cond:
+        _frame_cond.notify_all()
\ No newline at end of file
@@ -12,6 +12,7 @@ GREEN_LOW = 20
 GREEN_MEDIUM = 40
 GREEN_HIGH = 60
 YELLOW_TIME = 3
+ALL_RED_TIME = 1   # clearance between yellow and the next green
 
 # Vehicle thresholds
 LOW_TRAFFIC = 5
@@ -27,3 +28,94 @@ PRELOCK_TIME = 5   # seconds before green ends
 # -------------------------------
 FRAME_WIDTH = 640
 FRAME_HEIGHT = 360
+
+# Video workers grab() every source frame but only decode + resize
+# when a consumer (detection / open streams) is due a frame
+DEMAND_DRIVEN_DECODE = True
+
+# Simulation mode replays this recording (camera/recording.py) instead
+# of decoding the video files. None = decode VIDEO_FILES.
+REPLAY_PATH = None
+
+# -------------------------------
+# DETECTION CONFIG
+# -------------------------------
+DETECTION_MODE = "thread"   # thread | process (one worker process per direction)
+
+# Detection runs on a downscaled copy of the streamed frame
+# (0.5 -> 640x360 stream, 320x180 detection)
+DETECTION_SCALE = 0.5
+
+# Vehicle detector behind count_vehicles() (core/detectors.py)
+DETECTOR_BACKEND = "mog2"   # mog2 (background subtraction) | onnx (cv2.dnn, batched)
+
+# ONNX backend: a YOLOv8-style export, output (N, 4 + classes, anchors).
+# `python -m benchmarks.tiny_onnx` generates a tiny test model.
+DNN_MODEL_PATH = "models/vehicles.onnx"
+DNN_INPUT_SIZE = (320, 192)           # (W, H) the model was exported for
+DNN_CONF_THRESHOLD = 0.4
+DNN_NMS_THRESHOLD = 0.45
+DNN_VEHICLE_CLASSES = (2, 3, 5, 7)    # COCO car, motorcycle, bus, truck (all classes if the model has fewer)
+
+# Adaptive detection rates (core/detection_scheduler.py): candidate next
+# greens are counted at the HIGH rate from PRELOCK_TIME before the green
+# ends until the switch, and with TRACKING_ENABLED the lane that is
+# discharging as well; every other lane at the LOW rate.
+# False = every lane at the HIGH rate.
+ADAPTIVE_DETECTION = True
+DETECTION_RATE_HIGH = 10.0   # Hz
+DETECTION_RATE_LOW = 2.0     # Hz (dashboard / history freshness)
+DETECTION_RATE_MIN = 0.5     # Hz floor when over the CPU budget
+DETECTION_CPU_BUDGET = 0.5   # cores spent counting, worker CPU time in process mode (None = no limit)
+
+# Motion gate (core/motion_gate.py): a frame where almost nothing changed
+# since the lane's last full detection reuses that count
+MOTION_GATE_ENABLED = True
+MOTION_GATE_STEP = 8            # thumbnail = every 8th pixel (80x45)
+MOTION_PIXEL_DELTA = 25         # gray levels for a thumbnail pixel to count as changed
+MOTION_GATE_THRESHOLD = 0.005   # static below this fraction of changed pixels
+MOTION_GATE_REFRESH = 2.0       # seconds: full detection at least this often per lane
+
+# Vehicle tracking (core/tracker.py): the published count is the tracked
+# queue length instead of the per-frame blob count
+TRACKING_ENABLED = True
+TRACK_MIN_HITS = 2        # detections before a track counts as a vehicle
+TRACK_TIMEOUT = 1.5       # seconds unseen before a track is dropped
+TRACK_RED_TIMEOUT = 20.0  # seconds a stopped vehicle is held unseen while its lane is red
+TRACK_MIN_IOU = 0.2       # below this, match on centroid distance instead
+TRACK_MAX_SPEED = 300.0   # px/s a vehicle can move between detections
+
+# Lane ROI polygons per direction, as (x, y) points in
+# FRAME_WIDTH x FRAME_HEIGHT coordinates. Detection only looks at the
+# polygon (cropped to its bounding box). None = full frame.
+# Example: "north": [(180, 120), (460, 120), (640, 360), (0, 360)]
+LANE_ROIS = {
+    "north": None,
+    "south": None,
+    "east": None,
+    "west": None,
+}
+
+# -------------------------------
+# COUNT HISTORY CONFIG
+# -------------------------------
+HISTORY_RAW_SECONDS = 600   # raw detection-rate samples kept (per direction)
+
+# Green time is computed from the mean count over this many seconds,
+# not from a single (noisy) frame
+SMOOTHING_WINDOW = 3.0
+
+# -------------------------------
+# PERSISTENCE CONFIG
+# -------------------------------
+PERSISTENCE_ENABLED = True
+DB_PATH = "data/traffic.db"    # SQLite (WAL); counts at 1 s resolution + phase log
+PERSIST_INTERVAL = 1.0         # seconds between group commits
+
+# -------------------------------
+# RECORDING CONFIG
+# -------------------------------
+RECORD_ON_START = False        # record frames + counts from startup
+RECORDINGS_DIR = "recordings"  # one sub-directory per recording
+RECORD_FPS = 10.0              # frames/s kept per direction (= detection rate)
+RECORD_CHUNK_FRAMES = 600      # frames per chunk file (1 minute at 10 FPS)
@@ -0,0 +1,232 @@
+# core/count_history.py
+
+"""
+Bounded per-direction count history.
+
+Every count written to traffic_state is also kept here:
+- raw:  every sample at the detection rate (last HISTORY_RAW_SECONDS)
+- 1s / 1m / 15m: rollups (mean, min, max, samples) per bucket
+
+All levels are fixed-size NumPy rings, so memory stays constant no
+matter how long the system runs. Queries slice the rings with
+np.searchsorted; nothing loops over samples in Python.
+"""
+
+import numpy as np
+from threading import Lock
+from config import HISTORY_RAW_SECONDS, SMOOTHING_WINDOW, DETECTION_RATE_HIGH
+from utils import clock
+
+DIRECTIONS = ["north", "south", "east", "west"]
+
+# resolution -> (bucket seconds, buckets kept)
+ROLLUPS = {
+    "1s": (1, 60 * 60),              # 1 hour
+    "1m": (60, 7 * 24 * 60),         # 1 week
+    "15m": (900, 366 * 24 * 4),      # 1 year
+}
+RESOLUTIONS = ["raw"] + list(ROLLUPS)
+
+
+class _Ring:
+    """
+    Fixed-capacity ring of buckets: start time, sum, samples, min, max.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.t = np.zeros(capacity, dtype=np.float64)
+        self.total = np.zeros(capacity, dtype=np.float64)
+        self.n = np.zeros(capacity, dtype=np.int32)
+        self.lo = np.zeros(capacity, dtype=np.float32)
+        self.hi = np.zeros(capacity, dtype=np.float32)
+        self.head = 0    # next write position
+        self.size = 0
+
+    def append(self, t, total, n, lo, hi):
+        i = self.head
+        self.t[i] = t
+        self.total[i] = total
+        self.n[i] = n
+        self.lo[i] = lo
+        self.hi[i] = hi
+        self.head = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def window(self, start, end):
+        """
+        Buckets with start <= t < end, oldest first, as copies.
+        """
+        if self.size < self.capacity:
+            order = slice(0, self.size)
+            t = self.t[order]
+            arrays = [a[order] for a in (self.total, self.n, self.lo, self.hi)]
+        else:
+            # Unroll the ring: [head:] is older than [:head]
+            t = np.concatenate((self.t[self.head:], self.t[:self.head]))
+            arrays = [np.concatenate((a[self.head:], a[:self.head]))
+                      for a in (self.total, self.n, self.lo, self.hi)]
+
+        i, j = np.searchsorted(t, [start, end])
+        return (t[i:j].copy(),) + tuple(a[i:j].copy() for a in arrays)
+
+
+class _Rollup:
+    """
+    One resolution: closed buckets in a ring, plus the open bucket.
+    """
+    def __init__(self, width, capacity):
+        self.width = width
+        self.ring = _Ring(capacity)
+        self._start = None
+        self._total = 0.0
+        self._n = 0
+        self._lo = 0.0
+        self._hi = 0.0
+
+    def add(self, t, value):
+        start = (t // self.width) * self.width
+        if start != self._start:
+            if self._start is not None:
+                self.ring.append(self._start, self._total, self._n, self._lo, self._hi)
+            self._start = start
+            self._total, self._n, self._lo, self._hi = 0.0, 0, value, value
+
+        self._total += value
+        self._n += 1
+        self._lo = min(self._lo, value)
+        self._hi = max(self._hi, value)
+
+    def window(self, start, end):
+        t, total, n, lo, hi = self.ring.window(start, end)
+        # The open bucket is reported too (partial, but current)
+        if self._start is not None and start <= self._start < end:
+            t = np.append(t, self._start)
+            total = np.append(total, self._total)
+            n = np.append(n, self._n)
+            lo = np.append(lo, self._lo)
+            hi = np.append(hi, self._hi)
+        return t, total, n, lo, hi
+
+
+class CountHistory:
+    """
+    History for one direction (thread-safe).
+    """
+    def __init__(self, raw_seconds=HISTORY_RAW_SECONDS):
+        self._lock = Lock()
+        # a lane is never counted faster than the scheduler's high rate
+        self._raw = _Ring(int(raw_seconds * DETECTION_RATE_HIGH))
+        self._rollups = {name: _Rollup(width, capacity) for name, (width, capacity) in ROLLUPS.items()}
+
+    def record(self, count, t=None):
+        if t is None:
+            t = clock.time()
+        value = float(count)
+        with self._lock:
+            self._raw.append(t, value, 1, value, value)
+            for rollup in self._rollups.values():
+                rollup.add(t, value)
+
+    def window(self, resolution, start, end):
+        """
+        Returns {"t", "mean", "min", "max", "samples"} (NumPy arrays)
+        for buckets starting in [start, end).
+        """
+        with self._lock:
+            if resolution == "raw":
+                t, total, n, lo, hi = self._raw.window(start, end)
+            else:
+                t, total, n, lo, hi = self._rollups[resolution].window(start, end)
+
+        return {
+            "t": t,
+            "mean": total / np.maximum(n, 1),
+            "min": lo,
+            "max": hi,
+            "samples": n
+        }
+
+    def smoothed(self, window=SMOOTHING_WINDOW, now=None):
+        """
+        Mean count over the last `window` seconds, or None if no samples.
+        """
+        if now is None:
+            now = clock.time()
+        with self._lock:
+            _, total, n, _, _ = self._raw.window(now - window, np.inf)
+        if n.size == 0:
+            return None
+        return float(total.sum() / n.sum())
+
+
+_histories = {d: CountHistory() for d in DIRECTIONS}
+
+
+# -------------------------------
+# MODULE API
+# -------------------------------
+def record_count(direction, count, t=None):
+    history = _histories.get(direction)
+    if history is not None:
+        history.record(count, t)
+
+
+def reset_histories(histories=None):
+    """
+    Replaces every direction's history (default: empty ones).
+    Returns the previous histories for restoring.
+    """
+    global _histories
+    previous = _histories
+    _histories = {d: CountHistory() for d in DIRECTIONS} if histories is None else histories
+    return previous
+
+
+def get_smoothed_count(direction, window=SMOOTHING_WINDOW):
+    """
+    Mean count over the last `window` seconds (None if no history yet).
+    """
+    history = _histories.get(direction)
+    if history is None:
+        return None
+    return history.smoothed(window)
+
+
+def get_history(direction, resolution="1s", start=None, end=None):
+    """
+    Time series for one direction plus aggregates over the window.
+    Returns JSON-ready lists: {"resolution", "t", "mean", "min", "max",
+    "samples", "aggregate": {"mean", "min", "max", "samples"}}.
+    Raises ValueError for an unknown direction / resolution.
+    """
+    if direction not in _histories:
+        raise ValueError(f"Invalid direction: {direction}")
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Invalid resolution: {resolution}")
+
+    if end is None:
+        end = clock.time()
+    if start is None:
+        start = end - 60
+    series = _histories[direction].window(resolution, start, end)
+
+    samples = int(series["samples"].sum())
+    if samples:
+        aggregate = {
+            "mean": round(float(series["mean"].dot(series["samples"]) / samples), 3),
+            "min": float(series["min"].min()),
+            "max": float(series["max"].max()),
+            "samples": samples
+        }
+    else:
+        aggregate = {"mean": None, "min": None, "max": None, "samples": 0}
+
+    return {
+        "resolution": resolution,
+        "t": np.round(series["t"], 3).tolist(),
+        "mean": np.round(series["mean"], 3).tolist(),
+        "min": series["min"].tolist(),
+        "max": series["max"].tolist(),
+        "samples": series["samples"].tolist(),
+        "aggregate": aggregate
+    }
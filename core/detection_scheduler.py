@@ -0,0 +1,120 @@
+# core/detection_scheduler.py
+
+"""
+Per-direction detection rates from the signal timeline.
+
+The controller only reads counts at two moments:
+- get_next_valid_direction(), when green passes on: live counts of the
+  lanes after the current one, in cycle order
+- calculate_dynamic_duration(), when that lane's green starts: its mean
+  over the last SMOOTHING_WINDOW seconds
+
+So counts only need to be fresh for the lanes that can be picked next,
+from PRELOCK_TIME before the green ends until the switch (yellow and
+all-red included). Those lanes get DETECTION_RATE_HIGH; the others
+DETECTION_RATE_LOW. With TRACKING_ENABLED the lane that is discharging
+(green, emergency or yellow) stays at DETECTION_RATE_HIGH too: the
+tracker counts vehicles leaving at the lane's border, and at the low
+rate a vehicle crosses the border band between two detections.
+
+Rates are then fitted to DETECTION_CPU_BUDGET: measured seconds per
+detection x rate, summed over lanes. Low-priority lanes give up rate
+first (down to DETECTION_RATE_MIN), then the candidates.
+"""
+
+from config import (
+    PRELOCK_TIME, ADAPTIVE_DETECTION, DETECTION_RATE_HIGH, DETECTION_RATE_LOW,
+    DETECTION_RATE_MIN, DETECTION_CPU_BUDGET, TRACKING_ENABLED
+)
+from core.state_snapshot import get_snapshot
+from core.tracker import lane_is_green
+from core.timing_logic import CYCLE_ORDER
+from utils import clock, metrics
+
+COST_ALPHA = 0.1   # weight of a new sample in the per-lane cost average
+
+
+def next_green_candidates(current, counts):
+    """
+    Lanes get_next_valid_direction(current) can pick: in cycle order, up
+    to and including the first one with traffic.
+    """
+    i = CYCLE_ORDER.index(current) if current in CYCLE_ORDER else -1
+    candidates = []
+    for k in range(1, len(CYCLE_ORDER) + 1):
+        d = CYCLE_ORDER[(i + k) % len(CYCLE_ORDER)]
+        candidates.append(d)
+        if counts.get(d, 0) > 0:
+            break
+    return candidates
+
+
+def in_prelock(snap, now):
+    """
+    True from PRELOCK_TIME before the green ends until the next green
+    starts. An emergency green can end at any moment, so it counts too.
+    """
+    if snap.phase in ("yellow", "all_red", "emergency"):
+        return True
+    return snap.phase_deadline - now <= PRELOCK_TIME
+
+
+class DetectionScheduler:
+    """
+    Detection rate (Hz) per direction. Not thread-safe: owned by the
+    DetectionService loop, which calls rates() every tick and observe()
+    after every detection.
+    """
+    def __init__(self, directions, adaptive=ADAPTIVE_DETECTION, budget=DETECTION_CPU_BUDGET,
+                 tracking=TRACKING_ENABLED):
+        self.directions = list(directions)
+        self.adaptive = adaptive
+        self.budget = budget
+        self.tracking = tracking
+        self._cost = {d: 0.0 for d in self.directions}   # seconds per detection
+
+    def observe(self, direction, seconds):
+        cost = self._cost.get(direction)
+        if cost is not None:
+            self._cost[direction] = seconds if cost == 0.0 else cost + COST_ALPHA * (seconds - cost)
+
+    def rates(self, snap=None, now=None):
+        if not self.adaptive:
+            return {d: DETECTION_RATE_HIGH for d in self.directions}
+        if snap is None:
+            snap = get_snapshot()
+        if now is None:
+            now = clock.monotonic()
+
+        high = set()
+        if in_prelock(snap, now):
+            high.update(next_green_candidates(snap.current_green, snap.counts))
+        if self.tracking:
+            # Discharge is counted at the border: follow the moving queue
+            high.update(d for d in self.directions if lane_is_green(snap, d))
+
+        rates = {d: DETECTION_RATE_HIGH if d in high else DETECTION_RATE_LOW for d in self.directions}
+        return self._fit_budget(rates, high)
+
+    def _fit_budget(self, rates, high):
+        load = sum(rates[d] * self._cost[d] for d in rates)
+        if self.budget is not None and load > self.budget:
+            low = [d for d in rates if d not in high]
+            for group in (low, [d for d in rates if d in high]):
+                excess = load - self.budget
+                if excess <= 0:
+                    break
+                # Cut each lane in proportion to its load above the floor
+                spare = sum(max(rates[d] - DETECTION_RATE_MIN, 0.0) * self._cost[d] for d in group)
+                if spare <= 0:
+                    continue
+                cut = min(1.0, excess / spare)
+                for d in group:
+                    if rates[d] > DETECTION_RATE_MIN:
+                        rates[d] -= (rates[d] - DETECTION_RATE_MIN) * cut
+                load -= min(excess, spare)
+
+        for d, rate in rates.items():
+            metrics.DETECTION_RATE.labels(d).set(round(rate, 2))
+        metrics.DETECTION_CPU_LOAD.labels().set(round(load, 3))
+        return rates
@@ -2,48 +2,230 @@
 
 import time
 import threading
-from camera.video_feed import get_latest_frame
-from core.vehicle_counter import count_vehicles
+from camera.video_feed import wait_for_any_frame, release_frames, set_frame_demand
+from core.detectors import get_detector
 from core.traffic_state import update_count
+from core.traffic_store import record_count
+from core.detection_scheduler import DetectionScheduler
+from core.motion_gate import MotionGate
+from core.tracker import VehicleTracker, lane_is_green
+from core.state_snapshot import get_snapshot, publish_state
+from camera import recording
+from config import DETECTION_MODE, MOTION_GATE_ENABLED, TRACKING_ENABLED
+from utils import clock, metrics
+
+DETECTION_INTERVAL = 0.1   # 10 FPS detection
+FLOW_PUBLISH_INTERVAL = 1.0   # seconds between tracker stats in the status
 
 class DetectionService(threading.Thread):
     """
     Background service that continuously:
-    1. Grabs latest resized frame
+    1. Waits for a NEW resized frame
     2. Counts vehicles
     3. Updates traffic state
+
+    Frames are tracked by sequence number, so a frame is never
+    counted twice when detection polls faster than the source.
+
+    Lanes due in the same tick go to the detector as one batch
+    (detect_batch; one forward pass for the ONNX backend).
+
+    Each direction is counted at its own rate from DetectionScheduler
+    (high for the lanes the controller decides on next and, when tracking,
+    the lane that is discharging; low otherwise);
+    the rates are also passed on to the video workers as frame demand.
+    A MotionGate skips counting on frames where nothing moved, and with
+    TRACKING_ENABLED the published count is the VehicleTracker's queue
+    length (flow stats go to the status snapshot).
+
+    mode="process" moves counting into one worker process per
+    direction (see core/detection_workers.py).
     """
-    def __init__(self):
+    def __init__(self, mode=DETECTION_MODE):
         super().__init__()
         self.daemon = True
         self.running = True
+        self.mode = mode
+        self._engine = None
+        self.scheduler = None
+        self.gate = None
+        self.trackers = {}
 
     def run(self):
         print("[AI] Detection Service Started")
         
         directions = ["north", "south", "east", "west"]
-        
-        while self.running:
-            start_time = time.time()
+        last_seqs = {d: 0 for d in directions}
+        self.scheduler = DetectionScheduler(directions)
+        if MOTION_GATE_ENABLED:
+            self.gate = MotionGate(directions)
+        if TRACKING_ENABLED:
+            self.trackers = {d: VehicleTracker(d) for d in directions}
 
+        if self.mode == "process":
+            from core.detection_workers import ProcessDetectionEngine
+            self._engine = ProcessDetectionEngine(directions)
+            self._engine.start()
+
+        try:
+            self._loop(directions, last_seqs)
+        finally:
             for d in directions:
-                # 1. GET FRAME (Instant)
-                frame = get_latest_frame(d)
-                
-                if frame is not None:
-                    # 2. RUN DETECTION (Heavy Task)
-                    # Running this in background keeps Video & Timer smooth
-                    count = count_vehicles(frame)
-                    
-                    # 3. UPDATE STATE
-                    update_count(d, count)
-            
+                set_frame_demand(d, "detection", 0)
+            if self._engine is not None:
+                self._engine.stop()
+                self._engine = None
+
+    def _record(self, direction, count, captured_at):
+        """Publishes a count and records capture -> state lag."""
+        update_count(direction, count)
+        record_count(direction, count, captured_at)
+        recording.record_count(direction, count, captured_at)
+        metrics.DETECTION_LAG_SECONDS.labels(direction).observe(clock.time() - captured_at)
+        metrics.DETECTION_FPS.labels(direction).mark()
+
+    def _detected(self, direction, boxes, captured_at):
+        """Full detection result -> motion gate, tracker -> count."""
+        count = len(boxes)
+        if self.gate is not None:
+            self.gate.update_count(direction, count)
+        tracker = self.trackers.get(direction)
+        if tracker is not None:
+            count = tracker.update(boxes, captured_at, lane_is_green(get_snapshot(), direction))
+        self._record(direction, count, captured_at)
+
+    def _reused(self, direction, count, captured_at):
+        """Static frame (motion gate): nothing moved since the last detection."""
+        tracker = self.trackers.get(direction)
+        if tracker is not None:
+            count = tracker.touch(captured_at, lane_is_green(get_snapshot(), direction))
+        self._record(direction, count, captured_at)
+
+    def _publish_flow(self):
+        """Tracker stats per lane -> status snapshot ("flow")."""
+        if self.trackers:
+            publish_state(flow={d: t.stats() for d, t in self.trackers.items()})
+
+    def _apply_rates(self, directions, demand):
+        """Current scheduled rates; video demand is updated when one changes."""
+        rates = self.scheduler.rates()
+        for d in directions:
+            if rates[d] != demand.get(d):
+                demand[d] = rates[d]
+                # Tell the video workers how often we need frames
+                set_frame_demand(d, "detection", rates[d])
+        return rates
+
+    def _loop(self, directions, last_seqs):
+        # Process mode: { direction: (capture timestamp, submit perf_counter) }
+        in_flight = {}
+        demand = {}
+        last_run = {d: 0.0 for d in directions}
+        flow_published = 0.0
+
+        # Process mode: the workers hold the detectors, none is needed here
+        detector = get_detector() if self._engine is None else None
+
+        while self.running:
+            rates = self._apply_rates(directions, demand)
+
+            # 1. WAIT FOR NEW FRAMES (Blocks instead of spinning)
+            # Leased: the video workers can't rewrite them until released
+            slots = wait_for_any_frame(last_seqs, timeout=1.0, lease=True)
+            start_time = clock.time()
+            batch = {}
+            try:
+                for d in directions:
+                    slot = slots.get(d)
+
+                    # Skip directions whose frame we've already counted,
+                    # or that aren't due yet at their scheduled rate
+                    if slot is None or slot.frame is None or slot.seq <= last_seqs[d]:
+                        continue
+                    # (half a tick of slack keeps e.g. 2 Hz at every 5th tick)
+                    if start_time - last_run[d] < 1.0 / rates[d] - DETECTION_INTERVAL / 2:
+                        continue
+
+                    # Static frame: the lane's last count still holds
+                    if self.gate is not None:
+                        reused = self.gate.check(d, slot.frame, start_time)
+                        if reused is not None:
+                            self._count_dropped(d, last_seqs[d], slot.seq)
+                            last_seqs[d] = slot.seq
+                            last_run[d] = start_time
+                            self._reused(d, reused, slot.timestamp)
+                            continue
+
+                    # Process mode: hand off to the worker, results arrive below.
+                    # A busy worker keeps its frame; we retry with a newer one.
+                    if self._engine is not None:
+                        if self._engine.submit(d, slot.frame, slot.seq):
+                            if self.gate is not None:
+                                self.gate.commit_reference(d, start_time)
+                            self._count_dropped(d, last_seqs[d], slot.seq)
+                            last_seqs[d] = slot.seq
+                            last_run[d] = start_time
+                            in_flight[d] = (slot.timestamp, time.perf_counter())
+                        continue
+                    if self.gate is not None:
+                        self.gate.commit_reference(d, start_time)
+                    self._count_dropped(d, last_seqs[d], slot.seq)
+                    last_seqs[d] = slot.seq
+                    last_run[d] = start_time
+                    batch[d] = slot
+
+                # 2. RUN DETECTION (Heavy Task), every due lane in one call
+                # Running this in background keeps Video & Timer smooth
+                if batch:
+                    t0 = time.perf_counter()
+                    results = detector.detect_batch({d: slot.frame for d, slot in batch.items()})
+                    elapsed = time.perf_counter() - t0
+                    metrics.DETECTION_BATCH_SECONDS.labels().observe(elapsed)
+
+                    # 3. UPDATE STATE (each lane is charged its share of the batch)
+                    for d, slot in batch.items():
+                        metrics.DETECTION_SECONDS.labels(d).observe(elapsed / len(batch))
+                        self.scheduler.observe(d, elapsed / len(batch))
+                        self._detected(d, results[d], slot.timestamp)
+            finally:
+                # Every frame was read (process mode copied its own into
+                # shared memory), or detection failed: either way let go
+                release_frames(slots.values())
+
+            # Process mode: gather whatever finishes within this tick
+            if self._engine is not None:
+                elapsed = clock.time() - start_time
+                for d, _, boxes, cpu in self._engine.collect(timeout=DETECTION_INTERVAL - elapsed):
+                    captured_at, submitted = in_flight.pop(d)
+                    # Round trip to the worker (handoff + count)
+                    round_trip = time.perf_counter() - submitted
+                    metrics.DETECTION_SECONDS.labels(d).observe(round_trip)
+                    # The CPU budget is charged the worker's own CPU time,
+                    # not the round trip (pipe and queue waits burn no CPU)
+                    self.scheduler.observe(d, cpu)
+                    self._detected(d, boxes, captured_at)
+
+            if self.gate is not None:
+                self.gate.report(start_time)
+            if start_time - flow_published >= FLOW_PUBLISH_INTERVAL:
+                flow_published = start_time
+                self._publish_flow()
+
             # Throttle Detection
             # We don't need 30 FPS detection. 10 FPS is enough for traffic.
             # This saves massive CPU overhead.
-            elapsed = time.time() - start_time
-            if elapsed < 0.1:
-                time.sleep(0.1 - elapsed)
+            elapsed = clock.time() - start_time
+            if elapsed < DETECTION_INTERVAL:
+                clock.sleep(DETECTION_INTERVAL - elapsed)
+
+    @staticmethod
+    def _count_dropped(direction, last_seq, seq):
+        """Frames published between two detections were never looked at."""
+        if last_seq and seq - last_seq > 1:
+            metrics.DETECTION_FRAMES_DROPPED.labels(direction).inc(seq - last_seq - 1)
 
     def stop(self):
-        self.running = False
\ No newline at end of file
+        self.running = False
+        # Give the loop a chance to shut the worker processes down cleanly
+        if self.mode == "process" and self.is_alive():
+            self.join(timeout=2.0)
\ No newline at end of file
@@ -0,0 +1,183 @@
+# core/detection_workers.py
+
+"""
+Process-pool detection engine.
+Each direction counts vehicles in its own worker process, so the
+OpenCV work no longer competes for the GIL with the Flask/video threads.
+Frames are handed over through shared memory: only the sequence
+number and the resulting boxes cross the pipe.
+"""
+
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+
+import cv2
+import numpy as np
+
+from config import FRAME_WIDTH, FRAME_HEIGHT
+from utils import metrics
+
+# -------------------------------
+# CONFIG
+# -------------------------------
+FRAME_SHAPE = (FRAME_HEIGHT, FRAME_WIDTH, 3)   # 640x360 BGR
+WORKER_JOIN_TIMEOUT = 2.0
+RESPAWN_INTERVAL = 5.0   # min seconds between restarts of one direction's worker
+
+# "spawn" gives each worker a clean interpreter (no inherited locks or
+# OpenCV thread pools from the parent's running threads) and works on
+# every platform, including Windows.
+_ctx = mp.get_context("spawn")
+
+
+def _worker_main(direction, shm_name, shape, conn):
+    """
+    Worker process loop:
+    1. Wait for a sequence number on the pipe
+    2. Detect vehicles on the frame sitting in shared memory
+    3. Send (seq, boxes, cpu_seconds) back: a small (N, 4) array and
+       this process's CPU time for the detection
+    A None message means shut down.
+    """
+    from core.vehicle_counter import detect_vehicles
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+    try:
+        while True:
+            seq = conn.recv()
+            if seq is None:
+                break
+            t0 = time.process_time()
+            boxes = detect_vehicles(frame, direction)
+            conn.send((seq, boxes, time.process_time() - t0))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del frame
+        shm.close()
+
+
+class _DirectionWorker:
+    """
+    Parent-side handle for one direction's worker:
+    the shared frame buffer, the pipe and the process.
+    """
+    def __init__(self, direction):
+        self.direction = direction
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(FRAME_SHAPE)))
+        self.frame = np.ndarray(FRAME_SHAPE, dtype=np.uint8, buffer=self.shm.buf)
+        self.conn, child_conn = _ctx.Pipe()
+        self.process = _ctx.Process(
+            target=_worker_main,
+            args=(direction, self.shm.name, FRAME_SHAPE, child_conn),
+            name=f"detect-{direction}",
+            daemon=True
+        )
+        self.busy = False
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(WORKER_JOIN_TIMEOUT)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+        del self.frame
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ProcessDetectionEngine:
+    """
+    One detection process per direction.
+    submit() copies a frame into the direction's shared buffer (only
+    while that worker is idle, so a frame is never overwritten mid-count),
+    collect() gathers finished detections.
+    A worker that dies is replaced (new process and shared buffer), at
+    most once per RESPAWN_INTERVAL per direction.
+    """
+    def __init__(self, directions):
+        self.directions = list(directions)
+        self._workers = {}
+        self._respawned_at = {}
+
+    def start(self):
+        for d in self.directions:
+            worker = _DirectionWorker(d)
+            worker.process.start()
+            self._workers[d] = worker
+        print(f"[AI] Detection process pool started ({len(self._workers)} workers)")
+
+    def _respawn(self, direction):
+        """Replaces a dead worker. Returns the new one, or None while rate-limited."""
+        now = time.monotonic()
+        last = self._respawned_at.get(direction)
+        if last is not None and now - last < RESPAWN_INTERVAL:
+            return None
+        self._respawned_at[direction] = now
+
+        old = self._workers.pop(direction, None)
+        if old is not None:
+            old.close()
+        worker = _DirectionWorker(direction)
+        worker.process.start()
+        self._workers[direction] = worker
+        metrics.DETECTION_WORKER_RESTARTS.labels(direction).inc()
+        print(f"[AI] Detection worker for {direction} restarted")
+        return worker
+
+    def submit(self, direction, frame, seq):
+        """
+        Hands a frame to the direction's worker.
+        Returns False if that worker is still busy with the previous frame.
+        """
+        worker = self._workers.get(direction)
+        if worker is not None and not worker.busy and not worker.process.is_alive():
+            # Died while idle
+            worker = self._respawn(direction)
+        if worker is None or worker.busy:
+            return False
+
+        if frame.shape == FRAME_SHAPE:
+            np.copyto(worker.frame, frame)
+        else:
+            cv2.resize(frame, (FRAME_WIDTH, FRAME_HEIGHT), dst=worker.frame,
+                       interpolation=cv2.INTER_NEAREST)
+
+        worker.conn.send(seq)
+        worker.busy = True
+        return True
+
+    def collect(self, timeout=0.0):
+        """
+        Waits up to timeout for busy workers to finish.
+        Returns a list of (direction, seq, boxes, cpu_seconds).
+        """
+        busy = {w.conn: w for w in self._workers.values() if w.busy}
+        if not busy:
+            return []
+
+        results = []
+        for conn in wait(list(busy), timeout=max(0.0, timeout)):
+            worker = busy[conn]
+            worker.busy = False
+            try:
+                seq, boxes, cpu = conn.recv()
+            except (EOFError, OSError):
+                print(f"[AI] Detection worker for {worker.direction} died")
+                self._respawn(worker.direction)
+                continue
+            results.append((worker.direction, seq, boxes, cpu))
+        return results
+
+    def stop(self):
+        for worker in self._workers.values():
+            worker.close()
+        self._workers.clear()
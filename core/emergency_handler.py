@@ -3,43 +3,88 @@
 """
 Handles emergency vehicle priority logic.
 This module can be triggered manually or via detection logic.
+
+Activation/deactivation notifies listeners immediately (the
+TrafficController registers one), so preemption doesn't wait for a poll.
+MAX_EMERGENCY_GREEN is enforced by the controller's scheduler.
 """
 
-import time
+from threading import Lock
+from core.state_snapshot import publish_state
+from utils import clock
+
+VALID_DIRECTIONS = {"north", "south", "east", "west"}
 
 # Emergency state
 _emergency_active = False
 _emergency_direction = None
-_emergency_start_time = None
+_emergency_start_time = None      # wall clock, for the dashboard
+_emergency_requested_at = None    # clock.monotonic(), for preemption latency
+_lock = Lock()
+
+# Callbacks fired on every activate / deactivate
+_listeners = []
 
 # Max emergency green time (safety)
 MAX_EMERGENCY_GREEN = 40
 
 
+def add_emergency_listener(callback):
+    with _lock:
+        if callback not in _listeners:
+            _listeners.append(callback)
+
+
+def remove_emergency_listener(callback):
+    with _lock:
+        if callback in _listeners:
+            _listeners.remove(callback)
+
+
+def _notify():
+    with _lock:
+        listeners = list(_listeners)
+    for callback in listeners:
+        callback()
+
+
 def activate_emergency(direction):
     """
     Activate emergency mode for given direction
     """
-    global _emergency_active, _emergency_direction, _emergency_start_time
+    global _emergency_active, _emergency_direction, _emergency_start_time, _emergency_requested_at
+
+    if direction not in VALID_DIRECTIONS:
+        raise ValueError(f"Invalid direction: {direction}")
 
-    _emergency_active = True
-    _emergency_direction = direction
-    _emergency_start_time = time.time()
+    with _lock:
+        _emergency_active = True
+        _emergency_direction = direction
+        _emergency_start_time = clock.time()
+        _emergency_requested_at = clock.monotonic()
+        publish_state(emergency_direction=direction, emergency_started=_emergency_requested_at)
 
     print(f"[EMERGENCY] Activated for direction: {direction}")
+    _notify()
 
 
 def deactivate_emergency():
     """
     Deactivate emergency mode
     """
-    global _emergency_active, _emergency_direction, _emergency_start_time
+    global _emergency_active, _emergency_direction, _emergency_start_time, _emergency_requested_at
 
-    _emergency_active = False
-    _emergency_direction = None
-    _emergency_start_time = None
+    with _lock:
+        if not _emergency_active:
+            return
+        _emergency_active = False
+        _emergency_direction = None
+        _emergency_start_time = None
+        _emergency_requested_at = None
+        publish_state(emergency_direction=None, emergency_started=None)
 
     print("[EMERGENCY] Deactivated")
+    _notify()
 
 
 def is_emergency_active():
@@ -49,22 +94,32 @@ def is_emergency_active():
     return _emergency_active
 
 
-def get_emergency_status():
+def get_emergency_direction():
     """
-    Returns emergency status for dashboard
+    Direction with priority, or None if no emergency is active
     """
-    if not _emergency_active:
-        return {"active": False}
+    with _lock:
+        return _emergency_direction if _emergency_active else None
+
 
-    elapsed = time.time() - _emergency_start_time
+def get_emergency_request_time():
+    """
+    clock.monotonic() of the current activation (None if inactive)
+    """
+    with _lock:
+        return _emergency_requested_at
 
-    # Auto-disable safety
-    if elapsed >= MAX_EMERGENCY_GREEN:
-        deactivate_emergency()
-        return {"active": False}
 
-    return {
-        "active": True,
-        "direction": _emergency_direction,
-        "elapsed_time": int(elapsed)
-    }
+def get_emergency_status():
+    """
+    Returns emergency status for dashboard
+    """
+    with _lock:
+        if not _emergency_active:
+            return {"active": False}
+
+        return {
+            "active": True,
+            "direction": _emergency_direction,
+            "elapsed_time": int(clock.time() - _emergency_start_time)
+        }
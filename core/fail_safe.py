@@ -1,6 +1,6 @@
 # core/fail_safe.py
 
-import time
+from utils import clock
 
 # -------------------------------
 # FAIL-SAFE CONFIG
@@ -18,7 +18,7 @@ def handle_camera_failure():
     """
     global _last_failure_time
 
-    _last_failure_time = time.time()
+    _last_failure_time = clock.time()
 
     return {
         "current_direction": FAIL_SAFE_DIRECTION,
@@ -32,4 +32,4 @@ def is_fail_safe_active(timeout=5):
     """
     Returns True if fail-safe was triggered recently
     """
-    return (time.time() - _last_failure_time) <= timeout
+    return (clock.time() - _last_failure_time) <= timeout
@@ -1,6 +1,7 @@
 # core/mode_manager.py
 
 from threading import Lock
+from core.state_snapshot import publish_state
 
 # -------------------------------
 # INTERNAL STATE
@@ -9,6 +10,9 @@ _current_mode = "simulation"
 _arduino_enabled = True  # Default to ON (change to False if you want default OFF)
 _lock = Lock()
 
+# Every change is also published to the status snapshot (state_snapshot.py)
+publish_state(mode=_current_mode, arduino=_arduino_enabled)
+
 
 # -------------------------------
 # MODE HANDLERS
@@ -23,6 +27,7 @@ def set_mode(mode):
         return False
     with _lock:
         _current_mode = mode
+        publish_state(mode=mode)
     return True
 
 def is_simulation_mode():
@@ -40,4 +45,5 @@ def set_arduino_status(enabled):
     global _arduino_enabled
     with _lock:
         _arduino_enabled = bool(enabled)
+        publish_state(arduino=_arduino_enabled)
         print(f"[SYSTEM] Arduino Mode set to: {_arduino_enabled}")
\ No newline at end of file
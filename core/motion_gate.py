@@ -0,0 +1,172 @@
+# core/motion_gate.py
+
+"""
+Cheap "did anything move?" check in front of count_vehicles().
+
+Each lane keeps a grayscale thumbnail (every MOTION_GATE_STEP-th pixel,
+80x45 at 640x360) of the last frame that went through full detection.
+The thumbnail covers the same crop as detection (the LANE_ROIS bounding
+box), with pixels outside the lane polygon zeroed, so traffic in other
+lanes can't hold the gate open.
+
+A new frame is compared with it: if fewer than MOTION_GATE_THRESHOLD of
+the lane's thumbnail pixels changed by more than MOTION_PIXEL_DELTA
+gray levels, the frame is static and the last count is reused.
+Counting changed pixels rather than averaging the difference keeps
+sensor noise (spread over every pixel) from hiding a single vehicle
+(a few pixels).
+
+check() only compares. A frame becomes the reference through
+commit_reference(), once it is actually handed to detection (a busy
+worker in process mode can refuse it), and the gate stays open until
+that frame's count arrives in update_count().
+
+Comparing against the last DETECTED frame, not the previous one, means
+slow changes add up; MOTION_GATE_REFRESH still forces a full detection
+every few seconds so a count can never go stale.
+
+Hit rates (percent of checks skipped, per lane) are published to the
+status snapshot every GATE_REPORT_INTERVAL seconds.
+"""
+
+import cv2
+import numpy as np
+from threading import Lock
+
+from config import LANE_ROIS, MOTION_GATE_THRESHOLD, MOTION_PIXEL_DELTA, MOTION_GATE_STEP, MOTION_GATE_REFRESH
+from core.state_snapshot import publish_state
+from core.vehicle_counter import lane_crop
+from utils import metrics
+
+GATE_REPORT_INTERVAL = 10.0   # seconds per published hit-rate window
+
+
+class _Lane:
+    __slots__ = ("roi", "frame_shape", "crop", "mask", "area", "reference", "thumb", "diff",
+                 "count", "detected_at", "checks", "hits")
+
+    def __init__(self, roi=None):
+        self.roi = roi
+        self.frame_shape = None
+        self.crop = None         # (x, y, w, h), as detection crops the frame
+        self.mask = None         # int16 1 inside / 0 outside the lane polygon (None: no ROI)
+        self.area = 0            # thumbnail pixels inside the lane
+        self.reference = None    # int16 thumbnail (sum of B, G, R) of the last detected frame
+        self.thumb = None        # thumbnail of the last checked frame
+        self.diff = None
+        self.count = None        # last full-detection count (None while pending)
+        self.detected_at = 0.0
+        self.checks = 0          # in the current report window
+        self.hits = 0
+
+
+class MotionGate:
+    """
+    Motion gate for all lanes. check() / commit_reference() /
+    update_count() are called from the DetectionService loop only;
+    report() is safe from anywhere.
+    """
+    def __init__(self, directions, threshold=MOTION_GATE_THRESHOLD, pixel_delta=MOTION_PIXEL_DELTA,
+                 step=MOTION_GATE_STEP, refresh=MOTION_GATE_REFRESH):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta * 3   # thumbnails are B + G + R
+        self.step = step
+        self.refresh = refresh
+        self._lanes = {d: _Lane(LANE_ROIS.get(d)) for d in directions}
+        self._lock = Lock()
+        self._window_start = None
+
+    def _prepare(self, lane, frame_shape):
+        """Crop, lane mask and buffers for a frame size (drops the reference)."""
+        poly, (x, y, w, h) = lane_crop(lane.roi, frame_shape)
+        shape = (-(-h // self.step), -(-w // self.step))
+        lane.frame_shape = frame_shape
+        lane.crop = (x, y, w, h)
+        if poly is not None:
+            full = np.zeros((h, w), dtype=np.uint8)
+            cv2.fillPoly(full, [poly - [x, y]], 1)
+            lane.mask = full[::self.step, ::self.step].astype(np.int16)
+            lane.area = int(np.count_nonzero(lane.mask))
+        else:
+            lane.mask = None
+            lane.area = shape[0] * shape[1]
+        lane.thumb = np.empty(shape, dtype=np.int16)
+        lane.diff = np.empty(shape, dtype=np.int16)
+        lane.reference = None
+
+    def _thumbnail(self, lane, frame):
+        """Strided B + G + R sum of the lane crop into the lane's int16 buffer."""
+        if frame.shape != lane.frame_shape:
+            self._prepare(lane, frame.shape)
+        elif lane.thumb is None:
+            lane.thumb = np.empty(lane.diff.shape, dtype=np.int16)
+        x, y, w, h = lane.crop
+        s = frame[y:y + h:self.step, x:x + w:self.step]
+        np.add(s[..., 0], s[..., 1], out=lane.thumb, dtype=np.int16)
+        lane.thumb += s[..., 2]
+        if lane.mask is not None:
+            lane.thumb *= lane.mask
+        return lane.thumb
+
+    def check(self, direction, frame, now):
+        """
+        Returns the last count if `frame` is static enough to skip
+        detection, else None. Doesn't change the reference: call
+        commit_reference() if the frame is then sent to detection.
+        """
+        lane = self._lanes[direction]
+        thumb = self._thumbnail(lane, frame)
+
+        static = False
+        if lane.reference is not None and lane.count is not None and now - lane.detected_at < self.refresh:
+            np.subtract(thumb, lane.reference, out=lane.diff)
+            np.abs(lane.diff, out=lane.diff)
+            changed = np.count_nonzero(lane.diff > self.pixel_delta)
+            static = changed < self.threshold * lane.area
+
+        with self._lock:
+            lane.checks += 1
+            if static:
+                lane.hits += 1
+        metrics.MOTION_GATE_CHECKS.labels(direction).inc()
+        if static:
+            metrics.MOTION_GATE_HITS.labels(direction).inc()
+            return lane.count
+        return None
+
+    def commit_reference(self, direction, now):
+        """
+        The frame last passed to check() was handed to detection: it
+        becomes the reference, and nothing is reused until its count
+        arrives (update_count).
+        """
+        lane = self._lanes[direction]
+        # Swap buffers: the checked thumbnail is the new reference
+        lane.reference, lane.thumb = lane.thumb, lane.reference
+        lane.detected_at = now
+        lane.count = None
+
+    def update_count(self, direction, count):
+        """Full-detection result for the lane's reference frame."""
+        self._lanes[direction].count = count
+
+    def hit_rates(self):
+        """Percent of checks skipped per lane in the current window (None before any check)."""
+        with self._lock:
+            return {
+                d: round(100.0 * lane.hits / lane.checks) if lane.checks else None
+                for d, lane in self._lanes.items()
+            }
+
+    def report(self, now):
+        """Publishes the hit rates once per GATE_REPORT_INTERVAL and starts a new window."""
+        if self._window_start is None:
+            self._window_start = now
+        if now - self._window_start < GATE_REPORT_INTERVAL:
+            return
+        rates = self.hit_rates()
+        with self._lock:
+            for lane in self._lanes.values():
+                lane.checks = lane.hits = 0
+        self._window_start = now
+        publish_state(motion_gate=rates)
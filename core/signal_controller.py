@@ -1,64 +1,217 @@
 # core/signal_controller.py
 
-import time
 import threading
+from config import YELLOW_TIME, ALL_RED_TIME
 from core.traffic_state import set_current_green, get_current_green, get_all_counts
 from core.timing_logic import calculate_dynamic_duration, get_next_valid_direction
 from core.mode_manager import get_arduino_status
+from core.state_snapshot import get_snapshot, publish_state, remaining_time
+from core.traffic_store import record_phase
+from core.emergency_handler import (
+    MAX_EMERGENCY_GREEN, add_emergency_listener, remove_emergency_listener,
+    deactivate_emergency, get_emergency_direction, get_emergency_request_time
+)
 from hardware.arduino_serial import send_signal_to_arduino
+from utils import clock, metrics
+
+# If a phase starts more than this late (e.g. host suspended), re-anchor
+# the schedule on "now" instead of racing through missed deadlines
+MAX_PHASE_LAG = 0.5
+
+# -------------------------------
+# SHARED PHASE STATE
+# -------------------------------
+# This is what the Dashboard reads. It lives in the status snapshot
+# (state_snapshot.py), so reads are lock-free and consistent.
+# Deadlines are absolute, on clock.monotonic().
+publish_state(phase="green", phase_direction="north", phase_deadline=0.0)
+
+
+def _set_phase(name, direction, deadline):
+    publish_state(phase=name, phase_direction=direction, phase_deadline=deadline)
+    record_phase(direction, name, deadline - clock.monotonic())
 
-# GLOBAL SHARED VARIABLE FOR TIMER
-# This is what the Dashboard reads.
-current_remaining_time = 0
 
 def get_remaining_time():
-    """Returns the live countdown value for the API"""
-    return current_remaining_time
+    """
+    Returns the live green countdown for the API (0.1 s resolution).
+    0 during yellow / all-red.
+    """
+    return remaining_time(get_snapshot())
+
+
+def get_signal_phase():
+    """
+    Returns the current phase: {"phase", "direction", "remaining"}.
+    """
+    snap = get_snapshot()
+    return {
+        "phase": snap.phase,
+        "direction": snap.phase_direction,
+        "remaining": round(max(0.0, snap.phase_deadline - clock.monotonic()), 1)
+    }
+
 
 class TrafficController(threading.Thread):
+    """
+    Deadline-driven signal scheduler.
+    Each phase ends at an absolute monotonic deadline, and the next phase
+    starts from that deadline (not from "now"), so serial I/O, GIL stalls
+    or slow reads can't accumulate drift. The thread sleeps on an Event,
+    so stop() and end_phase_early() take effect immediately.
+
+    Emergency preemption: activating an emergency wakes the controller,
+    which cuts the current green straight to yellow -> all-red -> green
+    for the emergency direction (held until cleared or MAX_EMERGENCY_GREEN).
+    Yellow and all-red are never cut short.
+    """
     def __init__(self):
         super().__init__()
         self.daemon = True
         self.running = True
+        self._wake = clock.event()   # virtual in simulation (utils/clock.py)
+        self._interrupted = False
+        self._preempt_observed = None
         set_current_green("north") # Start with North
+        add_emergency_listener(self.end_phase_early)
 
     def run(self):
-        global current_remaining_time
         print("🚦 AI Traffic Controller Started")
-        
+
+        phase_start = clock.monotonic()
+
         while self.running:
+            # Pending interrupts are answered by the emergency check below
+            self._interrupted = False
+
+            # 0. EMERGENCY PREEMPTION
+            emergency = get_emergency_direction()
+            if emergency is not None:
+                phase_start = self._run_emergency(emergency, phase_start)
+                if phase_start is None: return
+                continue
+
             # 1. GET CURRENT STATE
             current_green = get_current_green()
-            
+
             # 2. CALCULATE DURATION
             # (e.g., 5s base + 2s per car)
             duration = calculate_dynamic_duration(current_green)
-            
-            # Update Hardware (Green)
-            if get_arduino_status():
-                send_signal_to_arduino(current_green, "green")
-            
-            # 3. COUNTDOWN LOOP (The Timer)
-            # We decrement the global variable every second
-            current_remaining_time = duration
-            while current_remaining_time > 0:
-                if not self.running: return
-                time.sleep(1)
-                current_remaining_time -= 1
-
-            # 4. YELLOW LIGHT
-            if get_arduino_status():
-                send_signal_to_arduino(current_green, "yellow")
-            
-            # Hardcoded Yellow duration (not counted in main timer)
-            time.sleep(3) 
-
-            # 5. SWITCH SIGNAL
-            next_green = get_next_valid_direction(current_green)
-            set_current_green(next_green)
-            
-            # Safety buffer
-            time.sleep(1)
+            metrics.CONTROLLER_PHASES.labels(current_green).inc()
+            metrics.CONTROLLER_GREEN_SECONDS.labels(current_green).observe(duration)
+
+            # 3. GREEN (ends at its deadline, or early when interrupted)
+            phase_start = self._run_phase("green", current_green, "green", phase_start, duration)
+            if phase_start is None: return
+
+            # Emergency for the lane that is already green: just hold it
+            if get_emergency_direction() == current_green:
+                continue
+
+            # 4-6. YELLOW, ALL-RED, SWITCH SIGNAL
+            phase_start = self._clear_and_advance(current_green, phase_start)
+            if phase_start is None: return
+
+    def _clear_and_advance(self, direction, start):
+        """
+        Yellow -> all-red for `direction`, then hands green to the next lane.
+        Neither phase can be interrupted.
+        """
+        # YELLOW LIGHT
+        start = self._run_phase("yellow", direction, "yellow", start, YELLOW_TIME, interruptible=False)
+        if start is None: return None
+
+        # ALL-RED CLEARANCE (safety buffer)
+        start = self._run_phase("all_red", direction, "red", start, ALL_RED_TIME, interruptible=False)
+        if start is None: return None
+
+        # SWITCH SIGNAL
+        next_green = get_next_valid_direction(direction)
+        set_current_green(next_green)
+        return start
+
+    def _run_emergency(self, direction, start):
+        """
+        Emergency green for `direction`: held until the emergency is
+        cleared (or moves elsewhere) or MAX_EMERGENCY_GREEN runs out.
+        """
+        set_current_green(direction)
+        now = clock.monotonic()
+        deadline = now + MAX_EMERGENCY_GREEN
+        _set_phase("emergency", direction, deadline)
+
+        if get_arduino_status():
+            send_signal_to_arduino(direction, "green")
+        self._observe_preemption()
+
+        while True:
+            if self._sleep_until(deadline):
+                # Safety limit reached: the scheduler ends the emergency
+                print(f"[EMERGENCY] MAX_EMERGENCY_GREEN reached for {direction}")
+                deactivate_emergency()
+                break
+            if not self.running:
+                return None
+            if get_emergency_direction() != direction:
+                break
+
+        self._interrupted = False
+        return self._clear_and_advance(direction, clock.monotonic())
+
+    def _observe_preemption(self):
+        """Records emergency request -> first signal command latency (once per request)."""
+        requested = get_emergency_request_time()
+        if requested is not None and requested != self._preempt_observed:
+            self._preempt_observed = requested
+            metrics.EMERGENCY_PREEMPT_SECONDS.labels().observe(clock.monotonic() - requested)
+
+    def _run_phase(self, name, direction, color, start, duration, interruptible=True):
+        """
+        Runs one phase from `start` for `duration` seconds.
+        Returns when the next phase starts, or None if stopped.
+        """
+        now = clock.monotonic()
+        if now - start > MAX_PHASE_LAG:
+            start = now
+        deadline = start + duration
+        _set_phase(name, direction, deadline)
+
+        # Update Hardware (queued, never blocks)
+        if get_arduino_status():
+            send_signal_to_arduino(direction, color)
+        if name == "yellow" and get_emergency_direction() is not None:
+            self._observe_preemption()
+
+        if self._sleep_until(deadline, interruptible):
+            return deadline
+        if not self.running:
+            return None
+        # Cut short: the next phase starts now
+        return clock.monotonic()
+
+    def _sleep_until(self, deadline, interruptible=True):
+        """
+        Waits for an absolute deadline.
+        Returns True if reached, False if stopped or interrupted.
+        A non-interruptible wait leaves the interrupt pending.
+        """
+        while self.running:
+            remaining = deadline - clock.monotonic()
+            if remaining <= 0:
+                return True
+            if self._wake.wait(remaining):
+                self._wake.clear()
+                if interruptible and self._interrupted:
+                    self._interrupted = False
+                    return False
+        return False
+
+    def end_phase_early(self):
+        """Ends the current phase now (the sequence continues from there)."""
+        self._interrupted = True
+        self._wake.set()
 
     def stop(self):
-        self.running = False
\ No newline at end of file
+        self.running = False
+        remove_emergency_listener(self.end_phase_early)
+        self._wake.set()
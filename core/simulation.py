@@ -0,0 +1,314 @@
+# core/simulation.py
+
+"""
+Headless, faster-than-real-time simulation.
+
+Runs the real TrafficController and vehicle counter on recorded footage
+(video files, or camera/recording.py recordings - no decoding at all)
+with a VirtualClock (utils/clock.py): the driver decodes and counts one
+detection tick at a time, then advances virtual time so the controller
+thread runs its phases exactly as it would live. Nothing sleeps, so a
+simulated day takes as long as decoding and counting it does.
+
+Phases and counts go through a TrafficStore of the simulation's own (a
+temporary SQLite file unless --db is given); the report is built from
+it. A store already running in the process is left untouched.
+
+With TRACKING_ENABLED the report also has the raw per-frame detection
+counts ("detections"); --check fails the run (exit 1) when a lane's
+published count strays above them by more than the tracker allows.
+
+Usage (from the repo root):
+    python -m core.simulation --duration 3600 --output sim_report.json
+    python -m core.simulation --replay recordings/20250101-080000
+    python -m core.simulation --duration 240 --check
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+
+from config import FRAME_WIDTH, FRAME_HEIGHT, TRACKING_ENABLED
+from camera.video_feed import VIDEO_FILES
+from camera.recording import Recording
+from core import traffic_store
+from core.detection_service import DETECTION_INTERVAL
+from core.mode_manager import get_arduino_status, set_arduino_status
+from core.signal_controller import TrafficController
+from core.traffic_state import update_count, reset_state
+from core.count_history import reset_histories
+from core.detectors import create_detector, set_detector
+from core.vehicle_counter import reset_counters
+from core.tracker import VehicleTracker, lane_is_green, QUEUE_MARGIN
+from core.state_snapshot import get_snapshot
+from utils import clock
+from utils.clock import VirtualClock
+
+GREEN_PHASES = ("green", "emergency")
+CHECK_TOLERANCE = 0.4   # mean published count may exceed mean detections by this fraction (+1)
+
+
+class ClipReader:
+    """
+    Sequential, looping reader: frame_at(t) returns the stream-resolution
+    frame shown at t seconds into the (looped) clip. Frames in between
+    are only grab()bed, like the demand-driven video worker.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Cannot open video: {path}")
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if 0 < fps <= 120 else 30.0
+        self._pos = -1
+        self._decoded = None
+        self._frame = None
+
+    def frame_at(self, t):
+        target = int(t * self.fps)
+        if target <= self._pos and self._frame is not None:
+            return self._frame
+
+        while self._pos < target:
+            if not self.cap.grab():
+                # End of clip: loop
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                if not self.cap.grab():
+                    raise ValueError(f"No frames in video: {self.path}")
+            self._pos += 1
+
+        ok, decoded = self.cap.retrieve(self._decoded)
+        if not ok:
+            raise ValueError(f"Decode failed: {self.path}")
+        self._decoded = decoded
+        self._frame = cv2.resize(decoded, (FRAME_WIDTH, FRAME_HEIGHT), dst=self._frame,
+                                 interpolation=cv2.INTER_NEAREST)
+        return self._frame
+
+    def close(self):
+        self.cap.release()
+
+
+class ReplayReader:
+    """
+    frame_at(t) over one direction of a recording: a memmap view, no
+    decode, identical on every run.
+    """
+    def __init__(self, path, direction):
+        self.path = path
+        self.direction = direction
+        self.recording = Recording(path)
+
+    def frame_at(self, t):
+        return self.recording.frame_at(self.direction, t)
+
+    def close(self):
+        pass
+
+
+def open_reader(direction, path):
+    """ReplayReader for a recording directory, ClipReader for a video file."""
+    if os.path.isdir(path):
+        return ReplayReader(path, direction)
+    return ClipReader(path)
+
+
+def run_simulation(duration, sources=None, db_path=None, start=None):
+    """
+    Simulates `duration` seconds. `sources` maps direction -> video path
+    or recording directory (default VIDEO_FILES). Returns the report dict.
+
+    Every run starts from fresh state (detector, background models,
+    counts, count history), so the same recording and `start` give the
+    same report, also when runs share a process.
+    """
+    if sources is None:
+        sources = VIDEO_FILES
+    readers = {d: open_reader(d, path) for d, path in sources.items()}
+    # Same count path as DetectionService: tracked queue length
+    trackers = {d: VehicleTracker(d) for d in readers} if TRACKING_ENABLED else {}
+    # Raw per-frame detections next to the tracked count: [sum, max]
+    detections = {d: [0, 0] for d in trackers}
+
+    tmpdir = None
+    if db_path is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmpdir.name, "simulation.db")
+
+    vclock = VirtualClock(start, participants=1)
+    previous_clock = clock.get_clock()
+    arduino = get_arduino_status()
+
+    clock.set_clock(vclock)
+    set_arduino_status(False)
+    # Fresh state: nothing learned or counted by an earlier run
+    detector = create_detector()
+    previous_detector = set_detector(detector)
+    previous_counters = reset_counters()
+    previous_state = reset_state()
+    previous_histories = reset_histories()
+    # Own writer, never the app's: counts arrive much faster than real time, flush often
+    store = traffic_store.TrafficStore(db_path, interval=0.1)
+    store.start()
+    previous_store = traffic_store.set_store(store)
+    controller = TrafficController()
+    controller.start()
+
+    sim_start = vclock.time()
+    wall_start = time.perf_counter()
+    steps = int(duration / DETECTION_INTERVAL)
+
+    try:
+        for i in range(steps):
+            t = i * DETECTION_INTERVAL
+            now = vclock.time()
+            snap = get_snapshot()
+            results = detector.detect_batch({d: reader.frame_at(t) for d, reader in readers.items()})
+            for d, boxes in results.items():
+                count = len(boxes)
+                if d in trackers:
+                    detections[d][0] += count
+                    detections[d][1] = max(detections[d][1], count)
+                    count = trackers[d].update(boxes, now, lane_is_green(snap, d))
+                update_count(d, count)
+                store.record_count(d, count, now)
+            # The controller runs every phase change up to the next tick
+            vclock.advance(DETECTION_INTERVAL)
+    finally:
+        controller.stop()
+        vclock.participants = 0
+        controller.join(timeout=5.0)
+        traffic_store.set_store(previous_store)
+        store.stop()
+        clock.set_clock(previous_clock)
+        set_arduino_status(arduino)
+        set_detector(previous_detector)
+        reset_counters(previous_counters)
+        reset_state(previous_state)
+        reset_histories(previous_histories)
+        for reader in readers.values():
+            reader.close()
+
+    wall = time.perf_counter() - wall_start
+    report = build_report(db_path, sim_start, sim_start + steps * DETECTION_INTERVAL, list(sources))
+    report["wall_seconds"] = round(wall, 2)
+    report["speedup"] = round(report["simulated_seconds"] / wall, 1) if wall > 0 else None
+    report["sources"] = dict(sources)
+    report["flow"] = {d: tracker.stats() for d, tracker in trackers.items()}
+    report["detections"] = {
+        d: {"mean": round(total / steps, 2) if steps else 0.0, "max": most}
+        for d, (total, most) in detections.items()
+    }
+
+    if tmpdir is not None:
+        tmpdir.cleanup()
+    return report
+
+
+def build_report(db_path, start, end, directions):
+    """
+    Phase log and per-direction summary for [start, end) from a store file.
+    """
+    phases = traffic_store.query_phases(start, end, path=db_path)
+
+    # Actual duration = time until the next phase started
+    for current, following in zip(phases, phases[1:]):
+        current["actual"] = round(following["t"] - current["t"], 3)
+    if phases:
+        phases[-1]["actual"] = round(min(end - phases[-1]["t"], phases[-1]["planned"]), 3)
+
+    summary = {}
+    counts_per_minute = {}
+    for d in directions:
+        greens = [p["actual"] for p in phases if p["direction"] == d and p["phase"] in GREEN_PHASES]
+        counts = traffic_store.query_counts(d, start, end, bucket=60, path=db_path)
+        samples = counts["samples"].sum()
+
+        summary[d] = {
+            "greens": len(greens),
+            "green_seconds": round(sum(greens), 1),
+            "mean_green": round(sum(greens) / len(greens), 2) if greens else 0.0,
+            "mean_count": round(float((counts["mean"] * counts["samples"]).sum() / samples), 2) if samples else 0.0,
+            "max_count": int(counts["max"].max()) if samples else 0,
+        }
+        counts_per_minute[d] = {
+            "t": counts["t"].tolist(),
+            "mean": [round(float(v), 3) for v in counts["mean"]],
+        }
+
+    return {
+        "start": start,
+        "simulated_seconds": round(end - start, 1),
+        "phases_served": len(phases),
+        "directions": summary,
+        "counts_per_minute": counts_per_minute,
+        "phases": phases,
+    }
+
+
+def check_counts(report, tolerance=CHECK_TOLERANCE):
+    """
+    Tracked counts against the raw per-frame detections; a list of
+    problems (empty when every lane is within bounds).
+    """
+    problems = []
+    for d, raw in report.get("detections", {}).items():
+        s = report["directions"][d]
+        if s["max_count"] > raw["max"] + QUEUE_MARGIN:
+            problems.append(f"{d}: max count {s['max_count']} > max detections {raw['max']} + {QUEUE_MARGIN}")
+        if s["mean_count"] > raw["mean"] * (1 + tolerance) + 1:
+            problems.append(f"{d}: mean count {s['mean_count']} far above mean detections {raw['mean']}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless faster-than-real-time simulation")
+    parser.add_argument("--duration", type=float, default=3600.0, help="simulated seconds")
+    parser.add_argument("--start", type=float, help="simulated start (unix time, default now)")
+    parser.add_argument("--db", help="keep the phase / count store here")
+    parser.add_argument("--output", default="sim_report.json")
+    parser.add_argument("--replay", help="recording directory for every direction it contains")
+    parser.add_argument("--check", action="store_true",
+                        help="fail if tracked counts stray from the per-frame detections")
+    for d in VIDEO_FILES:
+        parser.add_argument(f"--{d}", default=VIDEO_FILES[d], help=f"{d} video or recording")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        sources = {d: args.replay for d in Recording(args.replay).directions}
+    else:
+        sources = {d: getattr(args, d) for d in VIDEO_FILES}
+    report = run_simulation(args.duration, sources, db_path=args.db, start=args.start)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"[SIM] {report['simulated_seconds']:.0f}s simulated in {report['wall_seconds']:.1f}s "
+          f"({report['speedup']}x), {report['phases_served']} phases")
+    for d, s in report["directions"].items():
+        print(f"[SIM] {d:>5}: {s['greens']} greens, mean {s['mean_green']}s, "
+              f"mean count {s['mean_count']}, max {s['max_count']}")
+    print(f"[SIM] Report written to {args.output}")
+
+    if args.check:
+        if not report["detections"]:
+            print("[SIM] --check needs TRACKING_ENABLED")
+            return 1
+        problems = check_counts(report)
+        if problems:
+            print("[SIM] CHECK FAILED:")
+            for line in problems:
+                print("  " + line)
+            return 1
+        print("[SIM] Counts within bounds of the per-frame detections")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
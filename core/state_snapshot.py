@@ -0,0 +1,160 @@
+# core/state_snapshot.py
+
+"""
+Versioned, immutable snapshot of the whole intersection status.
+
+Writers (traffic_state, mode_manager, signal_controller, emergency_handler)
+publish changes with publish_state(); each publish builds a new
+StatusSnapshot and swaps one module reference. Readers just take
+get_snapshot() - no lock, and every field comes from the same moment.
+
+Time-varying fields (countdown, emergency elapsed) are derived from
+absolute monotonic times at read time, so the snapshot itself only
+changes when the state does. status_json() caches the serialized body
+per (version, countdown, elapsed).
+"""
+
+import json
+import math
+import os
+from collections import namedtuple
+from threading import Lock
+from types import MappingProxyType
+from utils import clock
+
+StatusSnapshot = namedtuple("StatusSnapshot", [
+    "version",
+    "mode",                 # simulation | live
+    "arduino",              # bool
+    "current_green",        # direction
+    "counts",               # read-only {direction: count}
+    "phase",                # green | emergency | yellow | all_red
+    "phase_direction",
+    "phase_deadline",       # clock.monotonic()
+    "emergency_direction",  # None when inactive
+    "emergency_started",    # clock.monotonic(), None when inactive
+    "motion_gate",          # read-only {direction: % of frames skipped}
+    "flow",                 # read-only {direction: {queue, arrivals_per_min, discharged}}
+])
+
+# The owning modules publish their initial values when imported
+_snapshot = StatusSnapshot(
+    version=0, mode=None, arduino=False, current_green=None,
+    counts=MappingProxyType({}), phase=None, phase_direction=None,
+    phase_deadline=0.0, emergency_direction=None, emergency_started=None,
+    motion_gate=MappingProxyType({}), flow=MappingProxyType({})
+)
+_publish_lock = Lock()   # writers only
+
+# (key, etag, body) of the last serialized status
+_json_cache = (None, None, None)
+
+# Versions restart at 0 in every process: the nonce keeps an ETag from
+# before a restart from matching different content after it
+_BOOT_NONCE = os.urandom(4).hex()
+
+
+def get_snapshot():
+    """Current snapshot (lock-free; never mutated)."""
+    return _snapshot
+
+
+def publish_state(**changes):
+    """
+    Publishes a new snapshot with `changes` applied and returns it.
+    No-op (same version) when nothing actually changed.
+    """
+    global _snapshot
+    for field in ("counts", "motion_gate", "flow"):
+        if field in changes:
+            changes[field] = MappingProxyType(dict(changes[field]))
+
+    with _publish_lock:
+        current = _snapshot
+        if all(getattr(current, k) == v for k, v in changes.items()):
+            return current
+        _snapshot = current._replace(version=current.version + 1, **changes)
+        return _snapshot
+
+
+# -------------------------------
+# DERIVED VIEWS
+# -------------------------------
+def remaining_time(snap, now=None):
+    """Green countdown (0.1 s resolution); 0 during yellow / all-red."""
+    if snap.phase not in ("green", "emergency"):
+        return 0.0
+    if now is None:
+        now = clock.monotonic()
+    return round(max(0.0, snap.phase_deadline - now), 1)
+
+
+def emergency_elapsed(snap, now=None):
+    """Whole seconds since the emergency started (None if inactive)."""
+    if snap.emergency_direction is None:
+        return None
+    if now is None:
+        now = clock.monotonic()
+    return int(now - snap.emergency_started)
+
+
+def status_dict(snap, now=None):
+    """
+    The /api/status payload, built from one snapshot.
+    """
+    if now is None:
+        now = clock.monotonic()
+
+    if snap.emergency_direction is None:
+        emergency = {"active": False}
+    else:
+        emergency = {
+            "active": True,
+            "direction": snap.emergency_direction,
+            "elapsed_time": emergency_elapsed(snap, now)
+        }
+
+    return {
+        "mode": snap.mode,
+        "arduino": snap.arduino,
+        "current_direction": snap.current_green,
+        "phase": snap.phase,
+        "remaining_time": remaining_time(snap, now),
+        "counts": dict(snap.counts),
+        "emergency": emergency,
+        "motion_gate": dict(snap.motion_gate),
+        "flow": dict(snap.flow)
+    }
+
+
+def status_json(snap=None):
+    """
+    Returns (etag, body_bytes) for the status. The body is serialized
+    once per (version, countdown tick, emergency second) and reused.
+    The ETag also carries a per-process boot nonce.
+    """
+    global _json_cache
+    if snap is None:
+        snap = _snapshot
+    now = clock.monotonic()
+    key = (snap.version, remaining_time(snap, now), emergency_elapsed(snap, now))
+
+    cache = _json_cache
+    if cache[0] == key:
+        return cache[1], cache[2]
+
+    body = json.dumps(status_dict(snap, now), separators=(",", ":"), sort_keys=True).encode()
+    etag = "%s-%d-%d-%s" % (_BOOT_NONCE, key[0], int(key[1] * 10), key[2] if key[2] is not None else "x")
+    # A single reference swap; a racing reader sees the old or new entry
+    _json_cache = (key, etag, body)
+    return etag, body
+
+
+def display_key(snap, now=None):
+    """
+    What the dashboard can actually see change: state version, whole
+    countdown seconds and emergency seconds.
+    """
+    if now is None:
+        now = clock.monotonic()
+    return (snap.version, math.ceil(remaining_time(snap, now)), emergency_elapsed(snap, now))
@@ -0,0 +1,134 @@
+# core/status_feed.py
+
+"""
+Push-based dashboard status (Server-Sent Events).
+One publisher thread samples the system state, serializes it once and
+hands the same bytes to every subscriber - only when something changed.
+"""
+
+import time
+import threading
+from threading import Lock
+
+# Writers publish into the snapshot on import
+import core.mode_manager
+import core.traffic_state
+import core.signal_controller
+import core.emergency_handler
+from core.state_snapshot import display_key, get_snapshot, status_json
+from utils.listeners import ListenerMixin
+
+# -------------------------------
+# CONFIG
+# -------------------------------
+STATUS_POLL_INTERVAL = 0.1   # how often the publisher samples state
+KEEPALIVE_INTERVAL = 15.0    # SSE comment so proxies keep the connection
+
+_publisher = None
+_publisher_lock = Lock()
+
+
+class StatusPublisher(ListenerMixin, threading.Thread):
+    """
+    Samples the status snapshot every STATUS_POLL_INTERVAL and publishes a
+    pre-encoded SSE event whenever something visible changes: the state
+    version, or the countdown / emergency timer in whole seconds (what the
+    dashboard shows). A running countdown produces one event per second.
+    """
+    def __init__(self):
+        super().__init__()
+        self.daemon = True
+        self.running = True
+
+        self._cond = threading.Condition()
+        self._event = None
+        self._seq = 0
+        self._subscribers = 0
+
+    def run(self):
+        print("[STATUS] Publisher started")
+        last_key = None
+
+        while self.running:
+            start = time.time()
+
+            if self._subscribers > 0:
+                snap = get_snapshot()
+                key = display_key(snap)
+
+                if key != last_key:
+                    last_key = key
+                    _, body = status_json(snap)
+                    with self._cond:
+                        self._seq += 1
+                        self._event = b"id: %d\ndata: %s\n\n" % (self._seq, body)
+                        self._cond.notify_all()
+                    self._notify_listeners()
+
+            elapsed = time.time() - start
+            if elapsed < STATUS_POLL_INTERVAL:
+                time.sleep(STATUS_POLL_INTERVAL - elapsed)
+
+    def subscribe(self):
+        with self._cond:
+            self._subscribers += 1
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers = max(0, self._subscribers - 1)
+
+    def wait_for_event(self, last_seq, timeout):
+        """
+        Blocks until an event newer than last_seq exists.
+        Returns (seq, event_bytes); event may be None before the first sample.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != last_seq or not self.running, timeout)
+            return self._seq, self._event
+
+    def stop(self):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        self._notify_listeners()
+
+
+def get_status_publisher():
+    """
+    Returns the shared publisher, starting it on first use.
+    """
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None or not _publisher.is_alive():
+            _publisher = StatusPublisher()
+            _publisher.start()
+        return _publisher
+
+
+def stop_status_publisher():
+    global _publisher
+    with _publisher_lock:
+        if _publisher is not None:
+            _publisher.stop()
+            _publisher = None
+
+
+def stream_status():
+    """
+    SSE generator for one client: the latest event right away, then
+    every change. Slow clients skip straight to the newest state.
+    """
+    publisher = get_status_publisher()
+    publisher.subscribe()
+
+    try:
+        seq = 0
+        while publisher.running:
+            new_seq, event = publisher.wait_for_event(seq, KEEPALIVE_INTERVAL)
+            if event is None or new_seq == seq:
+                yield b": keepalive\n\n"
+                continue
+            seq = new_seq
+            yield event
+    finally:
+        publisher.unsubscribe()
@@ -1,6 +1,7 @@
 # core/timing_logic.py
 
 from core.traffic_state import get_all_counts
+from core.count_history import get_smoothed_count
 
 CYCLE_ORDER = ["north", "south", "east", "west"]
 MIN_GREEN = 5
@@ -10,9 +11,13 @@ TIME_PER_VEHICLE = 2  # Seconds per car
 def calculate_dynamic_duration(direction):
     """
     Calculates Green Time based on vehicle count.
+    Uses the mean count over the last SMOOTHING_WINDOW seconds, so one
+    noisy frame doesn't decide the phase (falls back to the live count).
     """
-    counts = get_all_counts()
-    count = counts.get(direction, 0)
+    count = get_smoothed_count(direction)
+    if count is None:
+        count = get_all_counts().get(direction, 0)
+    count = round(count)
     
     if count <= 0:
         return MIN_GREEN
@@ -0,0 +1,266 @@
+# core/tracker.py
+
+"""
+Per-lane vehicle tracker: turns per-frame blob boxes into flow.
+
+Detections are linked to tracks by one NumPy cost matrix per update:
+1 - IoU where boxes overlap (IoU >= TRACK_MIN_IOU), otherwise
+1 + centroid distance / reach, where reach is how far a vehicle can
+move (TRACK_MAX_SPEED) in the time since the last detection. Pairs
+that are each other's cheapest choice are matched, and the rest of the
+matrix is masked and solved again (a few rounds at most).
+
+A track counts as a vehicle once it was seen TRACK_MIN_HITS times, and
+survives TRACK_TIMEOUT seconds unseen, which bridges occlusions and
+merged blobs - unless it was last seen touching the lane's border, in
+which case the vehicle has left the view.
+
+While the lane is not green, confirmed tracks that were standing still
+when last seen are held unseen for up to TRACK_RED_TIMEOUT instead: a
+vehicle stopped at the red light fades into the MOG2 background within
+seconds, but it is still queued. Tracks lost while moving expire as
+usual. When the green starts, held tracks seen in the last
+GREEN_PICKUP_WINDOW seconds get TRACK_TIMEOUT to be picked up again as
+they move off; older ones are dropped, so stale tracks held through the
+red don't inflate the count the controller samples.
+
+From that:
+- queue_length: vehicles currently tracked in the lane, at most
+  QUEUE_MARGIN more than the most detections in one frame over the
+  last TRACK_RED_TIMEOUT seconds (split and merged blobs make more
+  tracks than there are vehicles)
+- arrivals_per_min: tracks confirmed in the last ARRIVAL_WINDOW seconds
+- discharged: confirmed tracks that left at the lane's border while it
+  was green (or yellow), for the current or most recent green; tracks
+  lost inside the lane (occlusion, noise) don't count
+"""
+
+from collections import deque
+
+import numpy as np
+
+from config import (
+    FRAME_WIDTH, FRAME_HEIGHT, LANE_ROIS, TRACK_MIN_HITS, TRACK_TIMEOUT, TRACK_RED_TIMEOUT, TRACK_MIN_IOU,
+    TRACK_MAX_SPEED
+)
+
+ARRIVAL_WINDOW = 60.0   # seconds
+MATCH_ROUNDS = 3
+EDGE_MARGIN = 2         # px from the lane border that counts as "at the edge"
+MOVE_EPSILON = 2.0      # px of centre shift between two matches that counts as moving
+GREEN_PICKUP_WINDOW = 5.0   # seconds: held tracks seen this recently survive the green start
+QUEUE_MARGIN = 2        # tracks allowed above the recent per-frame detection maximum
+DISCHARGE_PHASES = ("green", "emergency", "yellow")
+
+
+def lane_is_green(snap, direction):
+    """True while `direction` may discharge traffic (green, emergency or yellow)."""
+    return snap.phase in DISCHARGE_PHASES and snap.phase_direction == direction
+
+
+def lane_bounds(direction):
+    """(x0, y0, x1, y1) of the lane: its ROI's bounding box, or the frame."""
+    roi = LANE_ROIS.get(direction)
+    if not roi:
+        return (0.0, 0.0, float(FRAME_WIDTH), float(FRAME_HEIGHT))
+    poly = np.clip(np.array(roi, dtype=np.float32).reshape(-1, 2), 0, [FRAME_WIDTH - 1, FRAME_HEIGHT - 1])
+    x0, y0 = poly.min(axis=0)
+    x1, y1 = poly.max(axis=0) + 1
+    return (float(x0), float(y0), float(x1), float(y1))
+
+
+def iou_matrix(a, b):
+    """IoU of every box in a (M, 4) against every box in b (N, 4), as (M, N)."""
+    ax2 = a[:, 0] + a[:, 2]
+    ay2 = a[:, 1] + a[:, 3]
+    bx2 = b[:, 0] + b[:, 2]
+    by2 = b[:, 1] + b[:, 3]
+    iw = np.minimum(ax2[:, None], bx2) - np.maximum(a[:, None, 0], b[:, 0])
+    ih = np.minimum(ay2[:, None], by2) - np.maximum(a[:, None, 1], b[:, 1])
+    inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+    union = (a[:, 2] * a[:, 3])[:, None] + b[:, 2] * b[:, 3] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+def match(cost):
+    """
+    Mutual-best assignment on a (tracks, detections) cost matrix.
+    Returns det_track: for each detection the matched track or -1.
+    """
+    cost = cost.copy()
+    det_track = np.full(cost.shape[1], -1, dtype=np.intp)
+    rows = np.arange(cost.shape[0])
+
+    for _ in range(MATCH_ROUNDS):
+        best_det = cost.argmin(axis=1)
+        best_track = cost.argmin(axis=0)
+        mutual = (best_track[best_det] == rows) & np.isfinite(cost[rows, best_det])
+        if not mutual.any():
+            break
+        tracks = rows[mutual]
+        dets = best_det[mutual]
+        det_track[dets] = tracks
+        cost[tracks, :] = np.inf
+        cost[:, dets] = np.inf
+    return det_track
+
+
+class VehicleTracker:
+    """
+    Tracks for ONE lane. Not thread-safe: updated from the detection
+    loop only; stats() returns plain values.
+    """
+    def __init__(self, direction=None, min_hits=TRACK_MIN_HITS, timeout=TRACK_TIMEOUT,
+                 red_timeout=TRACK_RED_TIMEOUT, bounds=None):
+        self.direction = direction
+        self.min_hits = min_hits
+        self.timeout = timeout
+        self.red_timeout = red_timeout
+        x0, y0, x1, y1 = lane_bounds(direction) if bounds is None else bounds
+        self._inner = (x0 + EDGE_MARGIN, y0 + EDGE_MARGIN, x1 - EDGE_MARGIN, y1 - EDGE_MARGIN)
+
+        # One row per track
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.hits = np.zeros(0, dtype=np.int32)
+        self.last_seen = np.zeros(0, dtype=np.float64)
+        self.moving = np.zeros(0, dtype=bool)
+
+        self._last_t = None
+        self._arrivals = deque()   # confirmation times within ARRIVAL_WINDOW
+        # (t, detections) with decreasing counts: front = max over red_timeout
+        self._detections = deque()
+        self._last_detections = 0
+        # Current / most recent green: [start, end or None, discharged]
+        self._green = None
+
+    @property
+    def queue_length(self):
+        tracked = int(np.count_nonzero(self.hits >= self.min_hits))
+        most = self._detections[0][1] if self._detections else 0
+        return min(tracked, most + QUEUE_MARGIN)
+
+    def update(self, boxes, t, green=False):
+        """
+        Links one frame's detections (N, 4 x, y, w, h) at time t.
+        Returns the queue length.
+        """
+        self._set_green(green, t)
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self._observe(len(boxes), t)
+        dt = 0.0 if self._last_t is None else max(0.0, t - self._last_t)
+        self._last_t = t
+
+        det_track = np.full(len(boxes), -1, dtype=np.intp)
+        if len(self.boxes) and len(boxes):
+            det_track = match(self._cost(boxes, dt))
+
+        # Matched: follow the detection
+        matched = det_track >= 0
+        tracks = det_track[matched]
+        shift = (boxes[matched, :2] + boxes[matched, 2:] / 2) - (self.boxes[tracks, :2] + self.boxes[tracks, 2:] / 2)
+        self.moving[tracks] = np.hypot(shift[:, 0], shift[:, 1]) > MOVE_EPSILON
+        self.boxes[tracks] = boxes[matched]
+        self.last_seen[tracks] = t
+        confirmed_before = self.hits[tracks] >= self.min_hits
+        self.hits[tracks] += 1
+        arrivals = np.count_nonzero(~confirmed_before & (self.hits[tracks] >= self.min_hits))
+
+        # Unmatched detections start tentative tracks
+        new = boxes[~matched]
+        if len(new):
+            self.boxes = np.concatenate((self.boxes, new))
+            self.hits = np.concatenate((self.hits, np.ones(len(new), dtype=np.int32)))
+            self.last_seen = np.concatenate((self.last_seen, np.full(len(new), t)))
+            self.moving = np.concatenate((self.moving, np.zeros(len(new), dtype=bool)))
+            if self.min_hits <= 1:
+                arrivals += len(new)
+
+        self._arrivals.extend([t] * arrivals)
+        self._expire(t)
+        return self.queue_length
+
+    def touch(self, t, green=False):
+        """The frame didn't change (motion gate): every track is still there."""
+        self._set_green(green, t)
+        self._observe(self._last_detections, t)
+        self.last_seen[:] = t
+        self.moving[:] = False
+        self._last_t = t
+        self._expire(t)
+        return self.queue_length
+
+    def _observe(self, detections, t):
+        """Running maximum of per-frame detections over red_timeout."""
+        self._last_detections = detections
+        while self._detections and self._detections[-1][1] <= detections:
+            self._detections.pop()
+        self._detections.append((t, detections))
+        while self._detections[0][0] < t - self.red_timeout:
+            self._detections.popleft()
+
+    def _cost(self, boxes, dt):
+        iou = iou_matrix(self.boxes, boxes)
+        diff = (self.boxes[:, None, :2] + self.boxes[:, None, 2:] / 2) - (boxes[:, :2] + boxes[:, 2:] / 2)
+        dist = np.sqrt(np.einsum("ijk,ijk->ij", diff, diff))
+        # Half the track's diagonal covers jitter when dt is tiny
+        reach = TRACK_MAX_SPEED * dt + 0.5 * np.hypot(self.boxes[:, 2], self.boxes[:, 3])[:, None]
+
+        cost = 1.0 + dist / reach
+        cost[dist > reach] = np.inf
+        overlap = iou >= TRACK_MIN_IOU
+        cost[overlap] = 1.0 - iou[overlap]
+        return cost
+
+    def _expire(self, t):
+        confirmed = self.hits >= self.min_hits
+        unseen = self.last_seen < t
+        exited = np.zeros(len(self.boxes), dtype=bool)
+        if unseen.any():
+            # Unseen at the border: the vehicle drove out of view
+            b = self.boxes
+            x0, y0, x1, y1 = self._inner
+            at_edge = (b[:, 0] <= x0) | (b[:, 1] <= y0) | (b[:, 0] + b[:, 2] >= x1) | (b[:, 1] + b[:, 3] >= y1)
+            exited = unseen & at_edge
+        unseen_for = t - self.last_seen
+        gone = exited | (unseen_for > self.timeout)
+        if not self._is_green():
+            # Stopped at the red light: kept even once absorbed into the
+            # background, up to red_timeout. Tracks lost while moving
+            # (fragments, vehicles driving on) expire as usual
+            held = confirmed & ~self.moving & (unseen_for <= self.red_timeout)
+            gone &= ~held
+        if gone.any():
+            left = self.last_seen[gone & exited & confirmed]
+            if self._green is not None and left.size:
+                start, end = self._green[0], self._green[1]
+                if end is None:
+                    end = np.inf
+                self._green[2] += int(np.count_nonzero((left >= start) & (left <= end)))
+            keep = ~gone
+            self.boxes = self.boxes[keep]
+            self.hits = self.hits[keep]
+            self.last_seen = self.last_seen[keep]
+            self.moving = self.moving[keep]
+
+        while self._arrivals and self._arrivals[0] < t - ARRIVAL_WINDOW:
+            self._arrivals.popleft()
+
+    def _is_green(self):
+        return self._green is not None and self._green[1] is None
+
+    def _set_green(self, green, t):
+        if green and not self._is_green():
+            self._green = [t, None, 0]
+            # The queue starts to move: TRACK_TIMEOUT from now to be seen
+            # again, for tracks still seen lately (the rest expire below)
+            held = (self.hits >= self.min_hits) & (t - self.last_seen <= GREEN_PICKUP_WINDOW)
+            self.last_seen[held] = t
+        elif not green and self._green is not None and self._green[1] is None:
+            self._green[1] = t
+
+    def stats(self):
+        return {
+            "queue": self.queue_length,
+            "arrivals_per_min": round(len(self._arrivals) * 60.0 / ARRIVAL_WINDOW, 1),
+            "discharged": self._green[2] if self._green is not None else 0,
+        }
@@ -1,6 +1,8 @@
 # core/traffic_state.py
 
 from threading import Lock
+from core.state_snapshot import publish_state
+from core.count_history import record_count
 
 # -------------------------------
 # SHARED STATE
@@ -17,6 +19,9 @@ _current_green = "north"
 
 _lock = Lock()
 
+# Every change is also published to the status snapshot (state_snapshot.py)
+publish_state(counts=_counts, current_green=_current_green)
+
 
 # -------------------------------
 # VEHICLE COUNTS
@@ -25,11 +30,27 @@ def update_count(direction, count):
     if direction not in _counts: return
     with _lock:
         _counts[direction] = int(count) if count >= 0 else 0
+        publish_state(counts=_counts)
+    # Kept for smoothing and /api/history (core/count_history.py)
+    record_count(direction, max(count, 0))
 
 def get_all_counts():
     with _lock:
         return dict(_counts)
 
+def reset_state(state=None):
+    """
+    Replaces counts and current green (default: all zero, north green).
+    Returns the previous (counts, current_green) for restoring.
+    """
+    global _counts, _current_green
+    counts, green = state if state is not None else ({d: 0 for d in _counts}, "north")
+    with _lock:
+        previous = (_counts, _current_green)
+        _counts, _current_green = dict(counts), green
+        publish_state(counts=_counts, current_green=green)
+    return previous
+
 
 # -------------------------------
 # SIGNAL STATE (Fixes Timers)
@@ -38,6 +59,7 @@ def set_current_green(direction):
     global _current_green
     with _lock:
         _current_green = direction
+        publish_state(current_green=direction)
 
 def get_current_green():
     with _lock:
@@ -0,0 +1,317 @@
+# core/traffic_store.py
+
+"""
+Durable, append-only record of counts and signal phases (SQLite, WAL).
+
+Hot paths (DetectionService, TrafficController) only append a tuple to
+a deque. The TrafficStore thread drains it every PERSIST_INTERVAL,
+folds counts into 1 s buckets (mean / min / max / samples) and writes
+everything in one transaction (group commit).
+
+Counts are stored columnar: one row per (direction, minute) holding
+four 60-slot arrays as BLOBs. A day for one direction is 1440 rows of
+a single clustered range scan, decoded with np.frombuffer.
+"""
+
+import os
+import sqlite3
+import threading
+import numpy as np
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from threading import Lock
+
+from config import DB_PATH, PERSIST_INTERVAL
+from utils import clock
+
+MAX_BACKLOG = 100000    # events kept if the disk stalls (oldest dropped)
+MINUTE = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counts (
+    direction TEXT NOT NULL,
+    minute    INTEGER NOT NULL,   -- unix seconds, multiple of 60
+    mean      BLOB NOT NULL,      -- float32[60], one slot per second
+    min       BLOB NOT NULL,      -- int16[60]
+    max       BLOB NOT NULL,      -- int16[60]
+    samples   BLOB NOT NULL,      -- uint16[60], 0 = no data that second
+    PRIMARY KEY (direction, minute)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS phases (
+    direction TEXT NOT NULL,
+    ts        REAL NOT NULL,      -- phase start, unix seconds
+    phase     TEXT NOT NULL,      -- green | emergency | yellow | all_red
+    planned   REAL NOT NULL,      -- scheduled duration, seconds
+    PRIMARY KEY (direction, ts)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS phases_ts ON phases (ts);
+"""
+
+_store = None
+_store_lock = Lock()
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=5.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")   # durable at checkpoint, no fsync per commit
+    return conn
+
+
+def _connect_readonly(path):
+    """
+    Query connection. mode=ro never creates the file: a missing store
+    raises sqlite3.OperationalError instead of leaving an empty database.
+    """
+    uri = Path(path).absolute().as_uri() + "?mode=ro"
+    return sqlite3.connect(uri, uri=True, timeout=5.0)
+
+
+class _MinuteBlock:
+    """
+    One direction-minute of 1 s buckets, accumulated in the writer.
+    """
+    def __init__(self, row=None):
+        self.total = np.zeros(MINUTE, dtype=np.float64)
+        self.n = np.zeros(MINUTE, dtype=np.uint16)
+        self.lo = np.zeros(MINUTE, dtype=np.int16)
+        self.hi = np.zeros(MINUTE, dtype=np.int16)
+        if row is not None:
+            # Resume a minute written before a restart
+            mean, lo, hi, n = row
+            self.n[:] = np.frombuffer(n, dtype=np.uint16)
+            self.total[:] = np.frombuffer(mean, dtype=np.float32) * self.n
+            self.lo[:] = np.frombuffer(lo, dtype=np.int16)
+            self.hi[:] = np.frombuffer(hi, dtype=np.int16)
+
+    def add(self, second, count):
+        if self.n[second] == 0:
+            self.lo[second] = self.hi[second] = count
+        else:
+            self.lo[second] = min(self.lo[second], count)
+            self.hi[second] = max(self.hi[second], count)
+        self.total[second] += count
+        self.n[second] += 1
+
+    def blobs(self):
+        mean = (self.total / np.maximum(self.n, 1)).astype(np.float32)
+        return mean.tobytes(), self.lo.tobytes(), self.hi.tobytes(), self.n.tobytes()
+
+
+class TrafficStore(threading.Thread):
+    """
+    Background writer. record_count() / record_phase() never block.
+    """
+    def __init__(self, path=DB_PATH, interval=PERSIST_INTERVAL):
+        super().__init__()
+        self.daemon = True
+        self.running = True
+        self.path = path
+        self.interval = interval
+
+        self._events = deque(maxlen=MAX_BACKLOG)
+        self._wake = threading.Event()
+        self._blocks = {}    # (direction, minute) -> _MinuteBlock
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with _connect(path) as conn:
+            conn.executescript(_SCHEMA)
+        conn.close()
+
+    # ---------- producer side (any thread) ----------
+    def record_count(self, direction, count, t):
+        self._events.append(("count", direction, t, count))
+
+    def record_phase(self, direction, phase, t, planned):
+        self._events.append(("phase", direction, t, phase, planned))
+
+    # ---------- writer side ----------
+    def run(self):
+        print(f"[STORE] Writing to {self.path}")
+        conn = _connect(self.path)
+        try:
+            while self.running:
+                self._wake.wait(self.interval)
+                self._flush(conn, final=not self.running)
+            self._flush(conn, final=True)
+        finally:
+            conn.close()
+
+    def _flush(self, conn, final=False):
+        phases = []
+        touched = set()
+        while self._events:
+            event = self._events.popleft()
+            if event[0] == "count":
+                _, direction, t, count = event
+                second = int(t)
+                key = (direction, second - second % MINUTE)
+                block = self._blocks.get(key)
+                if block is None:
+                    block = self._blocks[key] = self._load_block(conn, key)
+                block.add(second % MINUTE, max(0, min(int(count), 32767)))
+                touched.add(key)
+            else:
+                _, direction, t, phase, planned = event
+                phases.append((direction, t, phase, planned))
+
+        rows = [key + self._blocks[key].blobs() for key in touched]
+        try:
+            with conn:   # one transaction
+                conn.executemany("INSERT OR REPLACE INTO counts VALUES (?, ?, ?, ?, ?, ?)", rows)
+                conn.executemany("INSERT OR REPLACE INTO phases VALUES (?, ?, ?, ?)", phases)
+        except sqlite3.Error as e:
+            print("[STORE] Write failed:", e)
+
+        # Finished minutes are on disk; keep only the current ones
+        # (frames arrive a little late, so allow a few seconds)
+        cutoff = float("inf") if final else clock.time() - MINUTE - 5
+        for key in [k for k in self._blocks if k[1] < cutoff]:
+            del self._blocks[key]
+
+    @staticmethod
+    def _load_block(conn, key):
+        row = conn.execute(
+            "SELECT mean, min, max, samples FROM counts WHERE direction = ? AND minute = ?", key).fetchone()
+        return _MinuteBlock(row)
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        self.join(timeout=5.0)
+
+
+# -------------------------------
+# MODULE API
+# -------------------------------
+def start_store(path=DB_PATH, interval=PERSIST_INTERVAL):
+    """
+    Starts the shared writer (once).
+    """
+    global _store
+    with _store_lock:
+        if _store is None or not _store.is_alive():
+            _store = TrafficStore(path, interval)
+            _store.start()
+        return _store
+
+
+def stop_store():
+    """Flushes everything still queued and stops the writer."""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.stop()
+            _store = None
+
+
+def set_store(store):
+    """
+    Installs a running store as the shared writer (simulation); None
+    detaches it. Returns the previous one, which is left running.
+    """
+    global _store
+    with _store_lock:
+        previous, _store = _store, store
+        return previous
+
+
+def record_count(direction, count, t=None):
+    """Queues one count (no-op while the store isn't running)."""
+    store = _store
+    if store is not None:
+        store.record_count(direction, count, clock.time() if t is None else t)
+
+
+def record_phase(direction, phase, planned, t=None):
+    """Queues one phase start (no-op while the store isn't running)."""
+    store = _store
+    if store is not None:
+        store.record_phase(direction, phase, clock.time() if t is None else t, planned)
+
+
+# -------------------------------
+# QUERIES
+# -------------------------------
+def day_range(day=None):
+    """
+    (start, end) unix seconds of a local calendar day.
+    `day` is a date, "YYYY-MM-DD" or None (today).
+    """
+    if day is None:
+        day = datetime.now().date()
+    elif isinstance(day, str):
+        day = datetime.strptime(day, "%Y-%m-%d").date()
+    start = datetime(day.year, day.month, day.day)
+    return start.timestamp(), (start + timedelta(days=1)).timestamp()
+
+
+def query_counts(direction, start, end, bucket=1, path=DB_PATH):
+    """
+    Counts for one direction in [start, end), aggregated to `bucket`
+    seconds (1 = as stored). Seconds without data are left out.
+    Returns NumPy arrays {"t", "mean", "min", "max", "samples"}.
+    Raises sqlite3.OperationalError if the store doesn't exist (yet).
+    """
+    conn = _connect_readonly(path)
+    try:
+        rows = conn.execute(
+            "SELECT minute, mean, min, max, samples FROM counts "
+            "WHERE direction = ? AND minute >= ? AND minute < ? ORDER BY minute",
+            (direction, int(start) - int(start) % MINUTE, end)).fetchall()
+    finally:
+        conn.close()
+
+    if not rows:
+        empty = np.zeros(0)
+        return {"t": empty, "mean": empty, "min": empty, "max": empty, "samples": empty}
+
+    minutes, means, los, his, ns = zip(*rows)
+    t = (np.array(minutes, dtype=np.int64)[:, None] + np.arange(MINUTE)).ravel()
+    mean = np.frombuffer(b"".join(means), dtype=np.float32)
+    lo = np.frombuffer(b"".join(los), dtype=np.int16)
+    hi = np.frombuffer(b"".join(his), dtype=np.int16)
+    n = np.frombuffer(b"".join(ns), dtype=np.uint16)
+
+    keep = (n > 0) & (t >= start) & (t < end)
+    t, mean, lo, hi, n = t[keep], mean[keep], lo[keep], hi[keep], n[keep].astype(np.int64)
+
+    if bucket > 1 and t.size:
+        # t is sorted: aggregate runs of equal bucket keys
+        keys = t // int(bucket)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+        weighted = np.add.reduceat(mean * n, starts)
+        n_sum = np.add.reduceat(n, starts)
+        t = keys[starts] * int(bucket)
+        mean = weighted / n_sum
+        lo = np.minimum.reduceat(lo, starts)
+        hi = np.maximum.reduceat(hi, starts)
+        n = n_sum
+
+    return {"t": t, "mean": mean, "min": lo, "max": hi, "samples": n}
+
+
+def query_phases(start, end, direction=None, path=DB_PATH):
+    """
+    Phase log in [start, end), oldest first:
+    [{"t", "direction", "phase", "planned"}, ...]
+    """
+    conn = _connect_readonly(path)
+    try:
+        if direction is None:
+            rows = conn.execute(
+                "SELECT ts, direction, phase, planned FROM phases "
+                "WHERE ts >= ? AND ts < ? ORDER BY ts", (start, end)).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT ts, direction, phase, planned FROM phases "
+                "WHERE direction = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (direction, start, end)).fetchall()
+    finally:
+        conn.close()
+
+    return [{"t": t, "direction": d, "phase": p, "planned": round(planned, 3)} for t, d, p, planned in rows]
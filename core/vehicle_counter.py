@@ -2,69 +2,245 @@
 
 import cv2
 import numpy as np
+from threading import Lock
+
+from config import DETECTION_SCALE, LANE_ROIS
+from utils.buffer_pool import BufferPool
 
 # -------------------------------
 # CONFIGURATION
 # -------------------------------
 # Optimized for 640x360 resolution
-MIN_VEHICLE_AREA = 500  
+# (scaled by DETECTION_SCALE^2 when detecting at a lower resolution)
+MIN_VEHICLE_AREA = 500
 MAX_VEHICLE_AREA = 15000
 
-# Background Subtractor
-# detectShadows=True is critical for accuracy but slightly slower.
-# Since we pipeline, we can afford it now.
-_bg = cv2.createBackgroundSubtractorMOG2(
-    history=500,
-    varThreshold=25,
-    detectShadows=True
-)
+# Shape filter (width / height of the blob's bounding box)
+MIN_ASPECT = 0.2
+MAX_ASPECT = 4.0
 
 _WARMUP_FRAMES = 10
-_frame_index = 0
 
-def count_vehicles(frame):
+# Shared empty result (read-only by convention)
+_NO_BOXES = np.zeros((0, 4), dtype=np.float32)
+
+
+def lane_crop(roi, frame_shape):
+    """
+    Detection crop for a lane: (ROI polygon clipped to the frame as an
+    int32 (N, 2) array, or None without ROI; (x, y, w, h) bounding box).
     """
-    Pure Detection Logic. No drawing/visuals.
+    fh, fw = frame_shape[:2]
+    if not roi:
+        return None, (0, 0, fw, fh)
+    poly = np.array(roi, dtype=np.int32).reshape(-1, 2)
+    poly[:, 0] = np.clip(poly[:, 0], 0, fw - 1)
+    poly[:, 1] = np.clip(poly[:, 1], 0, fh - 1)
+    return poly, cv2.boundingRect(poly)
+
+
+def _odd_ksize(base, scale):
+    """Scales a 640x360 kernel size, keeping it odd and >= 3."""
+    k = max(3, int(round(base * scale)))
+    return k if k % 2 else k + 1
+
+
+class VehicleCounter:
+    """
+    Vehicle counter for ONE direction.
+    Each lane owns its background model, so MOG2 learns a single scene
+    and its history isn't shared with the other three cameras.
+
+    roi: optional lane polygon [(x, y), ...] in full-frame coordinates.
+    The frame is cropped to its bounding box and everything outside the
+    polygon is blanked before background subtraction.
+    scale: detection resolution relative to the incoming frame.
+
+    Every intermediate image is written into this counter's BufferPool
+    via dst=, so steady-state counting allocates nothing per frame.
+    """
+    def __init__(self, direction=None, roi=None, scale=1.0):
+        self.direction = direction
+        self.frame_index = 0
+        self.roi = roi
+        self.scale = scale
+
+        # Filled in by _prepare() for the first frame size we see
+        self._frame_shape = None
+        self._crop = None        # (x, y, w, h) in full-frame pixels
+        self._det_size = None    # (w, h) after scaling
+        self._roi_mask = None    # uint8 polygon mask at detection size
+
+        area_scale = scale * scale
+        self.min_area = MIN_VEHICLE_AREA * area_scale
+        self.max_area = MAX_VEHICLE_AREA * area_scale
+        self._ksize = (_odd_ksize(5, scale), _odd_ksize(5, scale))
+
+        # Background Subtractor
+        # detectShadows=True is critical for accuracy but slightly slower.
+        # Since we pipeline, we can afford it now.
+        self._bg = cv2.createBackgroundSubtractorMOG2(
+            history=500,
+            varThreshold=25,
+            detectShadows=True
+        )
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_RECT, self._ksize)
+        self._buffers = BufferPool()
+
+    def _prepare(self, frame_shape):
+        """
+        Precomputes crop box, detection size and polygon mask for a frame size.
+        """
+        self._frame_shape = frame_shape
+        poly, (x, y, w, h) = lane_crop(self.roi, frame_shape)
+        self._crop = (x, y, w, h)
+
+        dw = max(1, int(round(w * self.scale)))
+        dh = max(1, int(round(h * self.scale)))
+        self._det_size = (dw, dh)
+
+        if poly is not None:
+            # Polygon in crop-local, scaled coordinates
+            local = (poly - [x, y]) * [dw / w, dh / h]
+            mask = np.zeros((dh, dw), dtype=np.uint8)
+            cv2.fillPoly(mask, [np.round(local).astype(np.int32)], 255)
+            self._roi_mask = mask
+        else:
+            self._roi_mask = None
+
+    def count(self, frame):
+        """
+        Pure Detection Logic. No drawing/visuals.
+        Returns: integer count
+        """
+        return len(self.detect(frame))
+
+    def detect(self, frame):
+        """
+        Vehicle bounding boxes as a float32 (N, 4) array of x, y, w, h in
+        full-frame pixels (the tracker links them across frames).
+        """
+        self.frame_index += 1
+
+        if frame is None:
+            return _NO_BOXES
+
+        if frame.shape != self._frame_shape:
+            self._prepare(frame.shape)
+
+        # 1. CROP + DOWNSCALE (crop is a view, no copy)
+        x, y, w, h = self._crop
+        roi = frame[y:y + h, x:x + w]
+        dw, dh = self._det_size
+        buf = self._buffers
+        if (dw, dh) != (w, h):
+            roi = cv2.resize(roi, (dw, dh), dst=buf.get("small", (dh, dw, 3)),
+                             interpolation=cv2.INTER_AREA)
+
+        # 2. PRE-PROCESS (outside-lane pixels blanked before blur/MOG2)
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY, dst=buf.get("gray", (dh, dw)))
+        if self._roi_mask is not None:
+            cv2.bitwise_and(gray, self._roi_mask, dst=gray)
+        blurred = cv2.GaussianBlur(gray, self._ksize, 0, dst=buf.get("blurred", (dh, dw)))
+
+        # 3. SUBTRACT BACKGROUND
+        mask = self._bg.apply(blurred, fgmask=buf.get("fg", (dh, dw)))
+
+        # 4. SHADOW REMOVAL & CLEANING
+        cv2.threshold(mask, 250, 255, cv2.THRESH_BINARY, dst=mask)
+        closed = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self._kernel, dst=buf.get("closed", (dh, dw)),
+                                  iterations=2)
+        mask = cv2.dilate(closed, self._kernel, dst=mask, iterations=1)
+
+        # Warmup
+        if self.frame_index < _WARMUP_FRAMES:
+            return _NO_BOXES
+
+        # 5. FIND OBJECTS (back to full-frame coordinates)
+        boxes = blob_boxes(mask, self.min_area, self.max_area, labels=buf.get("labels", (dh, dw), np.int32))
+        if len(boxes) and ((dw, dh) != (w, h) or x or y):
+            boxes = boxes * np.array([w / dw, h / dh, w / dw, h / dh], dtype=np.float32)
+            boxes += np.array([x, y, 0, 0], dtype=np.float32)
+        return boxes
+
+
+def count_blobs(mask, min_area=MIN_VEHICLE_AREA, max_area=MAX_VEHICLE_AREA, labels=None):
+    """
+    Counts vehicle-sized blobs in a binary mask.
+    Note: blob area is the pixel count, not the contour polygon area.
+    """
+    return len(blob_boxes(mask, min_area, max_area, labels))
+
+
+def blob_boxes(mask, min_area=MIN_VEHICLE_AREA, max_area=MAX_VEHICLE_AREA, labels=None):
+    """
+    Bounding boxes (float32 x, y, w, h) of the vehicle-sized blobs in a
+    binary mask. Filtering runs on the whole stats array at once (no
+    per-contour loop).
+    labels: optional preallocated int32 label image (same size as mask).
+    """
+    n, _, stats, _ = cv2.connectedComponentsWithStats(mask, labels=labels, connectivity=8)
+    if n <= 1:
+        return _NO_BOXES
+
+    # Row 0 is the background label
+    stats = stats[1:]
+    area = stats[:, cv2.CC_STAT_AREA]
+    w = stats[:, cv2.CC_STAT_WIDTH]
+    h = stats[:, cv2.CC_STAT_HEIGHT]
+
+    # Filter by Size, then by Shape (Aspect Ratio); h is always >= 1
+    aspect = w / h
+    keep = (
+        (area > min_area) & (area < max_area) &
+        (aspect > MIN_ASPECT) & (aspect < MAX_ASPECT)
+    )
+    return stats[keep, :4].astype(np.float32)
+
+
+# -------------------------------
+# PER-DIRECTION REGISTRY
+# -------------------------------
+_counters = {}
+_counters_lock = Lock()
+
+
+def get_counter(direction):
+    """
+    Returns the VehicleCounter for a direction, creating it on first use.
+    """
+    with _counters_lock:
+        counter = _counters.get(direction)
+        if counter is None:
+            counter = VehicleCounter(direction, LANE_ROIS.get(direction), DETECTION_SCALE)
+            _counters[direction] = counter
+        return counter
+
+
+def reset_counters(counters=None):
+    """
+    Replaces the registry (default: empty, so every direction starts a
+    fresh background model). Returns the previous one for restoring.
+    """
+    global _counters
+    with _counters_lock:
+        previous, _counters = _counters, {} if counters is None else counters
+        return previous
+
+
+def count_vehicles(frame, direction=None):
+    """
+    Counts vehicles in a frame with the configured detector backend
+    (DETECTOR_BACKEND; mog2 uses the direction's own background model).
     Returns: integer count
     """
-    global _frame_index
-    _frame_index += 1
-
-    if frame is None:
-        return 0
-
-    # 1. PRE-PROCESS
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-
-    # 2. SUBTRACT BACKGROUND
-    mask = _bg.apply(blurred)
-
-    # 3. SHADOW REMOVAL & CLEANING
-    _, mask = cv2.threshold(mask, 250, 255, cv2.THRESH_BINARY)
-    
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
-    mask = cv2.dilate(mask, kernel, iterations=1)
-
-    # Warmup
-    if _frame_index < _WARMUP_FRAMES:
-        return 0
-
-    # 4. COUNT OBJECTS
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    count = 0
-    for cnt in contours:
-        area = cv2.contourArea(cnt)
-        
-        # Filter by Size
-        if MIN_VEHICLE_AREA < area < MAX_VEHICLE_AREA:
-            # Filter by Shape (Aspect Ratio)
-            x, y, w, h = cv2.boundingRect(cnt)
-            aspect = float(w) / h
-            if 0.2 < aspect < 4.0:
-                count += 1
-                # NO cv2.rectangle calls here!
-
-    return count
\ No newline at end of file
+    return len(detect_vehicles(frame, direction))
+
+
+def detect_vehicles(frame, direction=None):
+    """
+    Like count_vehicles(), but returns the (N, 4) x, y, w, h boxes.
+    """
+    # core.detectors builds on this module: import on use
+    from core.detectors import get_detector
+    return get_detector().detect(frame, direction)
@@ -0,0 +1,164 @@
+# hardware/arduino_emulator.py
+
+"""
+Software stand-in for arduino_code/traffic_signal.ino, so the serial
+protocol can be exercised without hardware.
+
+- ArduinoEmulator: byte-level model of the firmware parser
+- EmulatedSerial:  in-process, pyserial-like port (SERIAL_PORT = "emulator")
+- PtyArduinoEmulator: serves the emulator on a pseudo-terminal (POSIX),
+  so a real serial.Serial(port) can talk to it
+"""
+
+import os
+import select
+import threading
+from threading import Lock
+
+from hardware.signal_commands import (
+    DIRECTION_ORDER, FRAME_START, PACKET_SIZE,
+    build_ack, decode_state, parse_state_packet, single_signal_state
+)
+
+
+class ArduinoEmulator:
+    """
+    Mirrors the firmware: binary state packets are validated, applied
+    atomically and acked; legacy text lines (NORTH_GREEN) still work.
+    """
+    def __init__(self):
+        self.states = {d: "red" for d in DIRECTION_ORDER}
+        self.history = []       # every applied state, in order
+        self._binary = bytearray()
+        self._text = bytearray()
+        self._lock = Lock()
+
+    def feed(self, data):
+        """
+        Consumes bytes from the host. Returns the bytes the firmware
+        would send back (acks / naks).
+        """
+        out = bytearray()
+        with self._lock:
+            for byte in data:
+                if self._binary:
+                    self._binary.append(byte)
+                    if len(self._binary) == PACKET_SIZE:
+                        out += self._handle_packet(bytes(self._binary))
+                        self._binary.clear()
+                elif byte == FRAME_START and not self._text:
+                    self._binary.append(byte)
+                elif byte == ord("\n"):
+                    self._handle_line(self._text.decode(errors="ignore").strip())
+                    self._text.clear()
+                else:
+                    self._text.append(byte)
+        return bytes(out)
+
+    def _handle_packet(self, packet):
+        try:
+            seq, mask = parse_state_packet(packet)
+        except ValueError:
+            # Corrupt frame: the host never gets an ack and retries
+            return b""
+        try:
+            states = decode_state(mask)
+        except ValueError:
+            return build_ack(seq, ok=False)
+        self._apply(states)
+        return build_ack(seq, ok=True)
+
+    def _handle_line(self, line):
+        if "_" not in line:
+            return
+        direction, color = line.lower().split("_", 1)
+        try:
+            self._apply(single_signal_state(direction, color))
+        except ValueError:
+            pass
+
+    def _apply(self, states):
+        self.states = dict(states)
+        self.history.append(dict(states))
+
+
+class EmulatedSerial:
+    """
+    Minimal pyserial-compatible port backed by an ArduinoEmulator.
+    Responses are available to read() as soon as write() returns.
+    """
+    resets_on_open = False
+
+    def __init__(self, port="emulator", baudrate=115200, timeout=None, emulator=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.emulator = emulator or ArduinoEmulator()
+        self.is_open = True
+        self._rx = bytearray()
+
+    def write(self, data):
+        self._rx += self.emulator.feed(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def read(self, size=1):
+        data = bytes(self._rx[:size])
+        del self._rx[:size]
+        return data
+
+    @property
+    def in_waiting(self):
+        return len(self._rx)
+
+    def reset_input_buffer(self):
+        self._rx.clear()
+
+    def close(self):
+        self.is_open = False
+
+
+class PtyArduinoEmulator(threading.Thread):
+    """
+    Runs an ArduinoEmulator behind a pseudo-terminal.
+    Point SERIAL_PORT (or serial.Serial) at `.port` to talk to it.
+    POSIX only.
+    """
+    def __init__(self, emulator=None):
+        super().__init__()
+        self.daemon = True
+        self.emulator = emulator or ArduinoEmulator()
+        self._master, self._slave = os.openpty()
+        self.port = os.ttyname(self._slave)
+        self.running = True
+
+        # Raw mode on the slave side so binary bytes pass through untouched
+        import tty
+        tty.setraw(self._slave)
+
+    def run(self):
+        try:
+            while self.running:
+                ready, _, _ = select.select([self._master], [], [], 0.1)
+                if not ready:
+                    continue
+                data = os.read(self._master, 256)
+                if not data:
+                    break
+                reply = self.emulator.feed(data)
+                if reply:
+                    os.write(self._master, reply)
+        except OSError:
+            pass
+        finally:
+            for fd in (self._slave, self._master):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+    def stop(self):
+        self.running = False
+        self.join(timeout=1.0)
@@ -2,42 +2,277 @@
 
 import time
 import serial
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 from threading import Lock
 
-from hardware.signal_commands import build_command
+from hardware.signal_commands import (
+    ACK_SIZE, ACK_START, build_command, build_state_packet, parse_ack, single_signal_state
+)
+from utils import metrics
 
 # -------------------------------
 # SERIAL CONFIG
 # -------------------------------
-SERIAL_PORT = "COM3"      # ⚠️ CHANGE if needed
-BAUD_RATE = 9600
-WRITE_DELAY = 0.1         # seconds
+SERIAL_PORT = "COM3"      # ⚠️ CHANGE if needed ("emulator" = no hardware)
+BAUD_RATE = 115200        # must match Serial.begin() in the firmware
+WRITE_DELAY = 0.1         # seconds, text protocol only
+RESET_DELAY = 2.0         # Arduino resets when the port opens
 
-_ser = None
-_lock = Lock()
+# "binary": one acked packet with all 4x3 lamps (see signal_commands.py)
+# "text":   legacy NORTH_GREEN lines, one direction per line
+SERIAL_PROTOCOL = "binary"
+ACK_TIMEOUT = 0.05        # seconds to wait for an ack
+ACK_RETRIES = 3
+
+# Binary mode keeps a single pending slot: the whole intersection state
+_INTERSECTION = "intersection"
+
+# Writer queue / reconnect policy
+MAX_PENDING = 16
+RECONNECT_BACKOFF_MIN = 0.5
+RECONNECT_BACKOFF_MAX = 10.0
+
+_writer = None
+_writer_lock = Lock()
 
 
 # -------------------------------
-# GET SERIAL CONNECTION
+# WRITER THREAD
 # -------------------------------
-def _get_serial():
-    global _ser
+class SerialWriter(threading.Thread):
+    """
+    Owns the serial port. Callers only enqueue commands, so the
+    controller and Flask threads never wait on the port.
+
+    - Text protocol: one pending command per direction; a newer command
+      for the same direction replaces (coalesces) the older one.
+    - Binary protocol: one pending intersection state; every new state
+      replaces the pending one, and it is written as a single acked packet.
+    - Reconnects with exponential backoff, inside this thread.
+    - Every command gets a Future resolving to True once written (and
+      acked, in binary mode), or False if it failed or was superseded.
+    """
+    def __init__(self, port=SERIAL_PORT, baudrate=BAUD_RATE, protocol=SERIAL_PROTOCOL, serial_factory=None):
+        super().__init__()
+        self.daemon = True
+        self.running = True
+        self.port = port
+        self.baudrate = baudrate
+        self.protocol = protocol
+
+        if serial_factory is None:
+            if port == "emulator":
+                from hardware.arduino_emulator import EmulatedSerial
+                serial_factory = EmulatedSerial
+            else:
+                serial_factory = serial.Serial
+        self._serial_factory = serial_factory
+
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()   # key -> (payload, future)
+        self._ser = None
+        self._seq = 0
+        self._backoff = RECONNECT_BACKOFF_MIN
+        self._next_connect = 0.0
+
+    # ---------- producer side ----------
+    def submit(self, direction, color):
+        """
+        Queues a one-direction command (direction = color, in binary mode
+        every other head goes red). Raises ValueError for invalid input.
+        Returns a Future[bool].
+        """
+        if self.protocol == "binary":
+            return self._enqueue(_INTERSECTION, single_signal_state(direction, color))
+        return self._enqueue(direction, build_command(direction, color))
+
+    def submit_state(self, states):
+        """
+        Queues a full intersection state {direction: color} (binary only).
+        Returns a Future[bool].
+        """
+        if self.protocol != "binary":
+            raise ValueError("Full-state updates need the binary protocol")
+        build_state_packet(0, states)  # validate now, in the caller's thread
+        return self._enqueue(_INTERSECTION, dict(states))
+
+    def _enqueue(self, key, payload):
+        future = Future()
+
+        with self._cond:
+            old = self._pending.pop(key, None)
+            if old is not None:
+                old[1].set_result(False)
+                metrics.SERIAL_COMMANDS_COALESCED.labels().inc()
+            elif len(self._pending) >= MAX_PENDING:
+                _, (_, dropped) = self._pending.popitem(last=False)
+                dropped.set_result(False)
+
+            # Re-inserted at the end: the newest command is always sent last
+            self._pending[key] = (payload, future)
+            metrics.SERIAL_QUEUE_DEPTH.labels().set(len(self._pending))
+            self._cond.notify()
+
+        return future
+
+    # ---------- writer side ----------
+    def run(self):
+        print("[ARDUINO] Serial writer started")
+
+        while self.running:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or not self.running)
+                if not self.running:
+                    break
+
+            ser = self._connect()
+            if ser is None:
+                # Still backing off; new commands keep coalescing meanwhile
+                with self._cond:
+                    self._cond.wait(max(0.0, self._next_connect - time.monotonic()))
+                continue
+
+            with self._cond:
+                if not self._pending:
+                    continue
+                _, (payload, future) = self._pending.popitem(last=False)
+                metrics.SERIAL_QUEUE_DEPTH.labels().set(len(self._pending))
+
+            if self.protocol == "binary":
+                future.set_result(self._write_state(ser, payload))
+            else:
+                future.set_result(self._write(ser, payload))
+
+        self._disconnect()
+        with self._cond:
+            for _, future in self._pending.values():
+                future.set_result(False)
+            self._pending.clear()
 
-    with _lock:
-        if _ser is None or not _ser.is_open:
+    def _connect(self):
+        if self._ser is not None and self._ser.is_open:
+            return self._ser
+        if time.monotonic() < self._next_connect:
+            return None
+
+        try:
+            self._ser = self._serial_factory(port=self.port, baudrate=self.baudrate, timeout=ACK_TIMEOUT)
+            if getattr(self._ser, "resets_on_open", True):
+                time.sleep(RESET_DELAY)  # Arduino reset delay
+                self._ser.reset_input_buffer()
+            self._backoff = RECONNECT_BACKOFF_MIN
+            print("[ARDUINO] Connected")
+            return self._ser
+        except Exception as e:
+            print(f"[ARDUINO] Connection failed (retry in {self._backoff:.1f}s):", e)
+            self._ser = None
+            self._next_connect = time.monotonic() + self._backoff
+            self._backoff = min(self._backoff * 2, RECONNECT_BACKOFF_MAX)
+            return None
+
+    def _disconnect(self):
+        if self._ser is not None:
             try:
-                _ser = serial.Serial(
-                    port=SERIAL_PORT,
-                    baudrate=BAUD_RATE,
-                    timeout=1
-                )
-                time.sleep(2)  # Arduino reset delay
-                print("[ARDUINO] Connected")
+                self._ser.close()
+            except Exception:
+                pass
+            self._ser = None
+
+    def _write(self, ser, cmd):
+        with metrics.SERIAL_WRITE_SECONDS.labels().time():
+            try:
+                ser.write((cmd + "\n").encode())
+                ser.flush()
+                time.sleep(WRITE_DELAY)
+                print("[ARDUINO] Sent:", cmd)
+                return True
             except Exception as e:
-                print("[ARDUINO] Connection failed:", e)
-                _ser = None
+                print("[ARDUINO] Write failed:", e)
+                metrics.SERIAL_WRITE_FAILURES.labels().inc()
+                self._disconnect()
+                self._next_connect = time.monotonic() + self._backoff
+                return False
+
+    def _write_state(self, ser, states):
+        """
+        Sends one state packet and waits for its ack, retrying on timeout.
+        """
+        with metrics.SERIAL_WRITE_SECONDS.labels().time():
+            for _ in range(ACK_RETRIES):
+                self._seq = (self._seq + 1) & 0xFF
+                packet = build_state_packet(self._seq, states)
+                try:
+                    ser.write(packet)
+                    ser.flush()
+                    ack = self._read_ack(ser, self._seq)
+                except Exception as e:
+                    print("[ARDUINO] Write failed:", e)
+                    metrics.SERIAL_WRITE_FAILURES.labels().inc()
+                    self._disconnect()
+                    self._next_connect = time.monotonic() + self._backoff
+                    return False
 
-        return _ser
+                if ack is None:
+                    metrics.SERIAL_ACK_TIMEOUTS.labels().inc()
+                    continue
+                if not ack:
+                    print("[ARDUINO] State rejected (NAK):", states)
+                    metrics.SERIAL_WRITE_FAILURES.labels().inc()
+                    return False
+                return True
+
+            print("[ARDUINO] No ack after", ACK_RETRIES, "attempts")
+            metrics.SERIAL_WRITE_FAILURES.labels().inc()
+            return False
+
+    @staticmethod
+    def _read_ack(ser, seq):
+        """
+        Reads acks until one matches seq. Returns True (ACK), False (NAK)
+        or None on timeout. Stale or corrupt acks are skipped.
+        """
+        deadline = time.monotonic() + ACK_TIMEOUT
+        while time.monotonic() < deadline:
+            start = ser.read(1)
+            if not start:
+                continue
+            if start[0] != ACK_START:
+                continue
+            rest = ser.read(ACK_SIZE - 1)
+            try:
+                ack_seq, ok = parse_ack(start + rest)
+            except ValueError:
+                continue
+            if ack_seq == seq:
+                return ok
+        return None
+
+    def stop(self):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+
+
+def get_serial_writer():
+    """
+    Returns the shared writer thread, starting it on first use.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = SerialWriter()
+            _writer.start()
+        return _writer
+
+
+def stop_serial_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
 
 
 # -------------------------------
@@ -45,20 +280,16 @@ def _get_serial():
 # -------------------------------
 def send_signal_to_arduino(direction, color):
     """
-    Send signal command to Arduino safely
+    Queue signal command for the Arduino (never blocks on the port).
+    Returns a Future[bool]; call .result(timeout) if confirmation is needed.
+    """
+    return get_serial_writer().submit(direction, color)
+
+
+def send_intersection_state(states):
+    """
+    Queue a full intersection state, e.g.
+    {"north": "green", "south": "green", "east": "red", "west": "red"}.
+    Returns a Future[bool].
     """
-    ser = _get_serial()
-    if ser is None:
-        print("[ARDUINO] Not connected")
-        return False
-
-    try:
-        cmd = build_command(direction, color)
-        ser.write((cmd + "\n").encode())
-        ser.flush()
-        time.sleep(WRITE_DELAY)
-        print("[ARDUINO] Sent:", cmd)
-        return True
-    except Exception as e:
-        print("[ARDUINO] Write failed:", e)
-        return False
+    return get_serial_writer().submit_state(states)
@@ -33,3 +33,107 @@ def build_command(direction, color):
     """
     validate_signal(direction, color)
     return f"{direction.upper()}_{color.upper()}"
+
+
+# -------------------------------
+# BINARY PROTOCOL
+# -------------------------------
+# One packet carries all 4x3 lamp states, applied atomically by the
+# firmware and acknowledged with the same sequence number.
+#
+#   Host -> Arduino : A5 | 01 | SEQ | STATE_LO | STATE_HI | CRC8
+#   Arduino -> Host : 5A | 06 (ACK) / 15 (NAK) | SEQ | CRC8
+#
+# STATE is a 12-bit mask: bit (d * 3 + l) is lamp l of direction d,
+# with d in DIRECTION_ORDER and l in LAMP_ORDER. This matches the pin
+# layout (pin = 2 + bit). CRC8 (poly 0x07) covers every byte after the
+# start byte.
+DIRECTION_ORDER = ["north", "south", "east", "west"]
+LAMP_ORDER = ["red", "yellow", "green"]
+
+FRAME_START = 0xA5
+ACK_START = 0x5A
+MSG_SET_STATE = 0x01
+MSG_ACK = 0x06
+MSG_NAK = 0x15
+
+PACKET_SIZE = 6
+ACK_SIZE = 4
+
+
+def crc8(data):
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def single_signal_state(direction, color):
+    """
+    Full intersection state for a one-direction command:
+    `direction` shows `color`, every other head is red.
+    """
+    validate_signal(direction, color)
+    states = {d: "red" for d in DIRECTION_ORDER}
+    states[direction] = color
+    return states
+
+
+def encode_state(states):
+    """
+    {direction: color} -> 12-bit lamp mask. Missing directions are red.
+    """
+    mask = 0
+    for d_idx, direction in enumerate(DIRECTION_ORDER):
+        color = states.get(direction, "red")
+        validate_signal(direction, color)
+        mask |= 1 << (d_idx * 3 + LAMP_ORDER.index(color))
+    return mask
+
+
+def decode_state(mask):
+    """
+    12-bit lamp mask -> {direction: color}.
+    Raises ValueError unless every head has exactly one lamp on.
+    """
+    states = {}
+    for d_idx, direction in enumerate(DIRECTION_ORDER):
+        lamps = (mask >> (d_idx * 3)) & 0b111
+        if lamps not in (1, 2, 4):
+            raise ValueError(f"Invalid lamp bits for {direction}: {lamps:03b}")
+        states[direction] = LAMP_ORDER[lamps.bit_length() - 1]
+    return states
+
+
+def build_state_packet(seq, states):
+    body = bytes([MSG_SET_STATE, seq & 0xFF]) + encode_state(states).to_bytes(2, "little")
+    return bytes([FRAME_START]) + body + bytes([crc8(body)])
+
+
+def parse_state_packet(packet):
+    """
+    Returns (seq, mask). Raises ValueError on a malformed packet.
+    """
+    if len(packet) != PACKET_SIZE or packet[0] != FRAME_START or packet[1] != MSG_SET_STATE:
+        raise ValueError("Malformed state packet")
+    if crc8(packet[1:5]) != packet[5]:
+        raise ValueError("State packet checksum mismatch")
+    return packet[2], int.from_bytes(packet[3:5], "little")
+
+
+def build_ack(seq, ok=True):
+    body = bytes([MSG_ACK if ok else MSG_NAK, seq & 0xFF])
+    return bytes([ACK_START]) + body + bytes([crc8(body)])
+
+
+def parse_ack(data):
+    """
+    Returns (seq, ok). Raises ValueError on a malformed ack.
+    """
+    if len(data) != ACK_SIZE or data[0] != ACK_START or data[1] not in (MSG_ACK, MSG_NAK):
+        raise ValueError("Malformed ack")
+    if crc8(data[1:3]) != data[3]:
+        raise ValueError("Ack checksum mismatch")
+    return data[2], data[1] == MSG_ACK
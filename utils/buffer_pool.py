@@ -0,0 +1,82 @@
+# utils/buffer_pool.py
+
+"""
+Preallocated array buffers for the per-frame hot loops.
+OpenCV functions reuse an output array passed as dst= when its
+shape/dtype already match, so holding on to these removes the
+per-frame allocations (and the GC / allocator churn in long runs).
+"""
+
+from threading import Lock
+
+import numpy as np
+
+
+class BufferPool:
+    """
+    Named scratch arrays owned by one consumer (e.g. one direction's counter).
+    An array is only reallocated if the requested shape/dtype changes.
+    """
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name, shape, dtype=np.uint8):
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != tuple(shape) or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+        return buf
+
+    def clear(self):
+        self._buffers.clear()
+
+
+class FrameRing:
+    """
+    Ring of output frames for a producer that publishes to readers on
+    other threads.
+
+    A buffer is leased while anyone may still read it: the published
+    frame holds a lease (video_feed.publish_frame), and so does every
+    reader that asked for one (lease=True on the wait functions) until
+    it calls release(). next() only hands out unleased buffers, and
+    grows the ring by one if all of them are leased, so a slow reader
+    never has its frame rewritten under it. `depth` is the initial size.
+    """
+    def __init__(self, depth=3):
+        if depth < 2:
+            raise ValueError("FrameRing needs at least 2 buffers")
+        self._pool = BufferPool()
+        self._leases = [0] * depth
+        self._lock = Lock()
+        self._index = -1
+
+    @property
+    def depth(self):
+        return len(self._leases)
+
+    @property
+    def index(self):
+        """Buffer returned by the last next()."""
+        return self._index
+
+    def next(self, shape, dtype=np.uint8):
+        with self._lock:
+            n = len(self._leases)
+            for k in range(1, n + 1):
+                i = (self._index + k) % n
+                if not self._leases[i]:
+                    break
+            else:
+                i = n
+                self._leases.append(0)
+            self._index = i
+        return self._pool.get(i, shape, dtype)
+
+    def acquire(self, index):
+        with self._lock:
+            self._leases[index] += 1
+
+    def release(self, index):
+        with self._lock:
+            self._leases[index] -= 1
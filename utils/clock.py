@@ -0,0 +1,181 @@
+# utils/clock.py
+
+"""
+Injectable clock.
+
+Pipeline code asks this module for the time instead of calling the
+time module directly:
+
+    from utils import clock
+    clock.time()        # wall clock (timestamps, history, persistence)
+    clock.monotonic()   # deadlines
+    clock.sleep(s)
+    clock.event()       # threading.Event-like, for timed waits
+
+SystemClock (default) is plain time / threading. VirtualClock lets the
+simulation run the controller faster than real time: sleeping threads
+block until the driver advances virtual time past their deadline.
+
+Durations measured for metrics stay on time.perf_counter() - they are
+real CPU cost, not simulated time.
+"""
+
+import time as _time
+import threading
+
+STALL_TIMEOUT = 10.0   # real seconds a VirtualClock waits for its threads
+
+
+class SystemClock:
+    """Real time."""
+    def time(self):
+        return _time.time()
+
+    def monotonic(self):
+        return _time.monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            _time.sleep(seconds)
+
+    def event(self):
+        return threading.Event()
+
+
+class VirtualEvent:
+    """
+    threading.Event whose wait(timeout) runs on a VirtualClock.
+    """
+    def __init__(self, clock):
+        self._clock = clock
+        self._flag = False
+
+    def set(self):
+        with self._clock._cond:
+            self._flag = True
+            self._clock._cond.notify_all()
+
+    def clear(self):
+        with self._clock._cond:
+            self._flag = False
+
+    def is_set(self):
+        return self._flag
+
+    def wait(self, timeout=None):
+        clock = self._clock
+        with clock._cond:
+            deadline = None if timeout is None else clock._now + timeout
+            clock._block(deadline, lambda: self._flag)
+            return self._flag
+
+
+class VirtualClock:
+    """
+    Simulated time that only moves when the driver calls advance().
+
+    `participants` threads (e.g. the TrafficController) are expected to
+    run on this clock. advance_to() waits until all of them are blocked
+    in sleep() / event().wait(), jumps to the earliest deadline, lets
+    them run, and repeats until the target time - a small discrete-event
+    scheduler, so the threads behave exactly as at real speed.
+    """
+    def __init__(self, start=None, participants=0):
+        self._cond = threading.Condition()
+        self._now = 0.0
+        self._epoch = _time.time() if start is None else float(start)
+        self._sleepers = {}    # token -> (deadline or None, wake predicate)
+        self.participants = participants
+
+    def time(self):
+        return self._epoch + self._now
+
+    def monotonic(self):
+        return self._now
+
+    def sleep(self, seconds):
+        with self._cond:
+            self._block(self._now + max(0.0, seconds), lambda: False)
+
+    def event(self):
+        return VirtualEvent(self)
+
+    def _block(self, deadline, predicate):
+        """Waits (with _cond held) until predicate() or the deadline passes."""
+        token = object()
+        self._sleepers[token] = (deadline, predicate)
+        self._cond.notify_all()   # the driver may be waiting for us to settle
+        try:
+            while not predicate() and (deadline is None or self._now < deadline):
+                self._cond.wait()
+        finally:
+            del self._sleepers[token]
+            self._cond.notify_all()
+
+    def _quiescent(self):
+        if len(self._sleepers) < self.participants:
+            return False
+        return all(
+            not predicate() and (deadline is None or deadline > self._now)
+            for deadline, predicate in self._sleepers.values()
+        )
+
+    def _settle(self):
+        stall = _time.monotonic() + STALL_TIMEOUT
+        while not self._quiescent():
+            if _time.monotonic() > stall:
+                raise RuntimeError("VirtualClock: threads did not settle (blocked outside the clock?)")
+            self._cond.wait(0.5)
+
+    def advance(self, seconds):
+        self.advance_to(self._now + seconds)
+
+    def advance_to(self, target):
+        """
+        Moves virtual time to `target`, waking every sleeper whose
+        deadline falls on the way, in deadline order.
+        """
+        with self._cond:
+            while True:
+                self._settle()
+                due = [d for d, _ in self._sleepers.values() if d is not None and d <= target]
+                self._now = max(self._now, min(due) if due else target)
+                self._cond.notify_all()
+                if not due:
+                    break
+            self._settle()
+
+
+_clock = SystemClock()
+
+
+# -------------------------------
+# MODULE API
+# -------------------------------
+def get_clock():
+    return _clock
+
+
+def set_clock(clock):
+    """
+    Installs the process-wide clock. Do this before starting threads
+    that wait on clock.event() (they keep the event they were given).
+    """
+    global _clock
+    _clock = clock
+
+
+def time():
+    return _clock.time()
+
+
+def monotonic():
+    return _clock.monotonic()
+
+
+def sleep(seconds):
+    _clock.sleep(seconds)
+
+
+def event():
+    return _clock.event()
@@ -0,0 +1,33 @@
+# utils/listeners.py
+
+from threading import Lock
+
+
+class ListenerMixin:
+    """
+    Publish callbacks for a producer thread (MJPEGBroadcaster,
+    StatusPublisher): the producer calls _notify_listeners() after every
+    publish, so non-thread consumers (the asyncio server) can wait
+    without polling. List it before threading.Thread in the bases.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._listeners = []
+        self._listeners_lock = Lock()
+
+    def add_listener(self, callback):
+        """Registers callback() to run after every publish (in the producer thread)."""
+        with self._listeners_lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._listeners_lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify_listeners(self):
+        with self._listeners_lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            callback()
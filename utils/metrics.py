@@ -0,0 +1,332 @@
+# utils/metrics.py
+
+"""
+Lightweight in-process metrics (counters, gauges, histograms, rates)
+rendered in the Prometheus text format for the /metrics route.
+Recording is a dict lookup + a short lock, cheap enough for per-frame use.
+"""
+
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from threading import Lock
+
+# Default latency buckets (seconds): 0.1 ms .. 5 s
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.003, 0.005, 0.0075,
+    0.01, 0.015, 0.02, 0.03, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+_registry = []
+_registry_lock = Lock()
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in pairs)
+    return "{" + inner + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    """
+    Base class: a named family of children keyed by label values.
+    """
+    type_name = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._new_child()
+                    self._children[values] = child
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """Returns a fresh child (one label combination)."""
+
+    def collect(self):
+        """Returns the exposition lines for this metric family."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            lines.extend(self._collect_child(values, child))
+        return lines
+
+    def _collect_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"]
+
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0
+        self._lock = Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def get(self):
+        return self._value
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class _GaugeChild:
+    __slots__ = ("_value",)
+
+    def __init__(self):
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class _RateChild:
+    """
+    Events/sec, smoothed with an exponential moving average of the
+    interval between mark() calls. Decays to 0 when events stop.
+    """
+    __slots__ = ("_last", "_avg_interval", "_alpha")
+
+    def __init__(self, alpha=0.1):
+        self._last = None
+        self._avg_interval = None
+        self._alpha = alpha
+
+    def mark(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        last = self._last
+        self._last = now
+        if last is None:
+            return
+        dt = now - last
+        if self._avg_interval is None:
+            self._avg_interval = dt
+        else:
+            self._avg_interval += self._alpha * (dt - self._avg_interval)
+
+    def get(self):
+        if self._avg_interval is None or self._avg_interval <= 0:
+            return 0.0
+        # No event for a while -> use the open interval so the rate decays
+        interval = max(self._avg_interval, time.monotonic() - self._last)
+        return 1.0 / interval
+
+
+class Rate(_Metric):
+    """Achieved events/sec (exposed as a gauge)."""
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _RateChild()
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_count", "_lock")
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)   # last slot = +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = Lock()
+
+    def observe(self, value):
+        i = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._counts), self._sum, self._count
+
+    def quantile(self, q):
+        """
+        Estimates the q-quantile (0..1) by linear interpolation inside
+        the matching bucket (same approach as PromQL histogram_quantile).
+        Returns None if nothing was observed.
+        """
+        counts, _, count = self.snapshot()
+        if count == 0:
+            return None
+        rank = q * count
+        cumulative = 0
+        lower = 0.0
+        for bound, c in zip(self._bounds, counts):
+            if c and cumulative + c >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / c
+            cumulative += c
+            lower = bound
+        # Falls in the +Inf bucket: best estimate is the highest bound
+        return self._bounds[-1]
+
+
+class _Timer:
+    """Context manager: observes the elapsed perf_counter() time."""
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _collect_child(self, values, child):
+        counts, total, count = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, c in zip(self.buckets + (float("inf"),), counts):
+            cumulative += c
+            labels = _format_labels(self.labelnames, values, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {total!r}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render_prometheus():
+    """
+    Renders every registered metric in Prometheus text format (0.0.4).
+    """
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------
+# PIPELINE METRICS
+# -------------------------------
+# Video (camera/video_feed.py)
+VIDEO_DECODE_SECONDS = Histogram(
+    "traffic_video_decode_seconds", "Time to grab (and decode, when due) one source frame", ["direction"])
+VIDEO_RESIZE_SECONDS = Histogram(
+    "traffic_video_resize_seconds", "Time to resize one frame to stream resolution", ["direction"])
+VIDEO_FRAMES = Counter(
+    "traffic_video_frames_total", "Frames published to the shared buffer", ["direction"])
+VIDEO_FRAMES_SKIPPED = Counter(
+    "traffic_video_frames_skipped_total", "Source frames grabbed but not decoded (no consumer due)", ["direction"])
+VIDEO_FPS = Rate(
+    "traffic_video_fps", "Achieved published frames per second", ["direction"])
+
+# Detection (core/detection_service.py)
+DETECTION_SECONDS = Histogram(
+    "traffic_detection_seconds", "Time to count vehicles in one frame", ["direction"])
+DETECTION_BATCH_SECONDS = Histogram(
+    "traffic_detection_batch_seconds", "Time for one detect_batch call (all lanes due in a tick)")
+DETECTION_LAG_SECONDS = Histogram(
+    "traffic_detection_lag_seconds", "Frame capture to count landing in traffic_state", ["direction"])
+DETECTION_FRAMES_DROPPED = Counter(
+    "traffic_detection_frames_dropped_total", "Published frames detection never looked at", ["direction"])
+DETECTION_WORKER_RESTARTS = Counter(
+    "traffic_detection_worker_restarts_total", "Detection worker processes restarted after dying", ["direction"])
+DETECTION_FPS = Rate(
+    "traffic_detection_fps", "Achieved detections per second", ["direction"])
+DETECTION_RATE = Gauge(
+    "traffic_detection_rate_hz", "Scheduled detection rate", ["direction"])
+DETECTION_CPU_LOAD = Gauge(
+    "traffic_detection_cpu_cores", "Estimated detection CPU at the scheduled rates")
+MOTION_GATE_CHECKS = Counter(
+    "traffic_motion_gate_checks_total", "Frames checked by the motion gate", ["direction"])
+MOTION_GATE_HITS = Counter(
+    "traffic_motion_gate_hits_total", "Static frames that reused the last count", ["direction"])
+
+# MJPEG (camera/mjpeg_stream.py)
+MJPEG_ENCODE_SECONDS = Histogram(
+    "traffic_mjpeg_encode_seconds", "Time to JPEG-encode one frame", ["direction"])
+MJPEG_FPS = Rate(
+    "traffic_mjpeg_fps", "Achieved encoded frames per second", ["direction"])
+MJPEG_SUBSCRIBERS = Gauge(
+    "traffic_mjpeg_subscribers", "Open MJPEG stream connections", ["direction"])
+MJPEG_CLIENT_FRAMES_DROPPED = Counter(
+    "traffic_mjpeg_client_frames_dropped_total", "Encoded frames skipped by slow stream clients", ["direction"])
+
+# Controller (core/signal_controller.py)
+CONTROLLER_PHASES = Counter(
+    "traffic_controller_phases_total", "Green phases started", ["direction"])
+CONTROLLER_GREEN_SECONDS = Histogram(
+    "traffic_controller_green_seconds", "Planned green duration per phase", ["direction"],
+    buckets=(5, 10, 20, 30, 40, 50, 60))
+EMERGENCY_PREEMPT_SECONDS = Histogram(
+    "traffic_emergency_preempt_seconds", "Emergency request to first signal command queued")
+
+# Serial (hardware/arduino_serial.py)
+SERIAL_WRITE_SECONDS = Histogram(
+    "traffic_serial_write_seconds", "Time spent in one Arduino command write (incl. delays)")
+SERIAL_WRITE_FAILURES = Counter(
+    "traffic_serial_write_failures_total", "Arduino writes that failed")
+SERIAL_ACK_TIMEOUTS = Counter(
+    "traffic_serial_ack_timeouts_total", "State packets that were not acked in time (retried)")
+SERIAL_QUEUE_DEPTH = Gauge(
+    "traffic_serial_queue_depth", "Commands waiting for the serial writer")
+SERIAL_COMMANDS_COALESCED = Counter(
+    "traffic_serial_commands_coalesced_total", "Queued commands replaced by a newer one for the same direction")